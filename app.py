@@ -1,13 +1,33 @@
 import streamlit as st
 import streamlit_authenticator as stauth
-from openai import OpenAI, RateLimitError
-import tempfile
-import fitz
-import time
-import re
-import requests
 from io import BytesIO
-import pandas as pd
+from contratos.almacen import LIMITE_RESULTADOS, AlmacenFichas
+from contratos.analisis import HEADERS_CONTRATO, construir_tabla_markdown
+from contratos.cache import CacheAnalisis
+from contratos.cascada import MODELO_RAPIDO_DEFAULT
+from contratos.duplicados import IndiceDuplicados
+from contratos.ocr import CacheOCR, crear_backend_ocr
+from contratos.exportar import FORMATOS, ExportadorFichas, exportar_fichas, formatos_disponibles
+from contratos.extractores import UMBRAL_CONFIANZA
+from contratos.limites import limitador_global
+from contratos.reanalisis import campos_dudosos, campos_no_localizados
+from contratos.sheets import (
+    ColaExportacion,
+    append_rows_to_sheet,
+    solicitar_token,
+    token_por_expirar,
+)
+from contratos.trabajos import (
+    ANALIZANDO,
+    ERROR,
+    ESTADOS_ACTIVOS,
+    EXTRAYENDO,
+    PENDIENTE,
+    TERMINADO,
+    ColaTrabajos,
+)
+from contratos.traza import TRAZA_ACTIVA, Traza
+from contratos.uso import contador_uso_global, proporcion_cache, sumar_uso
 
 # ===============================================================
 # CONFIGURACIÓN BÁSICA DE LA APP
@@ -15,24 +35,6 @@ import pandas as pd
 
 st.set_page_config(page_title="📄Análisis Inteligente de Documentos Institucionales", page_icon="📄")
 
-# ===============================================================
-# FUNCIÓN DE REINTENTOS ANTI RATE LIMIT (OPENAI)
-# ===============================================================
-
-def safe_gpt(client, model, input_data, max_output_tokens=4000, retries=5):
-    while retries > 0:
-        try:
-            return client.responses.create(
-                model=model,
-                input=input_data,
-                max_output_tokens=max_output_tokens
-            )
-        except RateLimitError as e:
-            wait = getattr(e, "retry_after", 3)
-            time.sleep(wait)
-            retries -= 1
-    raise Exception("Rate limit persistente. Intenta de nuevo más tarde.")
-
 # ===============================================================
 # CONFIGURACIÓN LOGIN STREAMLIT (USUARIOS)
 # ===============================================================
@@ -74,28 +76,26 @@ name, authentication_status, username = authenticator.login("Iniciar sesión", "
 SPREADSHEET_ID = "1wCVD_3Ph7yrv1Nxu-ck3Hf4wBbohtsfcvPQhW2hrz64"
 SHEET_RANGE = "Contratos!A:Z"  # asume que la hoja se llama "Contratos"
 
-HEADERS_CONTRATO = [
-    "Partes",
-    "Objeto",
-    "Monto antes de IVA",
-    "IVA",
-    "Monto total",
-    "Fecha de inicio",
-    "Fecha de fin",
-    "Vigencia/Plazo",
-    "Garantía(s)",
-    "Obligaciones proveedor",
-    "Supervisión",
-    "Penalizaciones",
-    "Penalización máxima",
-    "Modificaciones",
-    "Normatividad aplicable",
-    "Resolución de controversias",
-    "Firmas",
-    "Anexos",
-    "No localizado",
-    "Áreas de mejora"
-]
+@st.cache_resource
+def get_cache_analisis():
+    # Un solo objeto por servidor; los datos viven en disco y se comparten entre sesiones
+    return CacheAnalisis()
+
+@st.cache_resource
+def get_almacen_fichas():
+    return AlmacenFichas()
+
+@st.cache_resource
+def get_indice_duplicados():
+    return IndiceDuplicados()
+
+@st.cache_resource
+def get_cola_trabajos():
+    # Un solo pool de trabajadores por servidor, compartido por todas las sesiones
+    return ColaTrabajos(
+        cache=get_cache_analisis(), almacen=get_almacen_fichas(), duplicados=get_indice_duplicados(),
+        modelo_rapido=MODELO_RAPIDO_DEFAULT or None, ocr=crear_backend_ocr(), cache_ocr=CacheOCR()
+    )
 
 # ===============================================================
 # FUNCIONES AUXILIARES: GOOGLE OAUTH + SHEETS
@@ -125,7 +125,6 @@ def get_google_auth_url():
 
 def exchange_code_for_tokens(code: str):
     cfg = get_google_oauth_config()
-    token_url = "https://oauth2.googleapis.com/token"
     data = {
         "code": code,
         "client_id": cfg["client_id"],
@@ -133,41 +132,20 @@ def exchange_code_for_tokens(code: str):
         "redirect_uri": cfg["redirect_uri"],
         "grant_type": "authorization_code"
     }
-    resp = requests.post(token_url, data=data)
-    resp.raise_for_status()
-    return resp.json()  # incluye access_token, refresh_token, expires_in, etc.
+    return solicitar_token(data)  # incluye access_token, refresh_token, expires_in, expires_at
 
 def refresh_access_token(refresh_token: str):
     cfg = get_google_oauth_config()
-    token_url = "https://oauth2.googleapis.com/token"
     data = {
         "client_id": cfg["client_id"],
         "client_secret": cfg["client_secret"],
         "refresh_token": refresh_token,
         "grant_type": "refresh_token"
     }
-    resp = requests.post(token_url, data=data)
-    resp.raise_for_status()
-    return resp.json()
+    return solicitar_token(data)
 
 def append_row_to_sheet(access_token: str, values_row):
-    url = f"https://sheets.googleapis.com/v4/spreadsheets/{SPREADSHEET_ID}/values/{SHEET_RANGE}:append"
-    params = {
-        "valueInputOption": "USER_ENTERED"
-    }
-    body = {
-        "majorDimension": "ROWS",
-        "values": [values_row]
-    }
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    resp = requests.post(url, params=params, json=body, headers=headers)
-    if resp.status_code == 401:
-        raise PermissionError("No autorizado o token expirado")
-    resp.raise_for_status()
-    return resp.json()
+    return append_rows_to_sheet(access_token, [values_row], SPREADSHEET_ID, SHEET_RANGE)
 
 def ensure_google_token():
     """
@@ -182,7 +160,7 @@ def ensure_google_token():
 
     token_data = st.session_state["google_token"]
 
-    # Si ya hay access_token y no manejamos expiración detallada, lo usamos
+    # Si ya hay access_token lo usamos (get_or_refresh_access_token se encarga de la expiración)
     if "access_token" in token_data and "refresh_token" in token_data:
         return token_data["access_token"]
 
@@ -199,6 +177,7 @@ def ensure_google_token():
                 "access_token": tokens.get("access_token"),
                 "refresh_token": tokens.get("refresh_token"),
                 "expires_in": tokens.get("expires_in"),
+                "expires_at": tokens.get("expires_at"),
                 "scope": tokens.get("scope"),
                 "token_type": tokens.get("token_type")
             }
@@ -215,10 +194,11 @@ def ensure_google_token():
         st.markdown(f"[Haz clic aquí para autorizar con Google]({auth_url})")
         return None
 
-def get_or_refresh_access_token():
+def get_or_refresh_access_token(forzar_refresco=False):
     """
     Devuelve un access_token válido.
-    Si falla con 401 al escribir en Sheets, se intenta refrescar.
+    Si al token le queda poco para expirar (según expires_at), se refresca antes de
+    usarlo, sin esperar a que Sheets responda 401. `forzar_refresco` lo refresca siempre.
     """
     if "google_token" not in st.session_state:
         st.session_state["google_token"] = {}
@@ -230,86 +210,144 @@ def get_or_refresh_access_token():
         access = ensure_google_token()
         return access
 
-    # Intentamos usar el access_token actual; si luego Sheets responde 401, refrescamos.
+    if forzar_refresco or token_por_expirar(token_data):
+        new_tokens = refresh_access_token(token_data["refresh_token"])
+        token_data["access_token"] = new_tokens.get("access_token")
+        token_data["expires_at"] = new_tokens.get("expires_at")
+
     return token_data["access_token"]
 
-def exportar_a_google_sheets(campos_dict):
+def exportar_a_google_sheets(fichas):
     """
-    Toma el diccionario {Campo: Respuesta} y lo envía como nueva fila al Sheet.
+    Toma uno o varios diccionarios {Campo: Respuesta} y los envía al Sheet
+    en una sola petición values:append.
     """
-    access_token = get_or_refresh_access_token()
+    if isinstance(fichas, dict):
+        fichas = [fichas]
+
+    try:
+        access_token = get_or_refresh_access_token()
+    except Exception as e:
+        st.error(f"No se pudo refrescar el token de Google: {e}")
+        return
     if not access_token:
         # ensure_google_token ya mostró link/mensaje
         return
 
-    # Ordenar los valores según HEADERS_CONTRATO
-    row = [campos_dict.get(col, "") for col in HEADERS_CONTRATO]
+    cola = ColaExportacion(SPREADSHEET_ID, SHEET_RANGE, HEADERS_CONTRATO, get_or_refresh_access_token)
+    for campos_dict in fichas:
+        cola.agregar(campos_dict)
 
     try:
-        append_row_to_sheet(access_token, row)
-        st.success("Ficha exportada correctamente a Google Sheets.")
-    except PermissionError:
-        # Intentamos refrescar el token y reintentar una vez
-        token_data = st.session_state.get("google_token", {})
-        refresh_token = token_data.get("refresh_token")
-        if not refresh_token:
-            st.error("No se encontró refresh_token. Vuelve a autorizar con Google.")
-            ensure_google_token()
-            return
-        try:
-            new_tokens = refresh_access_token(refresh_token)
-            st.session_state["google_token"]["access_token"] = new_tokens.get("access_token")
-            # Reintentar
-            append_row_to_sheet(st.session_state["google_token"]["access_token"], row)
-            st.success("Ficha exportada correctamente a Google Sheets (tras refrescar token).")
-        except Exception as e:
-            st.error(f"No se pudo refrescar el token ni exportar a Sheets: {e}")
+        enviadas = cola.vaciar()
+        if enviadas == 1:
+            st.success("Ficha exportada correctamente a Google Sheets.")
+        else:
+            st.success(f"{enviadas} fichas exportadas correctamente a Google Sheets.")
     except Exception as e:
         st.error(f"Error al exportar a Google Sheets: {e}")
 
 # ===============================================================
-# FUNCIONES AUXILIARES: PARSEAR TABLA MARKDOWN Y DESCARGA LOCAL
+# FUNCIONES AUXILIARES: DESCARGA LOCAL
 # ===============================================================
 
-def parse_markdown_table(tabla_markdown: str):
+def crear_excel_ficha(campos_dict):
     """
-    Recibe la tabla en formato Markdown (la que genera el modelo)
-    y devuelve un dict {Campo: Respuesta}
+    Crea un archivo Excel en memoria con una sola fila que corresponde a la ficha del contrato.
+    Devuelve BytesIO listo para usar en st.download_button.
     """
-    campos = {}
-    lines = tabla_markdown.splitlines()
+    return exportar_fichas([campos_dict], "xlsx", hoja="FichaContrato")
 
-    # Filtrar solo líneas que empiezan con '|'
-    lines = [l.strip() for l in lines if l.strip().startswith("|")]
+# ===============================================================
+# FUNCIONES AUXILIARES: BÚSQUEDA EN EL ALMACÉN DE FICHAS
+# ===============================================================
 
-    if len(lines) < 3:
-        return campos  # algo raro
+def buscar_contratos():
+    """
+    Página de búsqueda sobre las fichas ya analizadas (ver contratos.almacen).
+    """
+    almacen = get_almacen_fichas()
+    st.caption(f"{almacen.contar():,} fichas analizadas en el almacén.")
+
+    texto = st.text_input("Buscar en partes, objeto y obligaciones")
+    contratista = st.text_input("Contratista", help="Inicio del nombre, p. ej. «Aram Alta».")
+    col1, col2 = st.columns(2)
+    with col1:
+        monto_min = st.number_input("Monto mínimo antes de IVA ($)", min_value=0.0, value=0.0, step=100000.0)
+        fin_desde = st.date_input("Termina desde", value=None)
+    with col2:
+        monto_max = st.number_input("Monto máximo antes de IVA ($, 0 = sin límite)", min_value=0.0, value=0.0,
+                                    step=100000.0)
+        fin_hasta = st.date_input("Termina hasta", value=None)
+
+    fichas = almacen.buscar(
+        texto=texto or None,
+        contratista=contratista or None,
+        monto_min=monto_min or None,
+        monto_max=monto_max or None,
+        fin_desde=fin_desde,
+        fin_hasta=fin_hasta,
+    )
+    st.markdown(f"**{len(fichas)} resultados** (máximo {LIMITE_RESULTADOS}, de mayor a menor monto)")
+    if not fichas:
+        return
+    st.dataframe(
+        [
+            {
+                "Archivo": f["archivo"],
+                "Contratista": f["contratista"],
+                "Monto antes de IVA": float(f["monto"]) if f["monto"] is not None else None,
+                "Inicio": f["fecha_inicio"],
+                "Fin": f["fecha_fin"],
+                "Objeto": f["campos"].get("Objeto", ""),
+            }
+            for f in fichas
+        ],
+        hide_index=True
+    )
+    st.download_button(
+        "💾 Descargar resultados (Excel)",
+        data=exportar_fichas([f["campos"] for f in fichas], "xlsx"),
+        file_name="busqueda_contratos.xlsx",
+        mime=FORMATOS["xlsx"]
+    )
 
-    # Saltamos encabezado y separador
-    data_lines = lines[2:]
+# ===============================================================
+# FUNCIONES AUXILIARES: SEGUIMIENTO DE TRABAJOS EN SEGUNDO PLANO
+# ===============================================================
 
-    for line in data_lines:
-        # | Campo | Respuesta |
-        partes = [c.strip() for c in line.strip("|").split("|")]
-        if len(partes) < 2:
-            continue
-        campo, respuesta = partes[0], partes[1]
-        campos[campo] = respuesta
+INTERVALO_SONDEO = 1.0  # segundos entre consultas del estado de los trabajos
 
-    return campos
+ETIQUETAS_ESTADO = {
+    PENDIENTE: "⏳ en cola",
+    EXTRAYENDO: "📄 extrayendo texto",
+    ANALIZANDO: "🤖 analizando con GPT",
+    TERMINADO: "✅ terminado",
+    ERROR: "❌ error",
+}
 
-def crear_excel_ficha(campos_dict):
+@st.fragment(run_every=INTERVALO_SONDEO)
+def seguir_trabajos(ids):
     """
-    Crea un archivo Excel en memoria con una sola fila que corresponde a la ficha del contrato.
-    Devuelve BytesIO listo para usar en st.download_button.
+    Muestra el avance de los trabajos consultando la cola cada INTERVALO_SONDEO
+    segundos; solo este fragmento se re-ejecuta. Cuando todos terminan, recarga
+    la app completa para mostrar los resultados.
     """
-    data = {col: [campos_dict.get(col, "")] for col in HEADERS_CONTRATO}
-    df = pd.DataFrame(data)
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="FichaContrato")
-    buffer.seek(0)
-    return buffer
+    trabajos = get_cola_trabajos().estados(ids)
+    if all(t["estado"] not in ESTADOS_ACTIVOS for t in trabajos):
+        st.rerun()
+
+    if len(trabajos) == 1:
+        trabajo = trabajos[0]
+        st.progress(trabajo["progreso"], text=ETIQUETAS_ESTADO[trabajo["estado"]].capitalize() + "...")
+        if trabajo["campos"]:
+            parcial = {c: trabajo["campos"].get(c, "⏳") for c in HEADERS_CONTRATO}
+            st.markdown("### Ficha en construcción...\n\n" + construir_tabla_markdown(parcial))
+    else:
+        terminados = sum(1 for t in trabajos if t["estado"] not in ESTADOS_ACTIVOS)
+        st.progress(terminados / len(trabajos), text=f"{terminados}/{len(trabajos)} contratos completados")
+        st.markdown("\n".join(f"- {t['nombre']}: {ETIQUETAS_ESTADO[t['estado']]}" for t in trabajos[-15:]))
+    st.caption("Puedes recargar o cerrar la página: el análisis continúa en el servidor.")
 
 # ===============================================================
 # APP PRINCIPAL (LÓGICA DE ANÁLISIS DE CONTRATO)
@@ -320,215 +358,275 @@ if authentication_status:
     st.sidebar.success(f"Bienvenido/a: {name}")
     authenticator.logout("Cerrar sesión", "sidebar")
 
+    # Traza por etapas de esta ejecución (desactivada no mide nada)
+    medir = st.sidebar.checkbox("Medir tiempos por etapa", value=TRAZA_ACTIVA)
+    perfilar = st.sidebar.checkbox("Perfilar esta ejecución (cProfile)", value=False)
+    traza = Traza(activa=medir, perfilar=perfilar)
+    # Lo que midieron los trabajos en el servidor (extracción, GPT, ...), por trabajo mostrado
+    etapas_trabajos = []
+    perfiles_trabajos = []
+
     st.title("📄Análisis Inteligente de Documentos Institucionales")
 
     api_key = st.text_input("Introduce tu clave OpenAI API", type="password")
-    archivo = st.file_uploader("Sube tu contrato PDF", type=["pdf"])
+    modo = st.radio("Modo de análisis", ["Un contrato", "Lote de contratos", "Buscar contratos"], horizontal=True)
+    cache = get_cache_analisis()
+    cola = get_cola_trabajos()
+
+    archivo = archivos = None
+    if modo == "Un contrato":
+        archivo = st.file_uploader("Sube tu contrato PDF", type=["pdf"])
+    elif modo == "Lote de contratos":
+        archivos = st.file_uploader("Sube tus contratos PDF", type=["pdf"], accept_multiple_files=True)
 
     if archivo and api_key:
 
-        client = OpenAI(api_key=api_key)
-
-        # Guardar archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(archivo.read())
-            tmp_path = tmp.name
-
-        st.info("Extrayendo texto del PDF...")
-
-        # 1) Extraer texto con PyMuPDF
-        doc = fitz.open(tmp_path)
-        full_text = ""
-        for page in doc:
-            page_text = page.get_text("text")
-            full_text += page_text + "\n\n"
-
-        # 2) Limpiar texto
-        def limpiar_texto(t):
-            t = re.sub(r"(\w+)-\s*\n\s*(\w+)", r"\1\2", t)
-            t = re.sub(r"\n(?!\n)", " ", t)
-            t = re.sub(r"\s{2,}", " ", t)
-            t = t.replace("�", "").replace("●", "").replace("•", "")
-            return t.strip()
-
-        texto_limpio = limpiar_texto(full_text)
-
-        with st.expander("Mostrar texto extraído (debug)", expanded=False):
-            st.text_area("Texto limpio:", texto_limpio, height=300)
-
-        # 3) Prompt EXACTO que definiste
-        tabla_prompt = f"""
-Eres un perito jurídico experto en contratos de obra pública y adquisiciones del gobierno.
-
-Tienes el texto COMPLETO de un contrato de obra pública. Debes llenar UNA TABLA en formato Markdown
-con dos columnas: "Campo" y "Respuesta", siguiendo EXACTAMENTE esta estructura:
-
-| Campo | Respuesta |
-|-------|-----------|
-| Partes | ... |
-| Objeto | ... |
-| Monto antes de IVA | ... |
-| IVA | ... |
-| Monto total | ... |
-| Fecha de inicio | ... |
-| Fecha de fin | ... |
-| Vigencia/Plazo | ... |
-| Garantía(s) | ... |
-| Obligaciones proveedor | ... |
-| Supervisión | ... |
-| Penalizaciones | ... |
-| Penalización máxima | ... |
-| Modificaciones | ... |
-| Normatividad aplicable | ... |
-| Resolución de controversias | ... |
-| Firmas | ... |
-| Anexos | ... |
-| No localizado | ... |
-| Áreas de mejora | ... |
-
-REGLAS GENERALES:
-- Usa SOLO información que esté en el texto del contrato.
-- NO inventes nada.
-- Si un dato NO aparece claramente en el texto, escribe exactamente: NO LOCALIZADO.
-- NO agregues texto antes ni después de la tabla.
-- Usa SIEMPRE la sintaxis de tabla Markdown (con | y la fila de separación ---).
-
-REGLAS ESPECÍFICAS POR CAMPO:
-
-1) Partes:
-   - Identifica a la dependencia o entidad pública y a la empresa contratista.
-   - Devuelve una sola oración, por ejemplo:
-     Secretaría de Comunicaciones y Obras Públicas del Estado de Durango (“LA DEPENDENCIA”) y ARAM ALTA INGENIERÍA S.A. DE C.V. (“EL CONTRATISTA”).
-
-2) Objeto:
-   - Localiza la cláusula “OBJETO DEL CONTRATO” o similar.
-   - Devuelve una frase que describa la obra, limpia, en una sola oración.
-   - Ejemplo de estilo:
-     Construcción de acceso a la localidad de Fray Francisco Montes de Oca a base de carpeta asfáltica en el municipio de Durango, con trabajos de preliminares, terracerías, pavimentos, estructuras, señalamientos y dispositivos de seguridad.
-
-3) Monto antes de IVA:
-   - Busca el párrafo donde se indique algo como: “El monto total del presente contrato es la cantidad de $ X ... Más el impuesto al valor agregado”.
-   - Devuelve SOLO la cantidad numérica con signo de pesos.
-   - Limpia y normaliza el número: usa SIEMPRE el formato $X,XXX,XXX.XX (comas de miles y dos decimales).
-   - Por ejemplo: $3,436,646.48
-   - NO incluyas el texto en letras, solo el número.
-
-4) IVA:
-   - Si dice literalmente “Más el impuesto al valor agregado”, devuelve exactamente esa frase.
-   - Si se especifica un porcentaje de IVA, escríbelo.
-   - Si no se menciona el IVA, escribe: NO LOCALIZADO.
-
-5) Monto total:
-   - SOLO llena este campo si el contrato indica explícitamente el monto total con IVA desglosado.
-   - Si NO aparece expresado el monto total ya con IVA, escribe: NO LOCALIZADO.
-
-6) Fecha de inicio:
-   - Busca en la cláusula de plazo algo como: “El inicio de la ejecución de los trabajos será el día XX de mes de AAAA”.
-   - Devuelve SOLO la fecha en formato texto, por ejemplo: 28 de octubre de 2024.
-   - NO incluyas frases como “El inicio de la ejecución será el día...”, solo la fecha.
-
-7) Fecha de fin:
-   - Igual que la anterior, pero con la frase “se concluirá a más tardar el día...”.
-   - Devuelve SOLO la fecha, por ejemplo: 10 de enero de 2025.
-
-8) Vigencia/Plazo:
-   - Devuelve SOLO el plazo en forma compacta, por ejemplo: 75 días naturales.
-
-9) Garantía(s):
-   - Busca las cláusulas de “Garantía de Cumplimiento”, “Garantía de Anticipo” y “Vicios Ocultos”.
-   - Resume en UNA ORACIÓN clara los tipos de garantía y sus porcentajes.
-   - Ejemplo de estilo (sólo como referencia de forma, no lo copies si no aplica):
-     Garantía de cumplimiento del 10% del monto total del contrato más IVA y garantía de anticipo mediante fianza del 50% del monto total del contrato incluyendo IVA.
-
-10) Obligaciones proveedor:
-   - Identifica las obligaciones principales de “EL CONTRATISTA”: ejecutar la obra conforme a proyectos y especificaciones, calidad, plazos, cumplimiento de leyes laborales y fiscales, no emplear menores, responder por vicios ocultos, etc.
-   - Devuelve una sola oración que las resuma.
-
-11) Supervisión:
-   - Localiza la referencia al Residente de Obra o figura encargada de revisar y autorizar estimaciones y trabajos.
-   - Devuelve una frase del tipo:
-     La supervisión y autorización de los trabajos y estimaciones está a cargo del Residente de Obra designado por la dependencia.
-
-12) Penalizaciones:
-   - Busca la cláusula de “RETENCIONES Y PENAS CONVENCIONALES” o similar.
-   - Extrae las penalizaciones principales, por ejemplo el 3% de trabajos no ejecutados en tiempo.
-   - Devuelve una oración breve mencionando porcentaje y condición.
-
-13) Penalización máxima:
-   - Si el contrato indica que las penas no pueden exceder cierto límite (por ejemplo, el monto de la garantía de cumplimiento), escríbelo.
-   - Si no se menciona límite máximo, escribe: NO LOCALIZADO.
-
-14) Modificaciones:
-   - Busca la cláusula de modificaciones al contrato (referencias al artículo 72 de la LOPSRMEM, 25% del monto o plazo, etc.).
-   - Devuelve una oración clara del tipo:
-     Modificaciones permitidas hasta el 25% del monto o plazo, conforme al artículo 72 de la LOPSRMEM, sin cambiar la naturaleza del objeto.
-
-15) Normatividad aplicable:
-   - Enumera las principales normas citadas: Constitución, LOPSRMEM, Reglamento Interior, etc.
-   - Escríbelas separadas por punto y coma en una sola línea.
-
-16) Resolución de controversias:
-   - Si el contrato menciona mecanismos específicos (tribunales, sede, ley aplicable), descríbelos brevemente.
-   - Si no se menciona nada, escribe: NO LOCALIZADO.
-
-17) Firmas:
-   - Identifica quién firma por la dependencia y quién firma por el contratista.
-   - Devuelve una sola frase mencionando ambos nombres y cargos.
-   - Si no está claramente en el texto proporcionado, escribe: NO LOCALIZADO.
-
-18) Anexos:
-   - Enumera los anexos que el contrato menciona expresamente (proyecto, catálogo de conceptos, programa de ejecución, etc.).
-   - Escríbelos en una sola línea.
-
-19) No localizado:
-   - En este campo, enumera TODOS los campos de la tabla que hayan quedado como “NO LOCALIZADO”.
-   - Si todos los campos fueron localizados, escribe: Ninguno.
-
-20) Áreas de mejora:
-   - Señala en una o dos frases aspectos del contrato que podrían estar poco claros, ser riesgosos o susceptibles de controversia (por ejemplo: falta de monto total con IVA, falta de detalle en penalizaciones, etc.).
-   - Si no detectas nada relevante, escribe: NO LOCALIZADO.
-
-TEXTO COMPLETO DEL CONTRATO:
-{texto_limpio}
-
-RECUERDA:
-- Devuelve ÚNICAMENTE la tabla Markdown.
-- No incluyas explicaciones, notas ni texto adicional.
-"""
-
-        # Llamada a GPT-5.1 para generar la tabla
-        respuesta = safe_gpt(
-            client,
-            model="gpt-5.1",
-            input_data=[{"role": "user", "content": tabla_prompt}],
-            max_output_tokens=3500
+        # 1) Enviar el PDF a la cola una sola vez por archivo subido; los reruns
+        #    (o un refresh) solo consultan el estado del trabajo
+        enviados = st.session_state.setdefault("trabajos", {})
+        id_trabajo = enviados.get(archivo.file_id)
+        trabajo = cola.estado(id_trabajo) if id_trabajo else None
+        if trabajo is None:
+            with traza.etapa("envio") as datos:
+                pdf_bytes = archivo.getvalue()
+                id_trabajo = cola.enviar(archivo.name, pdf_bytes, api_key, usuario=username,
+                                         trazar=medir, perfilar=perfilar)
+                datos["bytes"] = len(pdf_bytes)
+            enviados[archivo.file_id] = id_trabajo
+            trabajo = cola.estado(id_trabajo)
+
+        if trabajo["estado"] in ESTADOS_ACTIVOS:
+            seguir_trabajos([id_trabajo])
+
+        elif trabajo["estado"] == ERROR:
+            st.error(f"Error al analizar el contrato: {trabajo['error']}")
+            if st.button("🔁 Reintentar"):
+                del enviados[archivo.file_id]
+                st.rerun()
+
+        else:
+            tabla, campos_dict = trabajo["tabla"], trabajo["campos"]
+            metricas_analisis = trabajo["metricas"]
+
+            if metricas_analisis.get("desde_cache"):
+                st.info("Análisis recuperado de la caché (sin volver a consultar a GPT).")
+            duplicado = metricas_analisis.get("duplicado")
+            if duplicado:
+                cambiados = duplicado["campos_cambiados"]
+                st.info(
+                    f"Casi idéntico a «{duplicado['nombre']}» ({duplicado['similitud']:.0%} de similitud): "
+                    f"se reutilizó su ficha y se reconsultaron {len(cambiados)} campos"
+                    + (f" ({', '.join(cambiados)})." if cambiados else ".")
+                )
+                with st.expander("Mostrar diferencias con el contrato anterior", expanded=False):
+                    st.code(duplicado["diff"] or "Sin diferencias en el texto.", language="diff")
+            if metricas_analisis.get("paginas"):
+                st.caption(
+                    f"{metricas_analisis['paginas']} páginas extraídas en "
+                    f"{metricas_analisis['segundos_extraccion']:.2f}s."
+                    + (f" {metricas_analisis['paginas_ocr']} escaneadas leídas con OCR "
+                       f"({metricas_analisis['paginas_ocr_cache']} desde la caché) en "
+                       f"{metricas_analisis['segundos_ocr']:.1f}s." if metricas_analisis.get("paginas_ocr") else "")
+                )
+            if metricas_analisis.get("paginas_ocr_fallidas"):
+                st.warning(f"El OCR falló en {metricas_analisis['paginas_ocr_fallidas']} páginas escaneadas; "
+                           "se usó su capa de texto original.")
+            with st.expander("Mostrar texto extraído (debug)", expanded=False):
+                st.text_area("Texto limpio:", cola.texto(id_trabajo) or "", height=300)
+            if "ttft_s" in metricas_analisis:
+                st.caption(
+                    f"Primer token en {metricas_analisis['ttft_s']:.1f}s · "
+                    f"respuesta completa en {metricas_analisis.get('stream_s', 0):.1f}s."
+                )
+            locales = [c for c, conf in metricas_analisis.get("campos_locales", {}).items()
+                       if conf >= UMBRAL_CONFIANZA]
+            if locales:
+                st.caption(f"Resueltos con reglas locales (sin GPT): {', '.join(locales)}.")
+            if metricas_analisis.get("tokens_ahorrados"):
+                st.caption(
+                    f"Índice de cláusulas: se enviaron ~{metricas_analisis['tokens_enviados']:,} de "
+                    f"~{metricas_analisis['tokens_texto']:,} tokens del contrato "
+                    f"(ahorro de ~{metricas_analisis['tokens_ahorrados']:,})."
+                )
+            uso = metricas_analisis.get("uso")
+            if uso:
+                st.caption(
+                    f"Tokens: {uso['entrada']:,} de entrada ({proporcion_cache(uso):.0%} en caché) · "
+                    f"{uso['salida']:,} de salida."
+                )
+            cascada = metricas_analisis.get("cascada")
+            if cascada:
+                motivos = "; ".join(f"{campo}: {motivo}" for campo, motivo in cascada["motivos"].items())
+                st.caption(
+                    f"Cascada: {len(cascada['campos_escalados'])} campos escalados al modelo grande"
+                    + (f" ({motivos})" if motivos else "") + " · " + " · ".join(
+                        f"{nivel['modelo']} {nivel['segundos']:.1f}s, {nivel['uso'].get('salida', 0):,} tokens de salida"
+                        for nivel in cascada["niveles"]
+                    )
+                )
+            if not metricas_analisis.get("stream_completo", True):
+                st.warning("La respuesta de GPT se interrumpió; se muestran solo los campos recibidos.")
+            elif metricas_analisis.get("parseo_fallido"):
+                st.warning(
+                    "La respuesta de GPT no era una ficha válida "
+                    f"({metricas_analisis.get('error_parseo', 'sin detalle')}); se muestran solo los campos "
+                    "rescatados y no se guardó en la caché ni en el almacén."
+                )
+            if metricas_analisis.get("etapas"):
+                etapas_trabajos.append(metricas_analisis["etapas"])
+            if metricas_analisis.get("perfil"):
+                perfiles_trabajos.append(metricas_analisis["perfil"])
+
+            st.success("¡Análisis completado!")
+            st.markdown("### Ficha estandarizada del contrato:")
+            st.markdown(tabla)
+
+            # Reconsulta puntual: solo los campos faltantes, con sus pasajes del texto
+            reanalisis = metricas_analisis.get("reanalisis")
+            if reanalisis:
+                uso_reanalisis = reanalisis.get("uso") or {}
+                st.caption(
+                    f"Reconsulta: {len(reanalisis['campos_recuperados'])} de {len(reanalisis['campos_pedidos'])} "
+                    f"campos recuperados con ~{reanalisis.get('tokens_enviados') or 0:,} tokens del contrato "
+                    f"({uso_reanalisis.get('entrada', 0):,} de entrada, {uso_reanalisis.get('salida', 0):,} de salida)."
+                )
+            if trabajo["error"]:
+                st.warning(trabajo["error"])
+            faltantes = campos_no_localizados(campos_dict) + campos_dudosos(campos_dict)
+            if faltantes and st.button(
+                f"🔎 Reconsultar solo los campos faltantes ({len(faltantes)})", help=", ".join(faltantes)
+            ):
+                if cola.reanalizar(id_trabajo, api_key):
+                    st.rerun()
+                st.warning("El texto de este contrato ya no está guardado; vuelve a subirlo para reconsultarlo.")
+
+            # Botones de exportación
+            st.markdown("---")
+            col1, col2 = st.columns(2)
+
+            with col1:
+                if st.button("📤 Exportar a Google Sheets"):
+                    with traza.etapa("exportar_sheets", fichas=1):
+                        exportar_a_google_sheets(campos_dict)
+
+            with col2:
+                with traza.etapa("exportar_excel") as datos:
+                    buffer_excel = crear_excel_ficha(campos_dict)
+                    datos["bytes"] = buffer_excel.getbuffer().nbytes
+                st.download_button(
+                    "💾 Descargar ficha (Excel)",
+                    data=buffer_excel,
+                    file_name="ficha_contrato.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+
+    elif modo == "Lote de contratos" and archivos and api_key:
+
+        formato_registro = st.selectbox("Formato del registro consolidado", formatos_disponibles())
+
+        if st.button(f"🚀 Analizar lote ({len(archivos)} contratos)"):
+            # Cada contrato es un trabajo independiente; los ids se guardan en sesión
+            with traza.etapa("envio_lote", archivos=len(archivos)):
+                st.session_state["lote"] = [
+                    cola.enviar(a.name, a.getvalue(), api_key, usuario=username, trazar=medir, perfilar=perfilar)
+                    for a in archivos
+                ]
+            st.session_state.pop("registro_lote", None)
+
+        ids_lote = st.session_state.get("lote")
+        resultados = cola.estados(ids_lote) if ids_lote else []
+        if any(t["estado"] in ESTADOS_ACTIVOS for t in resultados):
+            seguir_trabajos(ids_lote)
+        elif resultados:
+            errores = [t for t in resultados if t["estado"] == ERROR]
+            st.success(f"Lote completado: {len(resultados) - len(errores)} fichas, {len(errores)} errores.")
+            for t in errores:
+                st.error(f"{t['nombre']}: {t['error']}")
+            uso_lote = {}
+            for t in resultados:
+                if t["metricas"].get("uso"):
+                    sumar_uso(uso_lote, t["metricas"]["uso"])
+                if t["metricas"].get("etapas"):
+                    etapas_trabajos.append(t["metricas"]["etapas"])
+                if t["metricas"].get("perfil"):
+                    perfiles_trabajos.append(f"{t['nombre']}\n{t['metricas']['perfil']}")
+            if uso_lote:
+                st.caption(
+                    f"Tokens del lote: {uso_lote['entrada']:,} de entrada "
+                    f"({proporcion_cache(uso_lote):.0%} en caché) · {uso_lote['salida']:,} de salida."
+                )
+
+            completos = [t for t in resultados if t["estado"] != ERROR]
+            filas = [
+                {"Archivo": t["nombre"], **{col: t["campos"].get(col, "") for col in HEADERS_CONTRATO}}
+                for t in completos
+            ]
+            st.dataframe(filas)
+
+            # El registro se escribe fila por fila (memoria constante) y se guarda
+            # en sesión para no regenerarlo en cada rerun
+            registro_lote = st.session_state.get("registro_lote")
+            if registro_lote is None or registro_lote[:2] != (formato_registro, tuple(ids_lote)):
+                with traza.etapa("exportar_registro", fichas=len(filas)):
+                    registro = BytesIO()
+                    with ExportadorFichas(registro, formato_registro, ["Archivo"] + HEADERS_CONTRATO) as exp:
+                        for fila in filas:
+                            exp.escribir(fila)
+                registro_lote = (formato_registro, tuple(ids_lote), registro.getvalue())
+                st.session_state["registro_lote"] = registro_lote
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("📤 Exportar lote a Google Sheets"):
+                    fichas = [t["campos"] for t in completos]
+                    with traza.etapa("exportar_sheets", fichas=len(fichas)):
+                        exportar_a_google_sheets(fichas)
+            with col2:
+                formato, _, datos = registro_lote
+                st.download_button(
+                    f"💾 Descargar registro ({formato})",
+                    data=datos,
+                    file_name=f"registro_contratos.{formato}",
+                    mime=FORMATOS[formato]
+                )
+
+    elif modo == "Buscar contratos":
+        buscar_contratos()
+
+    stats_cache = cache.estadisticas()
+    st.sidebar.caption(
+        f"Caché de análisis: {stats_cache['hits']} aciertos / {stats_cache['misses']} fallos "
+        f"({stats_cache['entradas']} contratos)"
+    )
+    st.sidebar.caption(f"Trabajos en curso en el servidor: {cola.en_curso()}")
+    stats_gpt = limitador_global().estadisticas()
+    st.sidebar.caption(
+        f"Cola OpenAI: {stats_gpt['en_cola']} en espera · {stats_gpt['reintentos']} reintentos · "
+        f"espera media {stats_gpt['espera_media_s']:.1f}s (máx. {stats_gpt['espera_max_s']:.1f}s)"
+    )
+    stats_uso = contador_uso_global().estadisticas()
+    st.sidebar.caption(
+        f"Tokens OpenAI: {stats_uso['entrada']:,} de entrada "
+        f"({stats_uso['proporcion_cache']:.0%} en caché) · {stats_uso['salida']:,} de salida"
+    )
+
+    # Etapas de los trabajos (sumadas si es un lote) seguidas de las de la app en esta ejecución
+    etapas = {}
+    for resumen in etapas_trabajos + [traza.resumen()]:
+        for etapa, segundos in resumen.items():
+            if etapa != "total":
+                etapas[etapa] = etapas.get(etapa, 0.0) + segundos
+    if etapas:
+        etapas["total"] = sum(etapas.values())
+        st.sidebar.markdown("**Tiempos por etapa**")
+        st.sidebar.dataframe(
+            [{"Etapa": e, "Segundos": round(s, 3)} for e, s in etapas.items()],
+            hide_index=True
         )
-
-        tabla = respuesta.output_text
-
-        st.success("¡Análisis completado!")
-        st.markdown("### Ficha estandarizada del contrato:")
-        st.markdown(tabla)
-
-        # Parsear la tabla Markdown a dict
-        campos_dict = parse_markdown_table(tabla)
-
-        # Botones de exportación
-        st.markdown("---")
-        col1, col2 = st.columns(2)
-
-        with col1:
-            if st.button("📤 Exportar a Google Sheets"):
-                exportar_a_google_sheets(campos_dict)
-
-        with col2:
-            buffer_excel = crear_excel_ficha(campos_dict)
-            st.download_button(
-                "💾 Descargar ficha (Excel)",
-                data=buffer_excel,
-                file_name="ficha_contrato.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+    if perfilar:
+        with st.sidebar.expander("Perfil cProfile de esta ejecución"):
+            perfil = "\n".join(p for p in perfiles_trabajos + [traza.reporte_perfil()] if p)
+            st.code(perfil or "Sin etapas medidas en esta ejecución.")
 
 else:
     if authentication_status is False:
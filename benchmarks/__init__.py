@@ -0,0 +1,9 @@
+"""
+Benchmarks del pipeline. Se ejecutan desde la raíz del repo, p. ej.:
+    python -m benchmarks.bench_limpieza
+    python -m benchmarks.bench_pipeline --contratos 40 --comparar benchmarks/resultados/anterior.json
+
+bench_pipeline corre todo el pipeline sin red: contratos sintéticos (corpus)
+contra servidores falsos de OpenAI y Sheets (servidores) y guarda los
+resultados en benchmarks/resultados/*.json.
+"""
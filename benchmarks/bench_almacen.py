@@ -0,0 +1,86 @@
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from contratos.almacen import AlmacenFichas
+from contratos.extractores import formatear_fecha, formatear_monto
+from contratos.prompts import HEADERS_CONTRATO
+
+# ===============================================================
+# BENCHMARK: BÚSQUEDA EN EL ALMACÉN DE FICHAS (100K CONTRATOS)
+# ===============================================================
+
+FICHAS = 100_000
+REPETICIONES = 20
+OBJETIVO_MS = 100
+
+CONTRATISTAS = [
+    "ARAM ALTA INGENIERÍA S.A. DE C.V.", "CONSTRUCTORA DEL SURESTE, S.A. DE C.V.",
+    "GRUPO CONSTRUCTOR NORTE S.A. DE C.V.", "INFRAESTRUCTURA Y CAMINOS S. DE R.L. DE C.V.",
+] + [f"CONSTRUCTORA {i:04d} S.A. DE C.V." for i in range(2000)]
+OBRAS = (
+    "Construcción de acceso a la localidad a base de carpeta asfáltica",
+    "Rehabilitación de la red de agua potable y alcantarillado",
+    "Pavimentación con concreto hidráulico de calles",
+    "Ampliación de la clínica de salud y obras complementarias",
+    "Construcción de puente vehicular sobre el río",
+)
+
+
+def ficha_sintetica(rng, i):
+    inicio = date(2020, 1, 1) + timedelta(days=rng.randrange(6 * 365))
+    campos = {c: "NO LOCALIZADO" for c in HEADERS_CONTRATO}
+    campos.update({
+        "Partes": f"Secretaría de Obras Públicas del Estado (“LA DEPENDENCIA”) y "
+                  f"{rng.choice(CONTRATISTAS)} (“EL CONTRATISTA”).",
+        "Objeto": f"{rng.choice(OBRAS)} en el municipio {i % 570}.",
+        "Monto antes de IVA": formatear_monto(rng.randrange(100_000_00, 80_000_000_00) / 100),
+        "Fecha de inicio": formatear_fecha(inicio),
+        "Fecha de fin": formatear_fecha(inicio + timedelta(days=rng.randrange(30, 400))),
+        "Obligaciones proveedor": "Ejecutar los trabajos conforme al proyecto y a las especificaciones.",
+    })
+    return campos
+
+
+def medir(almacen, descripcion, **filtros):
+    almacen.buscar(**filtros)  # calentamiento (caché de páginas de SQLite)
+    tiempos = []
+    for _ in range(REPETICIONES):
+        t0 = time.perf_counter()
+        resultados = almacen.buscar(**filtros)
+        tiempos.append(time.perf_counter() - t0)
+    tiempos.sort()
+    p50, p95 = tiempos[len(tiempos) // 2] * 1000, tiempos[int(len(tiempos) * 0.95) - 1] * 1000
+    marca = "ok" if p95 < OBJETIVO_MS else "LENTO"
+    print(f"{descripcion:>52} {len(resultados):>6} {p50:>8.1f} {p95:>8.1f}  {marca}")
+
+
+def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = AlmacenFichas(directorio)
+        t0 = time.perf_counter()
+        for inicio in range(0, FICHAS, 5000):
+            almacen.guardar_muchas(
+                (ficha_sintetica(rng, i), f"clave-{i}", f"contrato_{i}.pdf")
+                for i in range(inicio, min(inicio + 5000, FICHAS))
+            )
+        segundos = time.perf_counter() - t0
+        tamano = os.path.getsize(almacen.ruta) / 1e6
+        print(f"{FICHAS:,} fichas guardadas en {segundos:.1f}s ({FICHAS / segundos:,.0f}/s), {tamano:.0f} MB\n")
+
+        print(f"{'consulta':>52} {'filas':>6} {'p50 ms':>8} {'p95 ms':>8}")
+        medir(almacen, "contratista + monto > $3M + fin en 2025",
+              contratista="ARAM ALTA INGENIERÍA", monto_min=3_000_000,
+              fin_desde=date(2025, 1, 1), fin_hasta=date(2025, 12, 31))
+        medir(almacen, "texto 'puente vehicular'", texto="puente vehicular")
+        medir(almacen, "texto 'agua potable' + monto > $50M", texto="agua potable", monto_min=50_000_000)
+        medir(almacen, "monto entre $1M y $2M", monto_min=1_000_000, monto_max=2_000_000)
+        medir(almacen, "inicio en marzo 2024", inicio_desde=date(2024, 3, 1), inicio_hasta=date(2024, 3, 31))
+        medir(almacen, "sin filtros (los 100 de mayor monto)")
+
+
+if __name__ == "__main__":
+    main()
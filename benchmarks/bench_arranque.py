@@ -0,0 +1,103 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# ===============================================================
+# BENCHMARK: ARRANQUE EN FRÍO DE LA BIBLIOTECA Y DE LA CLI
+# ===============================================================
+# Cada caso corre en un intérprete nuevo (como cron o un script) y se compara
+# contra su presupuesto. Si alguno se pasa, se listan los módulos que más
+# tardan según `python -X importtime` y el script termina con código 1.
+
+REPETICIONES = 7
+
+CASOS = (
+    # (nombre, argumentos del intérprete, presupuesto en ms)
+    ("python vacío", ["-c", "pass"], None),
+    ("import contratos.analisis", ["-c", "import contratos.analisis"], 150),
+    ("import contratos.lotes", ["-c", "import contratos.lotes"], 150),
+    ("import contratos.trabajos", ["-c", "import contratos.trabajos"], 150),
+    ("contratos --help", ["-m", "contratos", "--help"], 150),
+    ("contratos analyze sin PDFs", ["-m", "contratos", "analyze", "no-existe.pdf"], 150),
+)
+
+# Estos no deben cargarse al importar la biblioteca: solo en la etapa que los usa
+PESADOS = ("openai", "fitz", "pymupdf", "pandas", "xlsxwriter", "pyarrow", "streamlit")
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _correr(argumentos, importtime=False):
+    comando = [sys.executable] + (["-X", "importtime"] if importtime else []) + argumentos
+    t0 = time.perf_counter()
+    proceso = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True)
+    return (time.perf_counter() - t0) * 1000, proceso
+
+
+def medir(argumentos, repeticiones=REPETICIONES):
+    _correr(argumentos)  # calienta la caché de disco y los .pyc
+    tiempos = [_correr(argumentos)[0] for _ in range(repeticiones)]
+    return {"min_ms": min(tiempos), "p50_ms": statistics.median(tiempos), "max_ms": max(tiempos)}
+
+
+def modulos_lentos(argumentos, cantidad=10):
+    """
+    Los `cantidad` módulos de mayor tiempo acumulado según -X importtime.
+    """
+    _, proceso = _correr(argumentos, importtime=True)
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, modulo = linea.split("|")
+        filas.append((int(acumulado), modulo.rstrip()))
+    return sorted(filas, reverse=True)[:cantidad]
+
+
+def pesados_cargados(modulo):
+    codigo = (
+        f"import sys, {modulo}; "
+        f"print(' '.join(m for m in {PESADOS!r} if m in sys.modules))"
+    )
+    _, proceso = _correr(["-c", codigo])
+    return proceso.stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arranque en frío de contratos (import y CLI).")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    args = parser.parse_args(argv)
+
+    base = None
+    excedidos = []
+    print(f"{'caso':>30} {'min ms':>8} {'p50 ms':>8} {'propio':>8} {'presupuesto':>12}")
+    for nombre, argumentos, presupuesto in CASOS:
+        datos = medir(argumentos, args.repeticiones)
+        if base is None:
+            base = datos["p50_ms"]
+        propio = datos["p50_ms"] - base
+        marca = ""
+        if presupuesto is not None:
+            marca = f"{presupuesto:>9} ms" + (" ✗" if datos["p50_ms"] > presupuesto else " ✓")
+            if datos["p50_ms"] > presupuesto:
+                excedidos.append((nombre, argumentos))
+        print(f"{nombre:>30} {datos['min_ms']:>8.1f} {datos['p50_ms']:>8.1f} {propio:>8.1f} {marca:>12}")
+
+    for modulo in ("contratos.analisis", "contratos.lotes", "contratos.trabajos", "contratos.cli"):
+        cargados = pesados_cargados(modulo)
+        if cargados:
+            print(f"\n{modulo} carga módulos pesados al importarse: {', '.join(cargados)}")
+            excedidos.append((f"import {modulo}", ["-c", f"import {modulo}"]))
+
+    for nombre, argumentos in excedidos:
+        print(f"\nMódulos más lentos en «{nombre}» (acumulado):")
+        for acumulado, modulo in modulos_lentos(argumentos):
+            print(f"{acumulado / 1000:>10.1f} ms  {modulo}")
+    return 1 if excedidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
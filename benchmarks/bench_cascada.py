@@ -0,0 +1,179 @@
+import argparse
+import random
+import re
+import sys
+import time
+from datetime import timedelta
+
+from openai import OpenAI
+
+from benchmarks.bench_pipeline import medir_uno_a_uno, percentil, resumir
+from benchmarks.corpus import texto_contrato
+from benchmarks.servidores import OpenAIFalso
+from contratos import limites
+from contratos.analisis import MODELO_ANALISIS, analizar_texto
+from contratos.cascada import MODELO_RAPIDO, analizar_en_cascada
+from contratos.extractores import extraer_campos_locales, formatear_fecha, normalizar_monto, parsear_fecha
+from contratos.limpieza import limpiar_texto
+
+# ===============================================================
+# BENCHMARK: CASCADA DE MODELOS VS TODO CON EL MODELO GRANDE
+# ===============================================================
+# OpenAIModelosFalso "lee" monto, fechas y plazo del texto que recibe (con
+# las reglas de contratos.extractores). El modelo rápido responde antes pero
+# se equivoca en una fracción --prob-error de esos campos (formato del monto,
+# fecha corrida un mes, "dias" sin acento, total mal sumado) y omite algunos
+# campos de texto; el grande siempre acierta. Se comparan latencia, tokens
+# por modelo, tasa de escalamiento y aciertos en los campos verificables:
+#
+#   python -m benchmarks.bench_cascada --contratos 100 --prob-error 0.1
+#
+# Las reglas locales se desactivan (usar_reglas=False): si no, monto, fechas
+# y plazo no llegarían a ningún modelo y no habría nada que validar.
+
+CONTRATOS = 100
+PROB_ERROR = 0.1
+PROB_OMISION = 0.05
+LATENCIAS = {MODELO_RAPIDO: 0.15, MODELO_ANALISIS: 0.6}
+
+RE_TOTAL = re.compile(r"dando un total de \$\s*([\d,.]+\d)")
+CAMPOS_VERIFICABLES = ("Monto antes de IVA", "Monto total", "Fecha de inicio", "Fecha de fin", "Vigencia/Plazo")
+
+
+def corromper(campo, valor, rng):
+    if campo == "Monto antes de IVA":
+        return valor.replace("$", "").replace(",", "") + " pesos"
+    if campo == "Monto total":
+        return f"${normalizar_monto(valor[1:]) * 2:,.2f}"
+    if campo in ("Fecha de inicio", "Fecha de fin"):
+        return formatear_fecha(parsear_fecha(valor) + timedelta(days=rng.choice((-31, 31))))
+    return valor.replace("días", "dias")
+
+
+class OpenAIModelosFalso(OpenAIFalso):
+    """
+    OpenAIFalso que distingue modelos: latencia por modelo (`latencias`) y,
+    para los modelos distintos de MODELO_ANALISIS, errores en los campos
+    verificables con probabilidad `prob_error` y NO LOCALIZADO en los demás
+    con probabilidad `prob_omision`.
+    """
+
+    def __init__(self, latencias, prob_error, prob_omision, **kwargs):
+        super().__init__(**kwargs)
+        self.latencias = latencias
+        self.prob_error = prob_error
+        self.prob_omision = prob_omision
+        self._rng_errores = random.Random(kwargs.get("semilla", 0) + 2)
+
+    def responder(self, manejador, ruta, cuerpo):
+        time.sleep(self.latencias.get(cuerpo.get("model"), 0.0))
+        super().responder(manejador, ruta, cuerpo)
+
+    def valores(self, cuerpo, pedidos):
+        valores = super().valores(cuerpo, pedidos)
+        texto = cuerpo["input"][-1]["content"]
+        leidos = {campo: valor for campo, (valor, _) in extraer_campos_locales(texto).items()}
+        m = RE_TOTAL.search(texto)
+        if m:
+            leidos["Monto total"] = f"${normalizar_monto(m.group(1)):,.2f}"
+        grande = cuerpo.get("model") == MODELO_ANALISIS
+        for campo in pedidos:
+            if campo in CAMPOS_VERIFICABLES:
+                valores[campo] = leidos.get(campo, "NO LOCALIZADO")
+            with self._lock:
+                sorteo = self._rng_errores.random()
+            if grande:
+                continue
+            if campo in leidos and campo in CAMPOS_VERIFICABLES and sorteo < self.prob_error:
+                valores[campo] = corromper(campo, valores[campo], self._rng_errores)
+            elif campo not in CAMPOS_VERIFICABLES and sorteo < self.prob_omision:
+                valores[campo] = "NO LOCALIZADO"
+        return valores
+
+
+def esperados(datos):
+    return {
+        "Monto antes de IVA": f"${datos['monto']}",
+        "Monto total": f"${datos['total']}",
+        "Fecha de inicio": datos["inicio"],
+        "Fecha de fin": datos["fin"],
+        "Vigencia/Plazo": f"{datos['plazo']} días naturales",
+    }
+
+
+def bench_modo(contratos, cascada, concurrencia, prob_error, prob_omision):
+    with OpenAIModelosFalso(LATENCIAS, prob_error, prob_omision) as servidor:
+        client = OpenAI(api_key="falsa", base_url=servidor.url + "/v1", max_retries=0)
+        resultados = []
+
+        def analizar(contrato):
+            texto, datos = contrato
+            metricas = {}
+            if cascada:
+                _, campos = analizar_en_cascada(client, texto, metricas=metricas, usar_reglas=False)
+            else:
+                _, campos = analizar_texto(client, texto, usar_reglas=False, metricas=metricas)
+            aciertos = sum(1 for c, v in esperados(datos).items() if campos.get(c) == v)
+            resultados.append((metricas, aciertos))
+
+        _, latencias, total = medir_uno_a_uno(analizar, contratos, concurrencia)
+        niveles = {}
+        for metricas, _ in resultados:
+            for nivel in metricas.get("cascada", {}).get("niveles", []):
+                datos = niveles.setdefault(nivel["modelo"], {"peticiones": 0, "segundos": [], "salida": 0,
+                                                             "entrada": 0})
+                datos["peticiones"] += 1
+                datos["segundos"].append(nivel["segundos"])
+                datos["entrada"] += nivel["uso"].get("entrada", 0)
+                datos["salida"] += nivel["uso"].get("salida", 0)
+        tasas = [m["cascada"]["tasa_escalamiento"] for m, _ in resultados if "cascada" in m]
+        return resumir(
+            latencias, total,
+            aciertos=sum(a for _, a in resultados),
+            verificables=len(CAMPOS_VERIFICABLES) * len(contratos),
+            tokens_entrada=sum(m.get("uso", {}).get("entrada", 0) for m, _ in resultados),
+            tokens_salida=sum(m.get("uso", {}).get("salida", 0) for m, _ in resultados),
+            tasa_escalamiento=round(sum(tasas) / len(tasas), 3) if tasas else None,
+            contratos_escalados=sum(1 for m, _ in resultados if m.get("cascada", {}).get("campos_escalados")),
+            niveles={
+                modelo: {"peticiones": d["peticiones"], "p50_s": percentil(d["segundos"], 50),
+                         "entrada": d["entrada"], "salida": d["salida"]}
+                for modelo, d in niveles.items()
+            },
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cascada de modelos vs todo con el modelo grande.")
+    parser.add_argument("--contratos", type=int, default=CONTRATOS)
+    parser.add_argument("--prob-error", type=float, default=PROB_ERROR)
+    parser.add_argument("--prob-omision", type=float, default=PROB_OMISION)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    limites._limitador_global = limites.LimitadorTokens(100000, 100000000)
+    contratos = []
+    for semilla in range(args.contratos):
+        texto, datos = texto_contrato(12, 0, semilla)
+        contratos.append((limpiar_texto(texto), datos))
+
+    resultados = {
+        "grande": bench_modo(contratos, False, args.concurrencia, args.prob_error, args.prob_omision),
+        "cascada": bench_modo(contratos, True, args.concurrencia, args.prob_error, args.prob_omision),
+    }
+    print(f"{'modo':>8} {'p50 ms':>8} {'p95 ms':>8} {'aciertos':>10} {'entrada':>9} {'salida':>8} {'escalados':>10}")
+    for modo, datos in resultados.items():
+        escalados = f"{datos['tasa_escalamiento']:.1%}" if datos["tasa_escalamiento"] is not None else "-"
+        print(f"{modo:>8} {datos['p50_ms']:>8.1f} {datos['p95_ms']:>8.1f} "
+              f"{datos['aciertos']:>5}/{datos['verificables']:<4} {datos['tokens_entrada']:>9,} "
+              f"{datos['tokens_salida']:>8,} {escalados:>10}")
+    cascada = resultados["cascada"]
+    print(f"\nContratos con algún campo escalado: {cascada['contratos_escalados']}/{args.contratos}")
+    for modelo, nivel in cascada["niveles"].items():
+        print(f"  {modelo:>12}: {nivel['peticiones']} peticiones, p50 {nivel['p50_s']:.2f}s, "
+              f"{nivel['entrada']:,} tokens de entrada, {nivel['salida']:,} de salida")
+    return resultados
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
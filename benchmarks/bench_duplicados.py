@@ -0,0 +1,122 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_pipeline import percentil
+from benchmarks.corpus import texto_contrato
+from contratos.duplicados import NUM_PERMUTACIONES, IndiceDuplicados, campos_cambiados
+from contratos.limpieza import limpiar_texto
+
+# ===============================================================
+# BENCHMARK: DETECCIÓN DE CASI DUPLICADOS (MINHASH + LSH, 100K CONTRATOS)
+# ===============================================================
+# El índice se llena con CONTRATOS_REALES contratos sintéticos (texto real)
+# más firmas aleatorias hasta llegar a --contratos, y se consulta con:
+#   - re-escaneos de los reales (errores de OCR en una fracción de caracteres),
+#     que deben encontrar su original sin reconsultar casi ningún campo;
+#   - convenios con otro monto, que además deben cambiar solo los campos de monto;
+#   - contratos nuevos, que no deben coincidir con nada.
+#
+#   python -m benchmarks.bench_duplicados --contratos 100000 --ruido 0.002
+
+CONTRATOS = 100_000
+CONTRATOS_REALES = 200
+RUIDO = 0.002              # fracción de caracteres alterados en un re-escaneo
+OBJETIVO_MS = 50
+CAMPOS_MONTO_ESPERADOS = {"Monto antes de IVA", "IVA", "Monto total"}
+MAX_CAMPOS_REESCANEO = 0.5  # promedio de campos reconsultados por re-escaneo
+
+
+def reescanear(texto, rng, ruido):
+    """
+    Simula un re-escaneo: cambia una fracción `ruido` de las letras por otras.
+    """
+    letras = list(texto)
+    for i in rng.sample(range(len(letras)), int(len(letras) * ruido)):
+        if letras[i].isalpha():
+            letras[i] = rng.choice("aeilnorstuc")
+    return "".join(letras)
+
+
+def llenar(indice, reales, total):
+    import numpy as np
+
+    t0 = time.perf_counter()
+    indice.agregar_muchos((f"real-{i}", texto, {}, f"real_{i}.pdf", None) for i, texto in enumerate(reales))
+    rng = np.random.default_rng(0)
+    for inicio in range(len(reales), total, 5000):
+        n = min(5000, total - inicio)
+        firmas = rng.integers(0, 2 ** 32, (n, NUM_PERMUTACIONES), dtype=np.uint64).astype("<u4")
+        indice.agregar_muchos(
+            (f"azar-{inicio + j}", f"contrato {inicio + j}", {}, f"azar_{inicio + j}.pdf", firmas[j].tobytes())
+            for j in range(n)
+        )
+    return time.perf_counter() - t0
+
+
+def consultar(indice, textos):
+    tiempos, resultados, candidatos = [], [], []
+    for texto in textos:
+        metricas = {}
+        t0 = time.perf_counter()
+        resultados.append(indice.buscar(texto, metricas=metricas))
+        tiempos.append(time.perf_counter() - t0)
+        candidatos.append(metricas["candidatos"])
+    return tiempos, resultados, candidatos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Casi duplicados con MinHash + LSH.")
+    parser.add_argument("--contratos", type=int, default=CONTRATOS)
+    parser.add_argument("--reales", type=int, default=CONTRATOS_REALES)
+    parser.add_argument("--ruido", type=float, default=RUIDO)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    originales = [texto_contrato(20, 40, semilla) for semilla in range(args.reales)]
+    reales = [limpiar_texto(texto) for texto, _ in originales]
+    reescaneos = [reescanear(texto, rng, args.ruido) for texto in reales]
+    convenios = [
+        limpiar_texto(texto.replace(datos["monto"], "1,234,567.89").replace(datos["total"], "1,432,098.75"))
+        for texto, datos in originales
+    ]
+    nuevos = [limpiar_texto(texto_contrato(20, 40, semilla)[0])
+              for semilla in range(args.reales, 2 * args.reales)]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        indice = IndiceDuplicados(directorio)
+        segundos = llenar(indice, reales, args.contratos)
+        tamano = os.path.getsize(indice.ruta) / 1e6
+        print(f"{indice.contar():,} contratos indexados en {segundos:.1f}s "
+              f"({args.contratos / segundos:,.0f}/s), {tamano:.0f} MB\n")
+
+        print(f"{'consulta':>12} {'aciertos':>9} {'candidatos':>11} {'p50 ms':>8} {'p95 ms':>8}")
+        for nombre, textos, esperado in (("re-escaneo", reescaneos, True), ("convenio", convenios, True),
+                                         ("nuevo", nuevos, False)):
+            tiempos, resultados, candidatos = consultar(indice, textos)
+            if esperado:
+                aciertos = sum(1 for i, r in enumerate(resultados) if r and r["clave"] == f"real-{i}")
+            else:
+                aciertos = sum(1 for r in resultados if r is None)
+            p95 = percentil(tiempos, 95) * 1000
+            marca = "ok" if p95 < OBJETIVO_MS else "LENTO"
+            print(f"{nombre:>12} {aciertos:>5}/{len(textos):<3} {sum(candidatos) / len(textos):>11.1f} "
+                  f"{percentil(tiempos, 50) * 1000:>8.2f} {p95:>8.2f}  {marca}")
+
+    exactos = sum(1 for texto, convenio in zip(reales, convenios)
+                  if set(campos_cambiados(texto, convenio)) == CAMPOS_MONTO_ESPERADOS)
+    print(f"\nConvenios en que solo cambian los campos de monto: {exactos}/{len(convenios)}")
+    cambiados = [len(campos_cambiados(texto, r)) for texto, r in zip(reales, reescaneos)]
+    promedio = sum(cambiados) / len(cambiados)
+    print(f"Campos a reconsultar por re-escaneo: {promedio:.2f} en promedio")
+    if promedio > MAX_CAMPOS_REESCANEO:
+        print(f"ERROR: un re-escaneo reconsulta {promedio:.2f} campos (máximo {MAX_CAMPOS_REESCANEO})",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from contratos.analisis import HEADERS_CONTRATO
+from contratos.exportar import FORMATOS, ExportadorFichas
+
+# ===============================================================
+# BENCHMARK: EXPORTACIÓN MASIVA DE FICHAS (TIEMPO Y MEMORIA)
+# ===============================================================
+
+CANTIDADES = (1000, 10000)
+
+
+def ficha_sintetica(i):
+    return {
+        campo: f"{campo} del contrato {i}: " + "texto de ejemplo de la ficha " * 4
+        for campo in HEADERS_CONTRATO
+    }
+
+
+def _exportar(formato, n, ruta):
+    with ExportadorFichas(ruta, formato) as exp:
+        for i in range(n):
+            exp.escribir(ficha_sintetica(i))  # la ficha se genera y se descarta: flujo real
+
+
+def _exportar_pandas(n, ruta):
+    """
+    Referencia: el enfoque anterior (DataFrame completo + to_excel).
+    """
+    import pandas as pd
+
+    df = pd.DataFrame([ficha_sintetica(i) for i in range(n)], columns=HEADERS_CONTRATO)
+    with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False, sheet_name="Fichas")
+
+
+def medir(funcion, ruta, *args):
+    """
+    Tiempo (sin tracemalloc, que lo distorsiona) y pico de memoria (con tracemalloc)
+    en dos corridas separadas. La primera corrida también sirve de calentamiento
+    (imports perezosos como pyarrow).
+    """
+    t0 = time.perf_counter()
+    funcion(*args, ruta)
+    segundos = time.perf_counter() - t0
+
+    tracemalloc.start()
+    funcion(*args, ruta)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico, os.path.getsize(ruta)
+
+
+def main():
+    print(f"{'formato':>14} {'fichas':>7} {'segundos':>9} {'pico MB':>8} {'archivo MB':>11}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in CANTIDADES:
+            for formato in FORMATOS:
+                ruta = os.path.join(directorio, f"fichas_{n}.{formato}")
+                try:
+                    segundos, pico, tamano = medir(_exportar, ruta, formato, n)
+                except ImportError as e:
+                    print(f"{formato:>14} {n:>7}  omitido: {e}")
+                    continue
+                print(f"{formato:>14} {n:>7} {segundos:>9.2f} {pico / 1e6:>8.1f} {tamano / 1e6:>11.1f}")
+            try:
+                ruta = os.path.join(directorio, f"pandas_{n}.xlsx")
+                segundos, pico, tamano = medir(_exportar_pandas, ruta, n)
+                print(f"{'pandas (xlsx)':>14} {n:>7} {segundos:>9.2f} {pico / 1e6:>8.1f} {tamano / 1e6:>11.1f}")
+            except ImportError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import random
+import re
+import sys
+import time
+
+from contratos.limpieza import limpiar_paginas, limpiar_texto
+
+# ===============================================================
+# BENCHMARK: LIMPIEZA DE TEXTO (ORIGINAL VS PRECOMPILADA VS STREAMING)
+# ===============================================================
+
+PAGINAS = (100, 500, 1000)
+LINEAS_POR_PAGINA = 45
+REPETICIONES = 3
+
+PALABRAS = (
+    "contrato obra pública dependencia contratista cláusula monto plazo garantía "
+    "cumplimiento anticipo estimaciones residente supervisión penas convencionales "
+    "trabajos ejecución días naturales impuesto valor agregado LOPSRMEM artículo"
+).split()
+
+
+def limpiar_texto_original(t):
+    """
+    Copia literal de la función anidada que vivía en app.py (referencia dorada).
+    """
+    t = re.sub(r"(\w+)-\s*\n\s*(\w+)", r"\1\2", t)
+    t = re.sub(r"\n(?!\n)", " ", t)
+    t = re.sub(r"\s{2,}", " ", t)
+    t = t.replace("�", "").replace("●", "").replace("•", "")
+    return t.strip()
+
+
+def pagina_sintetica(rnd):
+    lineas = []
+    for _ in range(LINEAS_POR_PAGINA):
+        linea = " ".join(rnd.choice(PALABRAS) for _ in range(rnd.randint(6, 12)))
+        r = rnd.random()
+        if r < 0.08:
+            linea = "• " + linea
+        elif r < 0.12:
+            linea = "●  " + linea + " �"
+        elif r < 0.25:
+            linea = linea + " ejecu-"  # palabra cortada al final de la línea
+        if rnd.random() < 0.1:
+            linea += "\n"  # párrafo
+        lineas.append(linea)
+    return "\n".join(lineas)
+
+
+def medir(funcion, repeticiones=REPETICIONES):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, resultado
+
+
+def main():
+    rnd = random.Random(1234)
+    print(f"{'páginas':>8} {'MB':>6} {'original':>10} {'compilada':>10} {'streaming':>10} {'speedup':>8}")
+    for n in PAGINAS:
+        paginas = [pagina_sintetica(rnd) + "\n\n" for _ in range(n)]
+        texto = "".join(paginas)
+
+        t_orig, esperado = medir(lambda: limpiar_texto_original(texto))
+        t_comp, compilado = medir(lambda: limpiar_texto(texto))
+        t_stream, streaming = medir(lambda: "".join(limpiar_paginas(paginas)))
+
+        # Pruebas doradas: la salida debe ser idéntica byte a byte
+        if compilado != esperado or streaming != esperado:
+            print(f"ERROR: salida distinta a la original con {n} páginas", file=sys.stderr)
+            sys.exit(1)
+
+        print(f"{n:>8} {len(texto.encode('utf-8')) / 1e6:>6.1f} {t_orig * 1000:>8.1f}ms "
+              f"{t_comp * 1000:>8.1f}ms {t_stream * 1000:>8.1f}ms {t_orig / t_comp:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import escanear_paginas, generar_contrato
+from contratos.extraccion import extraer_texto_pdf
+from contratos.ocr import CacheOCR, OCRFalso, crear_backend_ocr
+
+# ===============================================================
+# BENCHMARK: OCR SOLO DE LAS PÁGINAS ESCANEADAS
+# ===============================================================
+# Un contrato mixto (una fracción --escaneadas de sus páginas convertida en
+# imagen) contra el mismo contrato escaneado completo, que es lo que pagaría
+# un OCR de todas las páginas. El backend por omisión es OCRFalso, que ocupa
+# la CPU --segundos-pagina por página; con --backend tesseract se mide el real.
+#
+#   python -m benchmarks.bench_ocr --clausulas 36 --escaneadas 0.25 --segundos-pagina 0.5
+
+CLAUSULAS = 36                  # corpus.ordinal llega hasta la TRIGÉSIMA NOVENA
+FRACCION_ESCANEADA = 0.25
+SEGUNDOS_PAGINA = 0.5
+
+
+def medir(descripcion, pdf_bytes, backend, max_procesos, cache=None):
+    metricas = {}
+    t0 = time.perf_counter()
+    extraer_texto_pdf(pdf_bytes, max_procesos=max_procesos, metricas=metricas, ocr=backend, cache_ocr=cache)
+    segundos = time.perf_counter() - t0
+    print(f"{descripcion:>36} {metricas['paginas']:>8} {metricas.get('paginas_ocr', 0):>6} "
+          f"{metricas.get('paginas_ocr_cache', 0):>7} {segundos:>9.2f}")
+    return segundos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR solo de las páginas escaneadas.")
+    parser.add_argument("--clausulas", type=int, default=CLAUSULAS)
+    parser.add_argument("--escaneadas", type=float, default=FRACCION_ESCANEADA)
+    parser.add_argument("--segundos-pagina", type=float, default=SEGUNDOS_PAGINA)
+    parser.add_argument("--backend", choices=("falso", "tesseract"), default="falso")
+    args = parser.parse_args(argv)
+
+    backend = (OCRFalso("Texto leído por OCR. " * 20, args.segundos_pagina) if args.backend == "falso"
+               else crear_backend_ocr(args.backend))
+    if backend is None:
+        print(f"El motor de OCR «{args.backend}» no está instalado.", file=sys.stderr)
+        return 2
+
+    pdf, _ = generar_contrato(args.clausulas, 80, 0)
+    import fitz
+
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        paginas = doc.page_count
+    cada = max(1, round(1 / args.escaneadas)) if args.escaneadas else paginas + 1
+    mixto = escanear_paginas(pdf, range(0, paginas, cada))
+    completo = escanear_paginas(pdf, range(paginas))
+
+    procesos = os.cpu_count() or 1
+    print(f"{'caso':>36} {'páginas':>8} {'OCR':>6} {'caché':>7} {'segundos':>9}")
+    medir("digital, sin OCR", pdf, None, 1)
+    todo = medir("escaneado completo, OCR de todo", completo, backend, procesos)
+    medir("mixto, 1 proceso", mixto, backend, 1)
+    mixto_s = medir(f"mixto, {procesos} procesos", mixto, backend, procesos)
+    with tempfile.TemporaryDirectory() as directorio:
+        cache = CacheOCR(directorio)
+        medir("mixto, primera vez con caché", mixto, backend, procesos, cache)
+        medir("mixto, segunda vez (caché)", mixto, backend, procesos, cache)
+    print(f"\nEl contrato mixto paga {mixto_s / todo:.0%} del OCR de todas las páginas.")
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,323 @@
+import argparse
+import json
+import math
+import os
+import platform
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from openai import OpenAI
+
+from benchmarks.corpus import generar_corpus
+from benchmarks.servidores import OpenAIFalso, SheetsFalso
+from contratos import limites, sheets
+from contratos.analisis import analizar_texto, parse_markdown_table
+from contratos.exportar import exportar_fichas
+from contratos.ficha_json import parse_ficha_json
+from contratos.extraccion import extraer_texto_pdf
+from contratos.limpieza import limpiar_texto
+from contratos.lotes import analizar_lote
+from contratos.prompts import CLAVES_JSON, HEADERS_CONTRATO
+from contratos.traza import pico_rss_kb
+
+# ===============================================================
+# BENCHMARK OFFLINE DEL PIPELINE COMPLETO
+# ===============================================================
+# Corpus sintético (benchmarks.corpus) + servidores falsos de OpenAI y Sheets
+# (benchmarks.servidores). Mide por etapa: rendimiento, latencia p50/p95 y
+# memoria, y guarda el resultado en JSON para comparar entre corridas:
+#
+#   python -m benchmarks.bench_pipeline --contratos 40 --latencia 0.2 --prob-429 0.05
+#   python -m benchmarks.bench_pipeline --comparar benchmarks/resultados/anterior.json
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+
+def percentil(valores, p):
+    """
+    Percentil por rango más cercano (sin numpy).
+    """
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def resumir(latencias, segundos_total, **extra):
+    return {
+        "n": len(latencias),
+        "segundos_total": round(segundos_total, 4),
+        "por_segundo": round(len(latencias) / segundos_total, 2) if segundos_total else None,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3) if latencias else None,
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3) if latencias else None,
+        **extra,
+    }
+
+
+def medir_uno_a_uno(funcion, entradas, concurrencia=1):
+    """
+    Ejecuta `funcion(x)` por cada entrada y devuelve (resultados, latencias, segundos_total).
+    """
+    def cronometrar(x):
+        t0 = time.perf_counter()
+        resultado = funcion(x)
+        return resultado, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if concurrencia == 1:
+        pares = [cronometrar(x) for x in entradas]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            pares = list(pool.map(cronometrar, entradas))
+    total = time.perf_counter() - t0
+    return [r for r, _ in pares], [s for _, s in pares], total
+
+
+def pico_memoria_mb(funcion, entradas):
+    """
+    Corrida aparte con tracemalloc (lo distorsiona el tiempo): pico de memoria
+    de Python asignada por la etapa. La memoria de PyMuPDF (C) no aparece aquí;
+    para eso está pico_rss_mb.
+    """
+    tracemalloc.start()
+    for x in entradas:
+        funcion(x)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(pico / 1e6, 2)
+
+
+def _rss_mb():
+    rss = pico_rss_kb()
+    return round(rss / 1024, 1) if rss is not None else None
+
+
+def bench_extraccion(corpus):
+    pdfs = [pdf for _, pdf in corpus]
+    textos, latencias, total = medir_uno_a_uno(lambda pdf: extraer_texto_pdf(pdf, max_procesos=1), pdfs)
+    paginas = 0
+    for pdf in pdfs:
+        metricas = {}
+        extraer_texto_pdf(pdf, max_procesos=1, metricas=metricas)
+        paginas += metricas["paginas"]
+    resumen = resumir(
+        latencias, total,
+        paginas=paginas,
+        mb_pdf=round(sum(map(len, pdfs)) / 1e6, 2),
+        pico_tracemalloc_mb=pico_memoria_mb(lambda pdf: extraer_texto_pdf(pdf, max_procesos=1), pdfs[:5]),
+        pico_rss_mb=_rss_mb(),
+    )
+    return textos, resumen
+
+
+def bench_limpieza(textos):
+    limpios, latencias, total = medir_uno_a_uno(limpiar_texto, textos)
+    resumen = resumir(
+        latencias, total,
+        mb_texto=round(sum(map(len, textos)) / 1e6, 2),
+        pico_tracemalloc_mb=pico_memoria_mb(limpiar_texto, textos[:5]),
+    )
+    return limpios, resumen
+
+
+def bench_parseo(repeticiones=2000):
+    tabla = "| Campo | Respuesta |\n|-------|-----------|\n" + "".join(
+        f"| {c} | Respuesta sintética para {c.lower()} con algo más de texto |\n" for c in HEADERS_CONTRATO
+    )
+    _, latencias, total = medir_uno_a_uno(parse_markdown_table, [tabla] * repeticiones)
+    return resumir(latencias, total)
+
+
+def bench_parseo_json(repeticiones=2000):
+    texto = json.dumps(
+        {CLAVES_JSON[c]: f"Respuesta sintética para {c.lower()} con algo más de texto" for c in HEADERS_CONTRATO},
+        ensure_ascii=False
+    )
+    _, latencias, total = medir_uno_a_uno(parse_ficha_json, [texto] * repeticiones)
+    return resumir(latencias, total)
+
+
+def bench_orquestacion(textos, concurrencia, stream, **config_servidor):
+    """
+    analizar_texto() contra OpenAIFalso: un contrato por hilo, `concurrencia`
+    hilos a la vez (como el modo lote).
+    """
+    with OpenAIFalso(**config_servidor) as servidor:
+        client = OpenAI(api_key="falsa", base_url=servidor.url + "/v1", max_retries=0)
+        metricas_docs = []
+
+        def analizar(texto):
+            metricas = {}
+            callback = (lambda campo, respuesta: None) if stream else None
+            analizar_texto(client, texto, metricas=metricas, al_recibir_campo=callback)
+            metricas_docs.append(metricas)
+            return metricas
+
+        _, latencias, total = medir_uno_a_uno(analizar, textos, concurrencia)
+        usos = [m.get("uso", {}) for m in metricas_docs]
+        entrada = sum(u.get("entrada", 0) for u in usos)
+        ttfts = [m["ttft_s"] for m in metricas_docs if "ttft_s" in m]
+        return resumir(
+            latencias, total,
+            concurrencia=concurrencia,
+            reintentos=sum(m.get("reintentos", 0) for m in metricas_docs),
+            espera_s=round(sum(m.get("espera_s", 0.0) for m in metricas_docs), 3),
+            tokens_entrada=entrada,
+            proporcion_cache=round(sum(u.get("en_cache", 0) for u in usos) / entrada, 3) if entrada else 0.0,
+            ttft_p50_ms=round(percentil(ttfts, 50) * 1000, 3) if ttfts else None,
+            servidor=servidor.estadisticas(),
+        )
+
+
+def bench_lote(corpus, concurrencia, **config_servidor):
+    """
+    analizar_lote() de punta a punta: procesos para extraer + hilos para GPT.
+    """
+    with OpenAIFalso(**config_servidor) as servidor:
+        client = OpenAI(api_key="falsa", base_url=servidor.url + "/v1", max_retries=0)
+        t0 = time.perf_counter()
+        marcas = {}
+        resultados = analizar_lote(
+            client, corpus, max_concurrencia=concurrencia,
+            al_completar=lambda r: marcas.__setitem__(r["nombre"], time.perf_counter() - t0)
+        )
+        total = time.perf_counter() - t0
+        return resumir(
+            list(marcas.values()), total,
+            errores=sum(1 for r in resultados if r["error"]),
+            servidor=servidor.estadisticas(),
+        )
+
+
+def bench_exportacion(fichas, formatos=("xlsx", "csv")):
+    resultados = {}
+    for formato in formatos:
+        t0 = time.perf_counter()
+        buffer = exportar_fichas(fichas, formato)
+        total = time.perf_counter() - t0
+        resultados[formato] = {
+            "fichas": len(fichas),
+            "segundos_total": round(total, 4),
+            "por_segundo": round(len(fichas) / total, 1) if total else None,
+            "mb_archivo": round(buffer.getbuffer().nbytes / 1e6, 3),
+            "pico_tracemalloc_mb": pico_memoria_mb(lambda f: exportar_fichas(f, formato), [fichas]),
+        }
+    return resultados
+
+
+def bench_sheets(fichas, por_peticion, **config_servidor):
+    """
+    ColaExportacion contra SheetsFalso, en bloques de `por_peticion` filas.
+    """
+    with SheetsFalso(**config_servidor) as servidor:
+        token_url, sheets_api = sheets.TOKEN_URL, sheets.SHEETS_API
+        sheets.TOKEN_URL, sheets.SHEETS_API = servidor.url + "/token", servidor.url + "/v4"
+        try:
+            token = sheets.solicitar_token({"grant_type": "refresh_token"})["access_token"]
+            bloques = [fichas[i:i + por_peticion] for i in range(0, len(fichas), por_peticion)]
+
+            def enviar(bloque):
+                cola = sheets.ColaExportacion("ID", "Hoja1!A1", HEADERS_CONTRATO, lambda forzar_refresco=False: token)
+                for ficha in bloque:
+                    cola.agregar(ficha)
+                return cola.vaciar()
+
+            _, latencias, total = medir_uno_a_uno(enviar, bloques)
+        finally:
+            sheets.TOKEN_URL, sheets.SHEETS_API = token_url, sheets_api
+        return resumir(latencias, total, filas_por_peticion=por_peticion, servidor=servidor.estadisticas())
+
+
+def comparar(actual, anterior):
+    """
+    Imprime, por etapa, el cambio de p50 y de rendimiento respecto a una corrida anterior.
+    """
+    print(f"\n{'etapa':>26} {'p50 antes':>10} {'p50 ahora':>10} {'/s antes':>9} {'/s ahora':>9}")
+    for etapa, datos in actual["etapas"].items():
+        previo = anterior.get("etapas", {}).get(etapa)
+        if not previo or "p50_ms" not in datos:
+            continue
+        print(f"{etapa:>26} {previo.get('p50_ms') or 0:>10.2f} {datos['p50_ms'] or 0:>10.2f} "
+              f"{previo.get('por_segundo') or 0:>9.1f} {datos['por_segundo'] or 0:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline de contratos.")
+    parser.add_argument("--contratos", type=int, default=20)
+    parser.add_argument("--clausulas", type=int, default=25)
+    parser.add_argument("--filas-anexo", type=int, default=150)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos por respuesta de OpenAI falso")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--prob-429", type=float, default=0.05)
+    parser.add_argument("--segundos-por-fila", type=float, default=0.01, help="ritmo del streaming falso")
+    parser.add_argument("--latencia-sheets", type=float, default=0.05)
+    parser.add_argument("--fichas-export", type=int, default=2000)
+    parser.add_argument("--rpm", type=int, default=100000, help="cupo del limitador durante la prueba")
+    parser.add_argument("--tpm", type=int, default=100000000)
+    parser.add_argument("--salida", help="ruta del JSON (por omisión benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    args = parser.parse_args(argv)
+
+    # El limitador global se crea perezosamente: se reemplaza para que el cupo
+    # real de OpenAI no se convierta en el cuello de botella de la prueba
+    limites._limitador_global = limites.LimitadorTokens(args.rpm, args.tpm)
+    servidor_gpt = dict(latencia_s=args.latencia, jitter_s=args.jitter, prob_429=args.prob_429)
+
+    t0 = time.perf_counter()
+    corpus = generar_corpus(args.contratos, args.clausulas, args.filas_anexo)
+    print(f"Corpus: {len(corpus)} contratos, {sum(len(p) for _, p in corpus) / 1e6:.1f} MB "
+          f"({time.perf_counter() - t0:.1f}s)")
+
+    etapas = {}
+    textos, etapas["extraccion"] = bench_extraccion(corpus)
+    limpios, etapas["limpieza"] = bench_limpieza(textos)
+    etapas["parseo"] = bench_parseo()
+    etapas["parseo_json"] = bench_parseo_json()
+    etapas["orquestacion"] = bench_orquestacion(limpios, args.concurrencia, False, **servidor_gpt)
+    etapas["orquestacion_stream"] = bench_orquestacion(
+        limpios, args.concurrencia, True, segundos_por_fila=args.segundos_por_fila, **servidor_gpt
+    )
+    etapas["lote"] = bench_lote(corpus, args.concurrencia, **servidor_gpt)
+    fichas = [
+        {c: f"{c} del contrato {i}: respuesta sintética de la ficha" for c in HEADERS_CONTRATO}
+        for i in range(args.fichas_export)
+    ]
+    for formato, datos in bench_exportacion(fichas).items():
+        etapas[f"exportacion_{formato}"] = datos
+    etapas["sheets"] = bench_sheets(
+        fichas, 500, latencia_s=args.latencia_sheets, prob_429=args.prob_429
+    )
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": vars(args),
+        "pico_rss_mb": _rss_mb(),
+        "etapas": etapas,
+    }
+
+    print(f"\n{'etapa':>26} {'n':>6} {'/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for etapa, datos in etapas.items():
+        print(f"{etapa:>26} {datos.get('n', datos.get('fichas', 0)):>6} {datos.get('por_segundo') or 0:>9.1f} "
+              f"{datos.get('p50_ms') or 0:>9.2f} {datos.get('p95_ms') or 0:>9.2f}")
+
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import sys
+
+from openai import OpenAI
+
+from benchmarks.bench_pipeline import medir_uno_a_uno, percentil, resumir
+from benchmarks.corpus import texto_contrato
+from benchmarks.servidores import CAMPOS_LISTA, OpenAIFalso
+from contratos import limites
+from contratos.analisis import analizar_texto
+from contratos.limpieza import limpiar_texto
+from contratos.prompts import HEADERS_CONTRATO, SALIDA_JSON, SALIDA_TABLA
+
+# ===============================================================
+# BENCHMARK: SALIDA JSON CON ESQUEMA VS TABLA MARKDOWN
+# ===============================================================
+# Analiza los mismos contratos con ambos formatos contra OpenAIFalso, que
+# inyecta los defectos típicos de la tabla (un "|" en Normatividad o Anexos,
+# sin fila de separación, respuesta cortada) con la misma probabilidad y la
+# misma semilla. Compara tokens de salida, fichas mal parseadas (algún campo
+# pedido falta o llega distinto) y tiempo de parseo:
+#
+#   python -m benchmarks.bench_salida --contratos 200 --prob-defecto 0.1
+
+CONTRATOS = 100
+PROB_DEFECTO = 0.1
+
+
+def ficha_correcta(campos):
+    """
+    True si cada campo trae exactamente la respuesta que envió OpenAIFalso.
+    """
+    for campo in HEADERS_CONTRATO:
+        valor = campos.get(campo, "")
+        esperado = f"Respuesta sintética para {campo.lower()}"
+        if campo in CAMPOS_LISTA and valor.startswith("Ley de Obras Públicas | "):
+            esperado = f"Ley de Obras Públicas | {esperado} | Reglamento"
+        if valor != esperado:
+            return False
+    return True
+
+
+def bench_salida(textos, salida, stream, concurrencia, prob_defecto):
+    with OpenAIFalso(prob_defecto=prob_defecto) as servidor:
+        client = OpenAI(api_key="falsa", base_url=servidor.url + "/v1", max_retries=0)
+        metricas_docs = []
+
+        def analizar(texto):
+            metricas = {}
+            callback = (lambda campo, respuesta: None) if stream else None
+            _, campos = analizar_texto(client, texto, usar_reglas=False, usar_indice=False, metricas=metricas,
+                                       al_recibir_campo=callback, salida=salida)
+            metricas_docs.append((metricas, ficha_correcta(campos)))
+
+        _, latencias, total = medir_uno_a_uno(analizar, textos, concurrencia)
+        salidas = [m.get("uso", {}).get("salida", 0) for m, _ in metricas_docs]
+        parseos = [m["parseo_s"] for m, _ in metricas_docs if "parseo_s" in m]
+        fallidas = sum(1 for _, correcta in metricas_docs if not correcta)
+        return resumir(
+            latencias, total,
+            tokens_salida=sum(salidas),
+            tokens_salida_por_ficha=round(sum(salidas) / len(salidas), 1),
+            fichas_mal_parseadas=fallidas,
+            tasa_fallo=round(fallidas / len(textos), 4),
+            parseo_p50_us=round(percentil(parseos, 50) * 1e6, 1) if parseos else None,
+            servidor=servidor.estadisticas(),
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Salida JSON con esquema vs tabla Markdown.")
+    parser.add_argument("--contratos", type=int, default=CONTRATOS)
+    parser.add_argument("--prob-defecto", type=float, default=PROB_DEFECTO)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    limites._limitador_global = limites.LimitadorTokens(100000, 100000000)
+    # Contratos cortos: aquí solo importa la respuesta, no el tamaño del prompt
+    textos = [limpiar_texto(texto_contrato(12, 0, semilla)[0]) for semilla in range(args.contratos)]
+
+    resultados = {}
+    for salida in (SALIDA_TABLA, SALIDA_JSON):
+        for stream in (False, True):
+            nombre = salida + ("_stream" if stream else "")
+            resultados[nombre] = bench_salida(textos, salida, stream, args.concurrencia, args.prob_defecto)
+
+    print(f"{'salida':>14} {'tokens/ficha':>13} {'mal parseadas':>14} {'tasa':>7} {'parseo µs':>10} {'p50 ms':>8}")
+    for nombre, datos in resultados.items():
+        print(f"{nombre:>14} {datos['tokens_salida_por_ficha']:>13.1f} {datos['fichas_mal_parseadas']:>14} "
+              f"{datos['tasa_fallo']:>7.1%} {datos['parseo_p50_us'] or '-':>10} {datos['p50_ms']:>8.2f}")
+    tabla, json_ = resultados[SALIDA_TABLA], resultados[SALIDA_JSON]
+    print(f"\nTokens de salida: {1 - json_['tokens_salida'] / tabla['tokens_salida']:.0%} menos con JSON.")
+    return resultados
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
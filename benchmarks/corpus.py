@@ -0,0 +1,217 @@
+import random
+import textwrap
+from datetime import date, timedelta
+
+import fitz
+
+# ===============================================================
+# CORPUS SINTÉTICO: CONTRATOS DE OBRA PÚBLICA GENERADOS CON PYMUPDF
+# ===============================================================
+# Los contratos imitan la estructura real (proemio, declaraciones, cláusulas
+# numeradas, anexos con tablas de conceptos y firmas) para que la extracción,
+# la limpieza, el índice de cláusulas y los extractores locales trabajen igual
+# que con un contrato real con capa de texto.
+
+CARACTERES_POR_LINEA = 95
+LINEAS_POR_PAGINA = 50
+
+ORDINALES = (
+    "PRIMERA", "SEGUNDA", "TERCERA", "CUARTA", "QUINTA", "SEXTA", "SÉPTIMA", "OCTAVA",
+    "NOVENA", "DÉCIMA",
+)
+DECENAS = ("", "DÉCIMA", "VIGÉSIMA", "TRIGÉSIMA")
+
+MESES = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+    "septiembre", "octubre", "noviembre", "diciembre",
+)
+
+PALABRAS = (
+    "el contratista se obliga a ejecutar los trabajos conforme al proyecto ejecutivo las "
+    "especificaciones generales y particulares el programa de obra y los precios unitarios "
+    "pactados la dependencia podrá verificar en cualquier momento la calidad de los materiales "
+    "así como la correcta ejecución de los conceptos de obra de acuerdo con la normatividad "
+    "vigente en materia de obra pública y servicios relacionados con las mismas"
+).split()
+
+CLAUSULAS_TEMATICAS = (
+    ("OBJETO DEL CONTRATO", "La DEPENDENCIA encomienda al CONTRATISTA la realización de los trabajos "
+     "consistentes en la {obra}, y este se obliga a realizarlos hasta su total terminación."),
+    ("MONTO DEL CONTRATO", "El monto del presente contrato es de ${monto} ({letra}) más el impuesto al "
+     "valor agregado, que asciende a ${iva}, dando un total de ${total}."),
+    ("PLAZO DE EJECUCIÓN", "El plazo de ejecución de los trabajos será de {plazo} ({plazo_letra}) días "
+     "naturales. El inicio de los trabajos será el día {inicio} y se concluirán a más tardar el día {fin}."),
+    ("ANTICIPO", "Para el inicio de los trabajos la DEPENDENCIA otorgará un anticipo del 30% del monto "
+     "del contrato, que el CONTRATISTA deberá amortizar en cada estimación."),
+    ("GARANTÍAS", "El CONTRATISTA otorgará fianza de cumplimiento por el 10% del monto del contrato y "
+     "fianza por la totalidad del anticipo, expedidas por institución afianzadora autorizada."),
+    ("SUPERVISIÓN", "La DEPENDENCIA designará un residente de obra que tendrá a su cargo la supervisión, "
+     "vigilancia, control y revisión de los trabajos, incluida la aprobación de estimaciones."),
+    ("PENAS CONVENCIONALES", "Por atraso en la ejecución de los trabajos se aplicará una pena "
+     "convencional del 5 al millar diario sobre el importe de los trabajos no ejecutados, sin que "
+     "exceda en su conjunto el monto de la garantía de cumplimiento."),
+    ("MODIFICACIONES", "Las partes podrán modificar el contrato mediante convenio siempre que, en "
+     "conjunto, no rebase el 25% del monto o del plazo originalmente pactados."),
+    ("LEGISLACIÓN APLICABLE", "Las partes se sujetan a la Ley de Obras Públicas y Servicios "
+     "Relacionados con las Mismas, su Reglamento y demás disposiciones aplicables."),
+    ("JURISDICCIÓN", "Para la interpretación y cumplimiento del presente contrato las partes se someten "
+     "a la jurisdicción de los tribunales federales, renunciando a cualquier otro fuero."),
+)
+
+NUMEROS = {
+    30: "treinta", 45: "cuarenta y cinco", 60: "sesenta", 90: "noventa", 120: "ciento veinte",
+    150: "ciento cincuenta", 180: "ciento ochenta", 240: "doscientos cuarenta",
+}
+
+OBRAS = (
+    "rehabilitación del camino rural tramo km 0+000 al km 12+500",
+    "construcción de la red de agua potable de la localidad",
+    "pavimentación con concreto hidráulico de la avenida principal",
+    "ampliación y mantenimiento de la clínica de salud municipal",
+)
+
+
+def ordinal(n):
+    """
+    1 -> "PRIMERA", 12 -> "DÉCIMA SEGUNDA", 21 -> "VIGÉSIMA PRIMERA" (hasta 39).
+    """
+    if not 1 <= n < 10 * len(DECENAS):
+        raise ValueError(f"ordinal fuera de rango: {n} (hasta {10 * len(DECENAS) - 1})")
+    decena, unidad = divmod(n, 10)
+    if decena == 0:
+        return ORDINALES[unidad - 1]
+    if unidad == 0:
+        return DECENAS[decena] if decena > 1 else "DÉCIMA"
+    return f"{DECENAS[decena]} {ORDINALES[unidad - 1]}"
+
+
+def _fecha_texto(d):
+    return f"{d.day} de {MESES[d.month - 1]} de {d.year}"
+
+
+def _parrafo(rng, palabras):
+    return " ".join(rng.choice(PALABRAS) for _ in range(palabras)).capitalize() + "."
+
+
+def texto_contrato(clausulas=20, filas_anexo=80, semilla=0):
+    """
+    Texto plano del contrato (antes de maquetarlo en PDF). Devuelve (texto, datos),
+    donde `datos` son los valores verdaderos de monto, fechas y plazo.
+    """
+    rng = random.Random(semilla)
+    monto = rng.randrange(500_000, 50_000_000) + rng.randrange(100) / 100
+    plazo = rng.choice(list(NUMEROS))
+    inicio = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+    fin = inicio + timedelta(days=plazo - 1)
+    datos = {
+        "obra": rng.choice(OBRAS),
+        "monto": f"{monto:,.2f}",
+        "letra": "cantidad con letra M.N.",
+        "iva": f"{monto * 0.16:,.2f}",
+        "total": f"{monto * 1.16:,.2f}",
+        "plazo": plazo,
+        "plazo_letra": NUMEROS[plazo],
+        "inicio": _fecha_texto(inicio),
+        "fin": _fecha_texto(fin),
+    }
+
+    partes = [
+        f"CONTRATO DE OBRA PÚBLICA A PRECIOS UNITARIOS Y TIEMPO DETERMINADO NÚMERO OP-{semilla:05d}",
+        "QUE CELEBRAN POR UNA PARTE EL MUNICIPIO, REPRESENTADO POR SU PRESIDENTE MUNICIPAL, A QUIEN "
+        "EN LO SUCESIVO SE LE DENOMINARÁ LA DEPENDENCIA, Y POR LA OTRA CONSTRUCTORA DEL SURESTE, "
+        "S.A. DE C.V., A QUIEN SE LE DENOMINARÁ EL CONTRATISTA, AL TENOR DE LAS SIGUIENTES:",
+        "DECLARACIONES",
+    ]
+    partes += [f"{i}. {_parrafo(rng, 60)}" for i in range(1, 4)]
+    partes.append("CLÁUSULAS")
+    for n in range(1, clausulas + 1):
+        if n <= len(CLAUSULAS_TEMATICAS):
+            titulo, cuerpo = CLAUSULAS_TEMATICAS[n - 1]
+            cuerpo = cuerpo.format(**datos)
+        else:
+            titulo, cuerpo = "DISPOSICIONES GENERALES", ""
+        relleno = " ".join(_parrafo(rng, rng.randrange(40, 120)) for _ in range(rng.randrange(1, 4)))
+        partes.append(f"CLÁUSULA {ordinal(n)}.- {titulo}. {cuerpo} {relleno}")
+
+    partes.append(
+        f"Leído que fue el presente contrato, lo firman las partes el día {datos['inicio']}. "
+        "POR LA DEPENDENCIA: PRESIDENTE MUNICIPAL. POR EL CONTRATISTA: ADMINISTRADOR ÚNICO."
+    )
+    if filas_anexo:
+        partes.append("ANEXO 1. CATÁLOGO DE CONCEPTOS")
+        partes.append(f"{'CLAVE':<8}{'CONCEPTO':<46}{'UNIDAD':<8}{'CANTIDAD':>12}{'P.U.':>12}")
+        for i in range(filas_anexo):
+            concepto = " ".join(rng.choice(PALABRAS) for _ in range(5))[:44]
+            partes.append(
+                f"{'C-%04d' % i:<8}{concepto:<46}{rng.choice(('m2', 'm3', 'ml', 'pza')):<8}"
+                f"{rng.randrange(1, 5000):>12,}{rng.randrange(10, 90000) / 100:>12,.2f}"
+            )
+    return "\n".join(partes), datos
+
+
+def _lineas(texto, rng, guiones):
+    """
+    Parte el texto en renglones como lo haría un procesador de textos,
+    cortando con guion la última palabra de una fracción `guiones` de renglones.
+    """
+    for parrafo in texto.split("\n"):
+        if parrafo.startswith(("C-", "CLAVE")):  # filas de tabla: sin ajuste
+            yield parrafo
+            continue
+        for linea in textwrap.wrap(parrafo, CARACTERES_POR_LINEA) or [""]:
+            if linea[-6:].isalpha() and rng.random() < guiones:
+                yield linea[:-3] + "-"
+                linea = linea[-3:]
+            yield linea
+        yield ""
+
+
+def maquetar_pdf(texto, semilla=0, guiones=0.05):
+    """
+    Texto -> bytes de un PDF con una capa de texto por página.
+    """
+    rng = random.Random(semilla)
+    lineas = list(_lineas(texto, rng, guiones))
+    doc = fitz.open()
+    for inicio in range(0, len(lineas), LINEAS_POR_PAGINA):
+        pagina = doc.new_page(width=612, height=792)
+        pagina.insert_text((54, 54), "\n".join(lineas[inicio:inicio + LINEAS_POR_PAGINA]),
+                           fontsize=8.5, fontname="helv")
+    datos = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return datos
+
+
+def escanear_paginas(pdf_bytes, paginas, dpi=200):
+    """
+    Reemplaza las `paginas` (números desde 0) por una imagen en gris de sí
+    mismas, sin capa de texto, como si se hubieran escaneado.
+    """
+    paginas = set(paginas)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as origen, fitz.open() as doc:
+        for numero, pagina in enumerate(origen):
+            if numero in paginas:
+                imagen = pagina.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+                nueva = doc.new_page(width=pagina.rect.width, height=pagina.rect.height)
+                nueva.insert_image(nueva.rect, stream=imagen)
+            else:
+                doc.insert_pdf(origen, from_page=numero, to_page=numero)
+        return doc.tobytes(garbage=3, deflate=True)
+
+
+def generar_contrato(clausulas=20, filas_anexo=80, semilla=0):
+    """
+    Contrato sintético completo: (pdf_bytes, datos_verdaderos).
+    """
+    texto, datos = texto_contrato(clausulas, filas_anexo, semilla)
+    return maquetar_pdf(texto, semilla), datos
+
+
+def generar_corpus(cantidad, clausulas=20, filas_anexo=80, semilla=0):
+    """
+    Lista [(nombre, pdf_bytes), ...] de contratos distintos del mismo tamaño.
+    """
+    return [
+        (f"contrato_{semilla + i:05d}.pdf", generar_contrato(clausulas, filas_anexo, semilla + i)[0])
+        for i in range(cantidad)
+    ]
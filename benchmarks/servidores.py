@@ -0,0 +1,332 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from contratos.prompts import CLAVES_JSON, HEADERS_CONTRATO
+
+# ===============================================================
+# SERVIDORES FALSOS: OPENAI RESPONSES API Y GOOGLE SHEETS
+# ===============================================================
+# Corren en 127.0.0.1 en un hilo aparte, con latencia configurable e
+# inyección de 429, para medir la orquestación sin red ni costo.
+
+CARACTERES_POR_TOKEN = 4
+BLOQUE_CACHE = 128  # OpenAI cachea el prefijo en bloques de 128 tokens (mínimo 1024)
+MINIMO_CACHE = 1024
+
+# Tokens de salida al estilo BPE: trozos de hasta 5 letras y signos en grupos
+# de hasta 3. Caracteres/4 subestima la estructura (|, comillas, llaves).
+RE_TOKEN = re.compile(r"\s?\w{1,5}|\s?[^\w\s]{1,3}")
+
+# Defectos que puede traer una respuesta (ver OpenAIFalso.prob_defecto)
+DEFECTOS = ("barra_en_valor", "sin_separador", "truncada")
+CAMPOS_LISTA = ("Normatividad aplicable", "Anexos")
+
+
+class ServidorFalso:
+    """
+    Base: levanta un ThreadingHTTPServer en un puerto libre. Se usa como
+    context manager; `url` apunta a la raíz del servidor.
+
+    - `latencia_s` (+ `jitter_s` aleatorio) antes de cada respuesta.
+    - `prob_429`: fracción de peticiones que responden 429 con Retry-After.
+    """
+
+    def __init__(self, latencia_s=0.0, jitter_s=0.0, prob_429=0.0, retry_after_s=0.05, semilla=0):
+        self.latencia_s = latencia_s
+        self.jitter_s = jitter_s
+        self.prob_429 = prob_429
+        self.retry_after_s = retry_after_s
+        self.peticiones = 0
+        self.rechazadas = 0
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self._httpd.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def __enter__(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                largo = int(self.headers.get("Content-Length") or 0)
+                servidor._atender(self, self.rfile.read(largo))
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+        self._httpd.daemon_threads = True
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        return False
+
+    def _sorteo(self):
+        """
+        Cuenta la petición y decide (bajo lock, reproducible) si se rechaza con 429.
+        """
+        with self._lock:
+            self.peticiones += 1
+            rechazar = self._rng.random() < self.prob_429
+            if rechazar:
+                self.rechazadas += 1
+            espera = self.latencia_s + self._rng.uniform(0, self.jitter_s)
+        return rechazar, espera
+
+    def _responder_json(self, manejador, status, cuerpo, headers=None):
+        datos = json.dumps(cuerpo).encode()
+        manejador.send_response(status)
+        manejador.send_header("Content-Type", "application/json")
+        manejador.send_header("Content-Length", str(len(datos)))
+        for clave, valor in (headers or {}).items():
+            manejador.send_header(clave, valor)
+        manejador.end_headers()
+        manejador.wfile.write(datos)
+
+    def _atender(self, manejador, cuerpo):
+        rechazar, espera = self._sorteo()
+        if rechazar:
+            self._responder_json(
+                manejador, 429,
+                {"error": {"message": "Rate limit (simulado)", "type": "rate_limit_error", "code": None}},
+                {"Retry-After": str(self.retry_after_s)}
+            )
+            return
+        time.sleep(espera)
+        try:
+            datos = json.loads(cuerpo or b"{}")
+        except ValueError:  # el endpoint de tokens recibe un formulario
+            datos = {}
+        self.responder(manejador, manejador.path, datos)
+
+    def responder(self, manejador, ruta, cuerpo):
+        raise NotImplementedError
+
+    def estadisticas(self):
+        with self._lock:
+            return {"peticiones": self.peticiones, "rechazadas_429": self.rechazadas}
+
+
+def _campos_pedidos(mensajes):
+    """
+    Lee del mensaje "user" la lista "Llena SOLO estos campos" (ver
+    contratos.prompts.construir_mensajes); si no está, se piden todos.
+    """
+    texto = mensajes[-1]["content"] if isinstance(mensajes, list) else str(mensajes)
+    if "Llena SOLO estos campos" not in texto:
+        return HEADERS_CONTRATO
+    bloque = texto.split("TEXTO COMPLETO DEL CONTRATO:", 1)[0]
+    return [l[2:].strip() for l in bloque.splitlines() if l.startswith("- ")]
+
+
+class OpenAIFalso(ServidorFalso):
+    """
+    Imita POST /v1/responses (normal y con stream=True). La ficha devuelta trae
+    una respuesta sintética por cada campo pedido, como tabla Markdown o, si la
+    petición trae text.format json_schema, como objeto JSON con las claves de
+    CLAVES_JSON (y "" en los campos no pedidos). `usage` estima tokens de
+    entrada y marca como cacheado el prefijo "developer" si ya se vio antes con
+    la misma prompt_cache_key. En streaming, `latencia_s` es el tiempo al primer
+    token y `segundos_por_fila` el tiempo entre filas (o pares) de la ficha.
+
+    `prob_defecto`: fracción de respuestas con uno de los DEFECTOS que se ven en
+    la práctica: un "|" dentro de Normatividad o Anexos, la tabla sin fila de
+    separación o la respuesta cortada a la mitad (termina como response.incomplete,
+    igual que al agotar max_output_tokens). Con esquema JSON, el "|" es
+    un carácter más y la estructura no puede faltar; solo el corte le afecta.
+
+    `error_tras_filas`: en streaming, después de ese número de pedazos se envía
+    un evento `error` en lugar del resto (como una falla del servidor a mitad
+    de la respuesta; el SDK lo lanza como openai.APIError).
+    """
+
+    def __init__(self, segundos_por_fila=0.0, prob_defecto=0.0, error_tras_filas=None, **kwargs):
+        super().__init__(**kwargs)
+        self.segundos_por_fila = segundos_por_fila
+        self.prob_defecto = prob_defecto
+        self.error_tras_filas = error_tras_filas
+        self.defectos = dict.fromkeys(DEFECTOS, 0)
+        self._rng_defectos = random.Random(kwargs.get("semilla", 0) + 1)  # misma secuencia en cada formato
+        self._prefijos = set()
+
+    def _usage(self, cuerpo, tabla):
+        mensajes = cuerpo.get("input") or []
+        entrada = sum(len(str(m.get("content", ""))) for m in mensajes) // CARACTERES_POR_TOKEN
+        cacheados = 0
+        if mensajes and mensajes[0].get("role") in ("developer", "system"):
+            prefijo = len(mensajes[0]["content"]) // CARACTERES_POR_TOKEN
+            clave = (cuerpo.get("prompt_cache_key"), hash(mensajes[0]["content"]))
+            with self._lock:
+                visto = clave in self._prefijos
+                self._prefijos.add(clave)
+            if visto and prefijo >= MINIMO_CACHE:
+                cacheados = prefijo // BLOQUE_CACHE * BLOQUE_CACHE
+        salida = len(RE_TOKEN.findall(tabla))
+        return {
+            "input_tokens": entrada,
+            "input_tokens_details": {"cached_tokens": cacheados},
+            "output_tokens": salida,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": entrada + salida,
+        }
+
+    def _respuesta(self, cuerpo, tabla, truncada=False):
+        return {
+            "id": "resp_falsa",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": cuerpo.get("model"),
+            "status": "incomplete" if truncada else "completed",
+            "incomplete_details": {"reason": "max_output_tokens"} if truncada else None,
+            "output": [{
+                "type": "message",
+                "id": "msg_falso",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": tabla, "annotations": []}],
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": self._usage(cuerpo, tabla),
+        }
+
+    def _sortear_defecto(self):
+        with self._lock:
+            if self._rng_defectos.random() >= self.prob_defecto:
+                return None
+            defecto = self._rng_defectos.choice(DEFECTOS)
+            self.defectos[defecto] += 1
+            return defecto
+
+    def valores(self, cuerpo, pedidos):
+        """
+        {campo: respuesta} para los campos pedidos. Las subclases pueden "leer"
+        el contrato de cuerpo["input"] o variar la respuesta según cuerpo["model"].
+        """
+        return {campo: f"Respuesta sintética para {campo.lower()}" for campo in pedidos}
+
+    def _piezas(self, cuerpo):
+        """
+        La ficha en los pedazos que se envían por separado en streaming, y si
+        se truncó (como al agotar max_output_tokens).
+        """
+        pedidos = _campos_pedidos(cuerpo.get("input"))
+        defecto = self._sortear_defecto()
+        valores = self.valores(cuerpo, pedidos)
+        for campo in pedidos:
+            if defecto == "barra_en_valor" and campo in CAMPOS_LISTA:
+                valores[campo] = f"Ley de Obras Públicas | {valores[campo]} | Reglamento"
+
+        formato = (cuerpo.get("text") or {}).get("format") or {}
+        if formato.get("type") == "json_schema":
+            pares = [f"{json.dumps(CLAVES_JSON[c])}:{json.dumps(valores.get(c, ''), ensure_ascii=False)}"
+                     for c in HEADERS_CONTRATO]
+            piezas = ["{"] + [p + "," for p in pares[:-1]] + [pares[-1] + "}"]
+        else:
+            piezas = ["| Campo | Respuesta |\n"]
+            if defecto != "sin_separador":
+                piezas.append("|-------|-----------|\n")
+            piezas += [f"| {campo} | {valores[campo]} |\n" for campo in pedidos]
+
+        if defecto == "truncada":
+            restantes = sum(map(len, piezas)) * 6 // 10
+            cortadas = []
+            for pieza in piezas:
+                cortadas.append(pieza[:restantes])
+                restantes -= len(pieza)
+                if restantes <= 0:
+                    break
+            piezas = cortadas
+        return piezas, defecto == "truncada"
+
+    def responder(self, manejador, ruta, cuerpo):
+        filas, truncada = self._piezas(cuerpo)
+        tabla = "".join(filas)
+        if not cuerpo.get("stream"):
+            self._responder_json(manejador, 200, self._respuesta(cuerpo, tabla, truncada))
+            return
+
+        manejador.send_response(200)
+        manejador.send_header("Content-Type", "text/event-stream")
+        manejador.send_header("Connection", "close")
+        manejador.end_headers()
+        manejador.close_connection = True
+
+        def evento(datos):
+            manejador.wfile.write(f"event: {datos['type']}\ndata: {json.dumps(datos)}\n\n".encode())
+            manejador.wfile.flush()
+
+        for n, fila in enumerate(filas):
+            if n == self.error_tras_filas:
+                evento({"type": "error", "error": {"type": "server_error", "message": "Falla a mitad del stream"},
+                        "sequence_number": n})
+                return
+            if n and self.segundos_por_fila:
+                time.sleep(self.segundos_por_fila)
+            evento({"type": "response.output_text.delta", "item_id": "msg_falso", "output_index": 0,
+                    "content_index": 0, "delta": fila, "sequence_number": n, "logprobs": []})
+        evento({"type": "response.incomplete" if truncada else "response.completed",
+                "response": self._respuesta(cuerpo, tabla, truncada), "sequence_number": len(filas)})
+
+    def estadisticas(self):
+        datos = super().estadisticas()
+        with self._lock:
+            datos["defectos"] = dict(self.defectos)
+        return datos
+
+
+class SheetsFalso(ServidorFalso):
+    """
+    Imita el endpoint de tokens OAuth y values:append de Sheets v4.
+    Cuenta las filas recibidas, las guarda en orden en `valores` y anota el
+    tamaño de cada append en `bloques`.
+
+    El endpoint de tokens entrega `token_valido`; un append con otro token
+    (p. ej. uno "expirado") recibe 401.
+    """
+
+    def __init__(self, token_valido="falso", **kwargs):
+        super().__init__(**kwargs)
+        self.token_valido = token_valido
+        self.filas = 0
+        self.valores = []
+        self.bloques = []
+        self.rechazadas_401 = 0
+
+    def responder(self, manejador, ruta, cuerpo):
+        if ruta.startswith("/token"):
+            self._responder_json(manejador, 200, {"access_token": self.token_valido, "expires_in": 3600})
+            return
+        if manejador.headers.get("Authorization") != f"Bearer {self.token_valido}":
+            with self._lock:
+                self.rechazadas_401 += 1
+            self._responder_json(manejador, 401, {"error": {"code": 401, "status": "UNAUTHENTICATED"}})
+            return
+        valores = cuerpo.get("values", [])
+        filas = len(valores)
+        with self._lock:
+            self.filas += filas
+            self.valores.extend(valores)
+            self.bloques.append(filas)
+        self._responder_json(manejador, 200, {"updates": {"updatedRows": filas}})
+
+    def estadisticas(self):
+        datos = super().estadisticas()
+        datos["filas"] = self.filas
+        return datos
@@ -0,0 +1,3 @@
+"""
+Utilidades del análisis de contratos que no dependen de la interfaz Streamlit.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from contratos.cli import main
+
+sys.exit(main())
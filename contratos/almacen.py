@@ -0,0 +1,236 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from contratos.cache import CACHE_DIR_DEFAULT
+from contratos.extractores import parsear_fecha, parsear_monto
+
+# ===============================================================
+# ALMACÉN LOCAL DE FICHAS CON BÚSQUEDA (SQLITE + FTS5)
+# ===============================================================
+# Cada ficha analizada se guarda con columnas tipadas (montos en centavos,
+# fechas ISO) e índices para filtrar por contratista, monto y fechas, más un
+# índice de texto completo (FTS5) sobre Partes, Objeto y Obligaciones.
+
+LIMITE_RESULTADOS = 100
+
+# "... y ARAM ALTA INGENIERÍA S.A. DE C.V. (“EL CONTRATISTA”)" (formato que pide el prompt)
+RE_CONTRATISTA = re.compile(
+    r"(?:^|[,;]\s*|\by\s+)([^,;()“”\"]+?)\s*\(\s*[“\"']?\s*(?:EL|LA)\s+CONTRATISTA",
+    re.IGNORECASE
+)
+RE_RAZON_SOCIAL = re.compile(
+    r"([A-ZÁÉÍÓÚÑ0-9&][A-ZÁÉÍÓÚÑ0-9&.\- ]{2,}?,?\s+S\.?\s?A\.?(?:\s+DE\s+C\.?\s?V\.?)?"
+    r"|[A-ZÁÉÍÓÚÑ0-9&][A-ZÁÉÍÓÚÑ0-9&.\- ]{2,}?,?\s+S\.?\s?(?:DE\s+)?R\.?\s?L\.?(?:\s+DE\s+C\.?\s?V\.?)?)"
+)
+
+
+def extraer_contratista(partes: str):
+    """
+    Nombre del contratista a partir del campo "Partes", o None.
+    """
+    m = RE_CONTRATISTA.search(partes or "")
+    if m:
+        return m.group(1).strip()
+    m = RE_RAZON_SOCIAL.search(partes or "")
+    return m.group(1).strip() if m else None
+
+
+def _centavos(valor):
+    return None if valor is None else int(Decimal(str(valor)) * 100)
+
+
+def _iso(valor):
+    return valor.isoformat() if isinstance(valor, date) else valor
+
+
+def patron_like(texto: str):
+    """
+    Patrón LIKE para valores que empiezan con las palabras de `texto`, en
+    orden y con cualquier cosa entre ellas. Empieza con texto literal, así que
+    SQLite resuelve el prefijo con el índice NOCASE. LIKE solo ignora
+    mayúsculas en ASCII: cada letra no ASCII (á, Ñ, ...) se vuelve comodín de
+    un carácter ("aram ingeniería" encuentra "ARAM ALTA INGENIERÍA").
+    """
+    palabras = re.findall(r"\w+", texto or "")
+    if not palabras:
+        return None
+    return "%".join("".join(c if c.isascii() else "_" for c in p) for p in palabras) + "%"
+
+
+def consulta_fts(texto: str):
+    """
+    Convierte texto libre en una consulta FTS5 segura: cada palabra entre
+    comillas (todas deben aparecer).
+    """
+    palabras = re.findall(r"\w+", texto or "")
+    if not palabras:
+        return None
+    return " ".join(f'"{p}"' for p in palabras)
+
+
+class AlmacenFichas:
+    """
+    Fichas analizadas en SQLite, consultables con buscar(). Una ficha por
+    clave de análisis (guardar() reemplaza la anterior).
+    """
+
+    def __init__(self, directorio: str = CACHE_DIR_DEFAULT):
+        os.makedirs(directorio, exist_ok=True)
+        self.ruta = os.path.join(directorio, "fichas.sqlite3")
+        self._lock = threading.Lock()
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS fichas (
+                    id INTEGER PRIMARY KEY,
+                    clave TEXT UNIQUE,
+                    archivo TEXT,
+                    contratista TEXT,
+                    monto_centavos INTEGER,
+                    monto_total_centavos INTEGER,
+                    fecha_inicio TEXT,
+                    fecha_fin TEXT,
+                    campos TEXT NOT NULL,
+                    creado REAL NOT NULL
+                )
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_fichas_contratista ON fichas(contratista COLLATE NOCASE)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_fichas_monto ON fichas(monto_centavos)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_fichas_inicio ON fichas(fecha_inicio)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_fichas_fin ON fichas(fecha_fin)")
+            con.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS fichas_fts USING fts5(
+                    partes, objeto, obligaciones,
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _fila(campos, clave, archivo):
+        return {
+            "clave": clave,
+            "archivo": archivo,
+            "contratista": extraer_contratista(campos.get("Partes", "")),
+            "monto_centavos": _centavos(parsear_monto(campos.get("Monto antes de IVA", ""))),
+            "monto_total_centavos": _centavos(parsear_monto(campos.get("Monto total", ""))),
+            "fecha_inicio": _iso(parsear_fecha(campos.get("Fecha de inicio", ""))),
+            "fecha_fin": _iso(parsear_fecha(campos.get("Fecha de fin", ""))),
+            "campos": json.dumps(campos, ensure_ascii=False),
+            "creado": time.time(),
+        }
+
+    def guardar(self, campos: dict, clave=None, archivo=None):
+        """
+        Guarda una ficha ({Campo: Respuesta}) y devuelve su id. Si ya existe
+        una ficha con la misma `clave`, se reemplaza.
+        """
+        return self.guardar_muchas([(campos, clave, archivo)])[0]
+
+    def guardar_muchas(self, fichas):
+        """
+        Guarda [(campos, clave, archivo), ...] en una sola transacción.
+        """
+        ids = []
+        with self._lock, self._conectar() as con:
+            for campos, clave, archivo in fichas:
+                fila = self._fila(campos, clave, archivo)
+                if clave is not None:
+                    previo = con.execute("SELECT id FROM fichas WHERE clave = ?", (clave,)).fetchone()
+                    if previo is not None:
+                        con.execute("DELETE FROM fichas WHERE id = ?", previo)
+                        con.execute("DELETE FROM fichas_fts WHERE rowid = ?", previo)
+                cursor = con.execute(
+                    f"INSERT INTO fichas ({', '.join(fila)}) VALUES ({', '.join('?' * len(fila))})",
+                    list(fila.values())
+                )
+                con.execute(
+                    "INSERT INTO fichas_fts (rowid, partes, objeto, obligaciones) VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, campos.get("Partes", ""), campos.get("Objeto", ""),
+                     campos.get("Obligaciones proveedor", ""))
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def buscar(self, texto=None, contratista=None, monto_min=None, monto_max=None,
+               inicio_desde=None, inicio_hasta=None, fin_desde=None, fin_hasta=None,
+               limite=LIMITE_RESULTADOS):
+        """
+        Fichas que cumplen todos los filtros indicados, de mayor a menor monto.
+
+        - texto: palabras a buscar en Partes, Objeto y Obligaciones (sin acentos
+          ni mayúsculas).
+        - contratista: inicio del nombre del contratista extraído de Partes
+          (sus palabras en orden, sin distinguir mayúsculas); una palabra
+          cualquiera del nombre se busca con `texto`.
+        - monto_min / monto_max: monto antes de IVA (Decimal, int o float).
+        - inicio_* / fin_*: fechas (date) límite, inclusivas.
+
+        Devuelve dicts con id, archivo, contratista, monto (Decimal),
+        monto_total, fecha_inicio y fecha_fin (date) y campos.
+        """
+        condiciones, parametros = [], []
+        consulta_texto = consulta_fts(texto)
+        if consulta_texto:
+            condiciones.append("f.id IN (SELECT rowid FROM fichas_fts WHERE fichas_fts MATCH ?)")
+            parametros.append(consulta_texto)
+        # La columna contratista, no la frase en Partes (que también nombra a la dependencia y a los representantes)
+        patron = patron_like(contratista)
+        if patron:
+            condiciones.append("f.contratista LIKE ?")
+            parametros.append(patron)
+        for columna, operador, valor in (
+            ("monto_centavos", ">=", _centavos(monto_min)),
+            ("monto_centavos", "<=", _centavos(monto_max)),
+            ("fecha_inicio", ">=", _iso(inicio_desde)),
+            ("fecha_inicio", "<=", _iso(inicio_hasta)),
+            ("fecha_fin", ">=", _iso(fin_desde)),
+            ("fecha_fin", "<=", _iso(fin_hasta)),
+        ):
+            if valor is not None:
+                condiciones.append(f"f.{columna} {operador} ?")
+                parametros.append(valor)
+
+        consulta = (
+            "SELECT f.id, f.archivo, f.contratista, f.monto_centavos, f.monto_total_centavos, "
+            "f.fecha_inicio, f.fecha_fin, f.campos FROM fichas f"
+        )
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += " ORDER BY f.monto_centavos DESC LIMIT ?"
+        parametros.append(limite)
+
+        with self._conectar() as con:
+            filas = con.execute(consulta, parametros).fetchall()
+        return [
+            {
+                "id": id_ficha,
+                "archivo": archivo,
+                "contratista": contratista_ficha,
+                "monto": Decimal(monto) / 100 if monto is not None else None,
+                "monto_total": Decimal(total) / 100 if total is not None else None,
+                "fecha_inicio": date.fromisoformat(inicio) if inicio else None,
+                "fecha_fin": date.fromisoformat(fin) if fin else None,
+                "campos": json.loads(campos),
+            }
+            for id_ficha, archivo, contratista_ficha, monto, total, inicio, fin, campos in filas
+        ]
+
+    def contar(self):
+        with self._conectar() as con:
+            return con.execute("SELECT COUNT(*) FROM fichas").fetchone()[0]
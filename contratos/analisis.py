@@ -0,0 +1,287 @@
+import threading
+import time
+
+from contratos.clausulas import seleccionar_texto
+from contratos.extraccion import extraer_texto_pdf, iterar_texto_pdf
+from contratos.extractores import UMBRAL_CONFIANZA, extraer_campos_locales
+from contratos.limpieza import limpiar_paginas, limpiar_texto
+from contratos.limites import espera_backoff, estimar_tokens, limitador_global
+from contratos.ficha_json import leer_ficha_json
+from contratos.prompts import (
+    FORMATOS_TEXTO,
+    HEADERS_CONTRATO,
+    PROMPT_CACHE_KEY,
+    PROMPT_CACHE_KEYS,
+    PROMPT_VERSION,
+    SALIDA_DEFAULT,
+    SALIDA_JSON,
+    construir_mensajes,
+)
+from contratos.uso import contador_uso_global
+
+# ===============================================================
+# CONSTANTES DEL ANÁLISIS
+# ===============================================================
+
+# Modelo: forma parte de la clave de la caché de análisis junto con
+# PROMPT_VERSION (ver contratos.prompts).
+MODELO_ANALISIS = "gpt-5.1"
+
+# Por encima de este tamaño estimado el contrato se analiza por fragmentos
+TOKENS_FRAGMENTAR = 60000
+
+# Encabezado que precede al texto cuando solo se envían las cláusulas relevantes
+AVISO_EXTRACTOS = (
+    "[Por economía se incluyen SOLO las cláusulas relevantes para cada campo; "
+    "los tramos omitidos se indican con [...]]\n"
+)
+
+# ===============================================================
+# FUNCIÓN DE REINTENTOS ANTI RATE LIMIT (OPENAI)
+# ===============================================================
+
+def errores_reintentables():
+    """
+    Excepciones de OpenAI que se reintentan. El import es diferido: el SDK tarda
+    casi un segundo en cargar y solo hace falta cuando ya hubo una llamada.
+    """
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+def _retry_after(e):
+    """
+    Segundos sugeridos por el servidor (cabecera retry-after), si los hay.
+    """
+    respuesta = getattr(e, "response", None)
+    valor = respuesta.headers.get("retry-after") if respuesta is not None else None
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+def tokens_peticion(input_data, max_output_tokens):
+    """
+    Tokens que OpenAI descuenta del cupo: entrada estimada + max_output_tokens.
+    """
+    if isinstance(input_data, str):
+        texto = input_data
+    else:
+        texto = "".join(str(m.get("content", "")) for m in input_data)
+    return estimar_tokens(texto) + max_output_tokens
+
+def esperar_reintento(limitador, intento, e):
+    """
+    Backoff exponencial + jitter tras un error reintentable. Un 429 pausa a
+    todos los llamadores del proceso (la espera ocurre en el siguiente adquirir()).
+    """
+    from openai import RateLimitError
+
+    espera = espera_backoff(intento, retry_after=_retry_after(e))
+    if isinstance(e, RateLimitError):
+        limitador.pausar(espera)
+    else:
+        limitador.registrar_reintento()
+        time.sleep(espera)
+
+_lock_metricas = threading.Lock()
+
+def registrar_espera(metricas, segundos, reintento=False):
+    """
+    Suma en `metricas` el tiempo de espera (limitador + backoff) y los
+    reintentos. `metricas` puede compartirse entre hilos (fragmentos).
+    """
+    if metricas is None:
+        return
+    with _lock_metricas:
+        metricas["espera_s"] = metricas.get("espera_s", 0.0) + segundos
+        if reintento:
+            metricas["reintentos"] = metricas.get("reintentos", 0) + 1
+
+def argumentos_cache(prompt_cache_key):
+    """
+    Parámetros extra de responses.create para agrupar las peticiones que
+    comparten prefijo en la caché de prompts de OpenAI.
+    """
+    return {"prompt_cache_key": prompt_cache_key} if prompt_cache_key else {}
+
+def argumentos_formato(formato):
+    """
+    Parámetro `text` de responses.create (p. ej. el esquema JSON de la ficha,
+    ver contratos.prompts.FORMATOS_TEXTO); sin formato, texto libre.
+    """
+    return {"text": formato} if formato else {}
+
+def safe_gpt(client, model, input_data, max_output_tokens=4000, retries=5, limitador=None,
+             metricas=None, prompt_cache_key=PROMPT_CACHE_KEY, formato=None):
+    """
+    Llama a client.responses.create pasando antes por el limitador global
+    (peticiones/min y tokens/min) y reintenta 429/5xx/timeouts con backoff
+    exponencial + jitter. Un 429 pausa a todos los llamadores del proceso.
+    `formato` es el parámetro `text` de la petición (salida con esquema JSON).
+    Los tokens de entrada, en caché y de salida se suman en metricas["uso"]
+    y en el contador del proceso (ver contratos.uso); la espera y los
+    reintentos, en metricas["espera_s"] y metricas["reintentos"].
+    """
+    limitador = limitador or limitador_global()
+    estimado = tokens_peticion(input_data, max_output_tokens)
+
+    for intento in range(retries):
+        t0 = time.perf_counter()
+        limitador.adquirir(estimado)
+        registrar_espera(metricas, time.perf_counter() - t0)
+        try:
+            respuesta = client.responses.create(
+                model=model,
+                input=input_data,
+                max_output_tokens=max_output_tokens,
+                **argumentos_cache(prompt_cache_key),
+                **argumentos_formato(formato)
+            )
+        except errores_reintentables() as e:
+            t0 = time.perf_counter()
+            esperar_reintento(limitador, intento, e)
+            registrar_espera(metricas, time.perf_counter() - t0, reintento=True)
+            continue
+
+        usage = getattr(respuesta, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            limitador.ajustar(estimado, usage.total_tokens)
+        contador_uso_global().registrar(usage, model, metricas)
+        return respuesta
+    raise Exception("Rate limit persistente. Intenta de nuevo más tarde.")
+
+# ===============================================================
+# ETAPAS DEL PIPELINE: EXTRAER -> LIMPIAR -> PROMPT -> GPT -> PARSEAR
+# ===============================================================
+
+def extraer_y_limpiar(pdf_bytes: bytes, max_procesos=None, ocr=None, cache_ocr=None) -> str:
+    """
+    Extracción + limpieza en un solo paso (función de nivel módulo para poder
+    ejecutarse en un ProcessPoolExecutor). En modo secuencial cada página se
+    limpia en cuanto se extrae, sin armar el texto crudo completo. Con `ocr`,
+    las páginas escaneadas pasan por OCR (ver contratos.ocr).
+    """
+    if max_procesos == 1 and ocr is None:
+        return "".join(limpiar_paginas(iterar_texto_pdf(pdf_bytes)))
+    return limpiar_texto(extraer_texto_pdf(pdf_bytes, max_procesos=max_procesos, ocr=ocr, cache_ocr=cache_ocr))
+
+def parse_markdown_table(tabla_markdown: str):
+    """
+    Recibe la tabla en formato Markdown (la que genera el modelo)
+    y devuelve un dict {Campo: Respuesta}
+    """
+    campos = {}
+    lines = tabla_markdown.splitlines()
+
+    # Filtrar solo líneas que empiezan con '|'
+    lines = [l.strip() for l in lines if l.strip().startswith("|")]
+
+    if len(lines) < 3:
+        return campos  # algo raro
+
+    # Saltamos encabezado y separador
+    data_lines = lines[2:]
+
+    for line in data_lines:
+        # | Campo | Respuesta |
+        partes = [c.strip() for c in line.strip("|").split("|")]
+        if len(partes) < 2:
+            continue
+        campo, respuesta = partes[0], partes[1]
+        campos[campo] = respuesta
+
+    return campos
+
+def construir_tabla_markdown(campos_dict):
+    """
+    Operación inversa a parse_markdown_table: arma la tabla | Campo | Respuesta |
+    en el orden de HEADERS_CONTRATO.
+    """
+    lineas = ["| Campo | Respuesta |", "|-------|-----------|"]
+    for campo in HEADERS_CONTRATO:
+        valor = str(campos_dict.get(campo, "")).replace("|", "/").replace("\n", " ")
+        lineas.append(f"| {campo} | {valor} |")
+    return "\n".join(lineas)
+
+def leer_respuesta(texto: str, salida=SALIDA_DEFAULT, metricas=None):
+    """
+    Texto de la respuesta del modelo -> {Campo: Respuesta}, según el formato
+    de `salida`. Un JSON inválido (p. ej. truncado) se rescata parcialmente y
+    queda anotado en metricas["parseo_fallido"].
+    """
+    if salida == SALIDA_JSON:
+        return leer_ficha_json(texto, metricas)
+    return parse_markdown_table(texto)
+
+def analizar_texto(client, texto_limpio: str, model=MODELO_ANALISIS, usar_indice=True,
+                   usar_reglas=True, metricas=None, al_recibir_campo=None, salida=SALIDA_DEFAULT):
+    """
+    Envía el texto limpio a GPT y devuelve (tabla_markdown, campos_dict).
+    `salida` elige el formato en que responde el modelo ("json" con esquema o
+    "tabla" Markdown, ver contratos.prompts); la tabla devuelta es siempre Markdown.
+    Con `usar_reglas`, monto, fechas y plazo se extraen primero con reglas locales
+    (ver contratos.extractores) y los que salen con confianza suficiente ya no se
+    piden a GPT. Con `usar_indice` solo se envían las cláusulas que alimentan los
+    campos pendientes (ver contratos.clausulas).
+    `metricas` recibe la confianza de los campos locales, los tokens ahorrados y
+    el uso de tokens de las peticiones (metricas["uso"]).
+    Los contratos que exceden TOKENS_FRAGMENTAR se analizan por fragmentos (map-reduce).
+
+    Si se pasa `al_recibir_campo(campo, respuesta)`, la respuesta se pide en
+    streaming y el callback se invoca con cada campo en cuanto llega (primero los
+    resueltos localmente). Si el stream se corta se devuelve lo recibido y
+    metricas["stream_completo"] queda en False.
+    """
+    metricas = {} if metricas is None else metricas
+    locales = {}
+    if usar_reglas:
+        encontrados = extraer_campos_locales(texto_limpio)
+        locales = {c: v for c, (v, conf) in encontrados.items() if conf >= UMBRAL_CONFIANZA}
+        metricas["campos_locales"] = {c: conf for c, (_, conf) in encontrados.items()}
+    campos_gpt = [c for c in HEADERS_CONTRATO if c not in locales]
+    if al_recibir_campo:
+        for campo, valor in locales.items():
+            al_recibir_campo(campo, valor)
+
+    texto_gpt = texto_limpio
+    if usar_indice:
+        seleccion = seleccionar_texto(texto_limpio, campos_gpt, metricas=metricas)
+        if seleccion is not texto_limpio:
+            texto_gpt = AVISO_EXTRACTOS + seleccion
+
+    if estimar_tokens(texto_gpt) > TOKENS_FRAGMENTAR:
+        from contratos.fragmentos import analizar_por_fragmentos
+        tabla, campos = analizar_por_fragmentos(client, texto_gpt, model=model, campos_pedidos=campos_gpt,
+                                               metricas=metricas, salida=salida)
+        if al_recibir_campo:
+            for campo in campos_gpt:
+                al_recibir_campo(campo, campos.get(campo, ""))
+    elif al_recibir_campo:
+        from contratos.streaming import analizar_stream
+        tabla, campos = analizar_stream(
+            client,
+            model,
+            construir_mensajes(texto_gpt, campos_gpt, salida=salida),
+            al_recibir_campo,
+            metricas=metricas,
+            salida=salida
+        )
+    else:
+        respuesta = safe_gpt(
+            client,
+            model=model,
+            input_data=construir_mensajes(texto_gpt, campos_gpt, salida=salida),
+            max_output_tokens=3500,
+            metricas=metricas,
+            prompt_cache_key=PROMPT_CACHE_KEYS[salida],
+            formato=FORMATOS_TEXTO[salida]
+        )
+        tabla = respuesta.output_text
+        t0 = time.perf_counter()
+        campos = leer_respuesta(tabla, salida, metricas)
+        metricas["parseo_s"] = time.perf_counter() - t0
+
+    if locales or salida == SALIDA_JSON:
+        campos = {c: locales.get(c, campos.get(c, "")) for c in HEADERS_CONTRATO}
+        tabla = construir_tabla_markdown(campos)
+    return tabla, campos
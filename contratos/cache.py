@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# ===============================================================
+# CACHÉ PERSISTENTE DE ANÁLISIS (DIRECCIONADA POR CONTENIDO)
+# ===============================================================
+
+CACHE_DIR_DEFAULT = os.environ.get(
+    "CONTRATOS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "contratos")
+)
+CACHE_MAX_BYTES_DEFAULT = 256 * 1024 * 1024  # 256 MB
+
+
+def clave_analisis(pdf_bytes: bytes, version_prompt: str, modelo: str) -> str:
+    """
+    Clave de caché: SHA-256 de los bytes del PDF + versión del prompt + modelo.
+    Si cambia cualquiera de los tres, el análisis se considera distinto.
+    """
+    h = hashlib.sha256()
+    h.update(pdf_bytes)
+    h.update(b"\x00")
+    h.update(str(version_prompt).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(modelo.encode("utf-8"))
+    return h.hexdigest()
+
+
+class CacheAnalisis:
+    """
+    Caché en disco (SQLite) de {tabla Markdown, campos_dict} por contrato.
+    Es compartida entre sesiones, usuarios y procesos que usen el mismo directorio.
+    Se limita por tamaño total; al excederlo se expulsan las entradas menos usadas (LRU).
+    """
+
+    def __init__(self, directorio: str = CACHE_DIR_DEFAULT, max_bytes: int = CACHE_MAX_BYTES_DEFAULT):
+        os.makedirs(directorio, exist_ok=True)
+        self.ruta = os.path.join(directorio, "analisis.sqlite3")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS analisis (
+                    clave TEXT PRIMARY KEY,
+                    tabla TEXT NOT NULL,
+                    campos TEXT NOT NULL,
+                    tamano INTEGER NOT NULL,
+                    creado REAL NOT NULL,
+                    ultimo_acceso REAL NOT NULL
+                )
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_analisis_acceso ON analisis(ultimo_acceso)")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS estadisticas (
+                    nombre TEXT PRIMARY KEY,
+                    valor INTEGER NOT NULL
+                )
+            """)
+            con.execute("INSERT OR IGNORE INTO estadisticas VALUES ('hits', 0), ('misses', 0)")
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _contar(self, con, nombre):
+        con.execute("UPDATE estadisticas SET valor = valor + 1 WHERE nombre = ?", (nombre,))
+
+    def obtener(self, clave: str):
+        """
+        Devuelve {"tabla": str, "campos": dict} si la clave está en caché, o None.
+        """
+        with self._lock, self._conectar() as con:
+            fila = con.execute(
+                "SELECT tabla, campos FROM analisis WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                self._contar(con, "misses")
+                return None
+            con.execute(
+                "UPDATE analisis SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave)
+            )
+            self._contar(con, "hits")
+        return {"tabla": fila[0], "campos": json.loads(fila[1])}
+
+    def guardar(self, clave: str, tabla: str, campos_dict: dict):
+        """
+        Guarda (o reemplaza) un análisis y expulsa entradas LRU si se excede max_bytes.
+        """
+        campos_json = json.dumps(campos_dict, ensure_ascii=False)
+        tamano = len(tabla.encode("utf-8")) + len(campos_json.encode("utf-8"))
+        ahora = time.time()
+        with self._lock, self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO analisis VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, tabla, campos_json, tamano, ahora, ahora)
+            )
+            self._expulsar(con)
+
+    def _expulsar(self, con):
+        total = con.execute("SELECT COALESCE(SUM(tamano), 0) FROM analisis").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        filas = con.execute(
+            "SELECT clave, tamano FROM analisis ORDER BY ultimo_acceso ASC"
+        ).fetchall()
+        expulsadas = []
+        for clave, tamano in filas:
+            if total <= self.max_bytes:
+                break
+            expulsadas.append((clave,))
+            total -= tamano
+        con.executemany("DELETE FROM analisis WHERE clave = ?", expulsadas)
+
+    def estadisticas(self):
+        """
+        Devuelve hits, misses, número de entradas y bytes ocupados.
+        """
+        with self._conectar() as con:
+            stats = dict(con.execute("SELECT nombre, valor FROM estadisticas").fetchall())
+            entradas, total = con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM analisis"
+            ).fetchone()
+        stats["entradas"] = entradas
+        stats["bytes"] = total
+        return stats
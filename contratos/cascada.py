@@ -0,0 +1,101 @@
+import os
+import time
+
+from contratos.analisis import MODELO_ANALISIS, analizar_texto
+from contratos.clausulas import CAMPOS_SIN_FRAGMENTO
+from contratos.prompts import HEADERS_CONTRATO, SALIDA_DEFAULT
+from contratos.reanalisis import campos_no_localizados, reanalizar_campos, validar_ficha
+
+# ===============================================================
+# CASCADA DE MODELOS: UNO RÁPIDO PRIMERO, EL GRANDE SOLO PARA LO DUDOSO
+# ===============================================================
+# El modelo rápido llena la ficha completa; cada campo pasa por los
+# validadores de contratos.reanalisis.validar_ficha (formato de montos,
+# fechas legibles, patrón del plazo, coherencia entre fechas y plazo) y, si
+# se pide, los NO LOCALIZADO también se escalan. Solo esos campos se
+# reconsultan con el modelo grande, con sus pasajes del contrato.
+
+MODELO_RAPIDO = "gpt-5-mini"
+
+# Primer nivel de la cascada en la app y en la línea de comandos; vacío = sin
+# cascada (todo con MODELO_ANALISIS, como antes)
+MODELO_RAPIDO_DEFAULT = os.environ.get("CONTRATOS_MODELO_RAPIDO", "")
+
+CAMPOS_VALIDABLES = [c for c in HEADERS_CONTRATO if c not in CAMPOS_SIN_FRAGMENTO]
+
+
+def nombre_modelo(model=MODELO_ANALISIS, modelo_rapido=None):
+    """
+    Nombre con el que se identifica el análisis en la clave de la caché:
+    "gpt-5-mini>gpt-5.1" en cascada, o solo `model`.
+    """
+    return f"{modelo_rapido}>{model}" if modelo_rapido else model
+
+
+def analizar_en_cascada(client, texto_limpio: str, modelo_rapido=MODELO_RAPIDO, model=MODELO_ANALISIS,
+                        metricas=None, al_recibir_campo=None, salida=SALIDA_DEFAULT,
+                        escalar_no_localizados=True, **opciones):
+    """
+    Como analizar_texto (mismos `opciones`: usar_indice, usar_reglas), pero la
+    ficha la llena primero `modelo_rapido` y solo los campos que no pasan
+    validar_ficha (y los NO LOCALIZADO, con `escalar_no_localizados`) se
+    reconsultan con `model`. Devuelve (tabla_markdown, campos_dict).
+
+    `al_recibir_campo` recibe primero los campos del modelo rápido y después
+    los que corrigió el grande. metricas["uso"] suma ambos niveles y
+    metricas["cascada"] trae, por nivel, modelo, segundos, tokens y campos,
+    además de los campos escalados con su motivo, la tasa de escalamiento
+    y los que siguen sin resolver.
+    """
+    metricas = {} if metricas is None else metricas
+    t0 = time.perf_counter()
+    tabla, campos = analizar_texto(client, texto_limpio, modelo_rapido, metricas=metricas,
+                                   al_recibir_campo=al_recibir_campo, salida=salida, **opciones)
+    niveles = [{
+        "modelo": modelo_rapido,
+        "segundos": round(time.perf_counter() - t0, 3),
+        "uso": dict(metricas.get("uso", {})),
+        "campos": len(CAMPOS_VALIDABLES),
+    }]
+
+    motivos = validar_ficha(campos)
+    if escalar_no_localizados:
+        for campo in campos_no_localizados(campos):
+            motivos.setdefault(campo, "no localizado")
+    escalados = [c for c in CAMPOS_VALIDABLES if c in motivos]
+
+    if escalados:
+        metricas_grande = {}
+        t0 = time.perf_counter()
+        tabla, nuevos = reanalizar_campos(client, campos, texto_limpio, escalados, model,
+                                          metricas=metricas_grande, salida=salida)
+        uso_grande = metricas_grande.get("uso", {})
+        if metricas_grande.get("parseo_fallido"):
+            metricas.update(parseo_fallido=True, error_parseo=metricas_grande["error_parseo"])
+        niveles.append({
+            "modelo": model,
+            "segundos": round(time.perf_counter() - t0, 3),
+            "uso": uso_grande,
+            "campos": len(escalados),
+            "recuperados": len(metricas_grande["campos_recuperados"]),
+            "tokens_enviados": metricas_grande.get("tokens_enviados", 0),
+        })
+        uso = metricas.setdefault("uso", {})
+        for clave, valor in uso_grande.items():
+            uso[clave] = uso.get(clave, 0) + valor
+        if al_recibir_campo:
+            for campo in metricas_grande["campos_recuperados"]:
+                al_recibir_campo(campo, nuevos[campo])
+        campos = nuevos
+
+    pendientes = validar_ficha(campos)
+    if escalar_no_localizados:
+        pendientes.update(dict.fromkeys(campos_no_localizados(campos)))
+    metricas["cascada"] = {
+        "niveles": niveles,
+        "campos_escalados": escalados,
+        "motivos": {c: motivos[c] for c in escalados},
+        "tasa_escalamiento": round(len(escalados) / len(CAMPOS_VALIDABLES), 3),
+        "sin_resolver": [c for c in escalados if c in pendientes],
+    }
+    return tabla, campos
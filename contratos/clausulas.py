@@ -0,0 +1,175 @@
+import re
+
+from contratos.limites import estimar_tokens
+
+# ===============================================================
+# ÍNDICE DE CLÁUSULAS: QUÉ PARTE DEL CONTRATO ALIMENTA CADA CAMPO
+# ===============================================================
+
+_ORDINAL = (
+    r"(?:PRIMERA|SEGUNDA|TERCERA|CUARTA|QUINTA|SEXTA|S[EÉ]PTIMA|OCTAVA|NOVENA|"
+    r"D[EÉ]CIMA|UND[EÉ]CIMA|DUOD[EÉ]CIMA|VIG[EÉ]SIMA|TRIG[EÉ]SIMA)"
+)
+
+# Encabezados de cláusula en mayúsculas: "CLÁUSULA PRIMERA", "CLAUSULA DÉCIMA SEGUNDA"
+# o sin la palabra cláusula pero con ".-": "TERCERA.- MONTO DEL CONTRATO".
+# Las referencias dentro del texto suelen ir en minúsculas, por eso distingue mayúsculas.
+RE_CLAUSULA = re.compile(
+    rf"\bCL[AÁ]USULA\s+{_ORDINAL}(?:\s+{_ORDINAL})?|\b{_ORDINAL}(?:\s+{_ORDINAL})?\s*\.\s*-"
+)
+
+CARACTERES_ENCABEZADO = 160   # ventana donde se busca el título de la cláusula
+CARACTERES_CIERRE = 3000      # final del documento, donde suelen ir las firmas
+
+# Palabras clave del título de cláusula (ya en mayúsculas, con o sin acento) -> campos que alimenta
+PATRONES_CAMPO = [
+    (re.compile(r"OBJETO"), ("Objeto",)),
+    (re.compile(r"MONTO|IMPORTE|PRECIO|ANTICIPO|FORMA DE PAGO"),
+     ("Monto antes de IVA", "IVA", "Monto total")),
+    (re.compile(r"PLAZO|VIGENCIA"), ("Fecha de inicio", "Fecha de fin", "Vigencia/Plazo")),
+    (re.compile(r"GARANT[IÍ]A|FIANZA|VICIOS OCULTOS"), ("Garantía(s)",)),
+    (re.compile(r"OBLIGACI[OÓ]N|RESPONSABILIDAD|CALIDAD"), ("Obligaciones proveedor",)),
+    (re.compile(r"RESIDENTE|SUPERVISI|ESTIMACI[OÓ]N"), ("Supervisión",)),
+    (re.compile(r"PENA|RETENCI[OÓ]N|SANCI[OÓ]N"), ("Penalizaciones", "Penalización máxima")),
+    (re.compile(r"MODIFICACI|CONVENIO"), ("Modificaciones",)),
+    (re.compile(r"LEGISLACI|NORMATIV|LEYES"), ("Normatividad aplicable",)),
+    (re.compile(r"CONTROVERSIA|JURISDICCI|TRIBUNAL|COMPETENCIA"),
+     ("Resolución de controversias", "Normatividad aplicable")),
+    (re.compile(r"ANEXO"), ("Anexos",)),
+]
+
+# El proemio y las declaraciones (antes de la primera cláusula) nombran a las partes,
+# citan la normatividad y suelen enumerar los anexos.
+CAMPOS_PROEMIO = ("Partes", "Normatividad aplicable", "Anexos")
+CAMPOS_CIERRE = ("Firmas",)
+
+# Campos que el modelo deduce de los demás: no necesitan fragmento propio
+CAMPOS_SIN_FRAGMENTO = ("No localizado", "Áreas de mejora")
+
+# Pasajes para reconsultar un campo (ver pasajes_relevantes): además de sus
+# cláusulas, las menciones en cualquier parte del texto, con su contexto
+CARACTERES_PASAJE = 700
+MAX_PASAJES_CAMPO = 6
+PALABRAS_PASAJE = {
+    "Partes": r"contratista|dependencia|representad[ao]|denominar[aá]",
+    "Objeto": r"objeto|consistentes? en|encomienda",
+    "Monto antes de IVA": r"monto|importe|\$\s*\d",
+    "IVA": r"valor agregado|\bI\.?\s?V\.?\s?A\b",
+    "Monto total": r"monto total|importe total|valor agregado",
+    "Fecha de inicio": r"inicio|iniciar[aá]n?",
+    "Fecha de fin": r"conclu|termina|finaliza",
+    "Vigencia/Plazo": r"plazo|vigencia|d[ií]as naturales|d[ií]as h[aá]biles",
+    "Garantía(s)": r"garant[ií]a|fianza|vicios ocultos",
+    "Obligaciones proveedor": r"se obliga|obligaciones",
+    "Supervisión": r"residente|supervisi[oó]n|estimaci[oó]n",
+    "Penalizaciones": r"pena|sanci[oó]n|retenci[oó]n",
+    "Penalización máxima": r"no podr[aá]n? exceder|exceda|m[aá]ximo",
+    "Modificaciones": r"modificaci[oó]n|modificar|convenio",
+    "Normatividad aplicable": r"\bley\b|reglamento|art[ií]culo",
+    "Resolución de controversias": r"controversia|tribunal|jurisdicci[oó]n|fuero",
+    "Firmas": r"firma|por la dependencia|por el contratista",
+    "Anexos": r"anexo",
+}
+RE_PASAJE = {campo: re.compile(patron, re.IGNORECASE) for campo, patron in PALABRAS_PASAJE.items()}
+
+
+def construir_indice(texto: str):
+    """
+    Una sola pasada sobre el texto limpio: localiza los encabezados de cláusula y
+    clasifica cada cláusula por su título. Devuelve {campo: [(inicio, fin), ...]}.
+    """
+    indice = {}
+
+    def agregar(campos, inicio, fin):
+        for campo in campos:
+            indice.setdefault(campo, []).append((inicio, fin))
+
+    cortes = [m.start() for m in RE_CLAUSULA.finditer(texto)]
+    if cortes and cortes[0] > 0:
+        agregar(CAMPOS_PROEMIO, 0, cortes[0])
+
+    for inicio, fin in zip(cortes, cortes[1:] + [len(texto)]):
+        encabezado = texto[inicio:inicio + CARACTERES_ENCABEZADO].upper()
+        for patron, campos in PATRONES_CAMPO:
+            if patron.search(encabezado):
+                agregar(campos, inicio, fin)
+
+    agregar(CAMPOS_CIERRE, max(0, len(texto) - CARACTERES_CIERRE), len(texto))
+    return indice
+
+
+def _unir_rangos(rangos):
+    unidos = []
+    for inicio, fin in sorted(rangos):
+        if unidos and inicio <= unidos[-1][1]:
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], fin))
+        else:
+            unidos.append((inicio, fin))
+    return unidos
+
+
+def seleccionar_texto(texto: str, campos, indice=None, metricas=None):
+    """
+    Devuelve solo los fragmentos del contrato que alimentan `campos`, en orden
+    de aparición. Si algún campo no tiene cláusula localizada, devuelve el texto
+    completo (no arriesgamos un NO LOCALIZADO falso).
+
+    Si se pasa el dict `metricas`, se llena con los tokens estimados del texto,
+    los enviados, los ahorrados y los campos sin cláusula.
+    """
+    indice = construir_indice(texto) if indice is None else indice
+    requeridos = [c for c in campos if c not in CAMPOS_SIN_FRAGMENTO]
+    sin_clausula = [c for c in requeridos if c not in indice]
+
+    if sin_clausula:
+        seleccion = texto
+    else:
+        rangos = _unir_rangos(r for c in requeridos for r in indice[c])
+        seleccion = " [...] ".join(texto[a:b].strip() for a, b in rangos)
+
+    if metricas is not None:
+        tokens_texto = estimar_tokens(texto)
+        tokens_enviados = estimar_tokens(seleccion)
+        metricas.update({
+            "tokens_texto": tokens_texto,
+            "tokens_enviados": tokens_enviados,
+            "tokens_ahorrados": tokens_texto - tokens_enviados,
+            "campos_sin_clausula": sin_clausula,
+        })
+    return seleccion
+
+
+def pasajes_relevantes(texto: str, campos, indice=None, metricas=None):
+    """
+    Para reconsultar campos puntuales: junta, en orden de aparición, las
+    cláusulas de cada campo y hasta MAX_PASAJES_CAMPO menciones de sus palabras
+    clave en el resto del texto (CARACTERES_PASAJE alrededor de cada una).
+
+    A diferencia de seleccionar_texto, nunca devuelve el texto completo: los
+    campos sin cláusula ni menciones se omiten. Devuelve (texto, campos_con_pasaje).
+    """
+    indice = construir_indice(texto) if indice is None else indice
+    rangos = []
+    con_pasaje = []
+    for campo in campos:
+        propios = list(indice.get(campo, []))
+        patron = RE_PASAJE.get(campo)
+        if patron is not None:
+            for n, m in enumerate(patron.finditer(texto)):
+                if n == MAX_PASAJES_CAMPO:
+                    break
+                centro = (m.start() + m.end()) // 2
+                propios.append((max(0, centro - CARACTERES_PASAJE // 2),
+                                min(len(texto), centro + CARACTERES_PASAJE // 2)))
+        if propios:
+            con_pasaje.append(campo)
+            rangos += propios
+
+    seleccion = " [...] ".join(texto[a:b].strip() for a, b in _unir_rangos(rangos))
+    if metricas is not None:
+        metricas.update({
+            "tokens_texto": estimar_tokens(texto),
+            "tokens_enviados": estimar_tokens(seleccion),
+            "campos_sin_pasaje": [c for c in campos if c not in con_pasaje],
+        })
+    return seleccion, con_pasaje
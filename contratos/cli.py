@@ -0,0 +1,166 @@
+import argparse
+import os
+import sys
+import time
+
+# ===============================================================
+# LÍNEA DE COMANDOS: ANÁLISIS DE CONTRATOS SIN STREAMLIT
+# ===============================================================
+# python -m contratos analyze contrato1.pdf carpeta/ --out fichas.xlsx --jobs 8
+#
+# Este módulo solo importa la biblioteca estándar: OpenAI, PyMuPDF y los
+# escritores de xlsx/parquet se cargan dentro de cada etapa, así que `--help`
+# y los errores de uso responden al instante (ver benchmarks/bench_arranque.py).
+
+JOBS_DEFAULT = 8  # igual que contratos.lotes.MAX_CONCURRENCIA_GPT
+
+
+def _rutas_pdf(entradas):
+    """
+    Expande las entradas (archivos o carpetas) en la lista de PDFs a analizar,
+    en orden y sin repetir. Las carpetas se recorren sin recursión.
+    """
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas += sorted(
+                os.path.join(entrada, nombre) for nombre in os.listdir(entrada)
+                if nombre.lower().endswith(".pdf")
+            )
+        else:
+            rutas.append(entrada)
+    return list(dict.fromkeys(rutas))
+
+
+def _imprimir_progreso(nombre, etapa, completados, total):
+    if etapa != "extraido":
+        print(f"[{completados}/{total}] {etapa:<10} {nombre}", file=sys.stderr, flush=True)
+
+
+def analizar(args):
+    rutas = _rutas_pdf(args.pdfs)
+    faltantes = [r for r in rutas if not os.path.isfile(r)]
+    if faltantes:
+        print(f"No existe: {', '.join(faltantes)}", file=sys.stderr)
+        return 2
+    if not rutas:
+        print("No hay PDFs que analizar.", file=sys.stderr)
+        return 2
+    if not os.environ.get("OPENAI_API_KEY"):
+        print("Falta la variable de entorno OPENAI_API_KEY.", file=sys.stderr)
+        return 2
+
+    from openai import OpenAI
+
+    from contratos.analisis import MODELO_ANALISIS, PROMPT_VERSION
+    from contratos.cache import CACHE_DIR_DEFAULT, CacheAnalisis, clave_analisis
+    from contratos.cascada import MODELO_RAPIDO_DEFAULT, nombre_modelo
+    from contratos.exportar import ExportadorFichas
+    from contratos.lotes import analizar_lote
+    from contratos.ocr import OCR_DEFAULT, CacheOCR, crear_backend_ocr
+    from contratos.prompts import HEADERS_CONTRATO
+
+    model = args.modelo or MODELO_ANALISIS
+    modelo_rapido = None if args.sin_cascada else args.modelo_rapido or MODELO_RAPIDO_DEFAULT or None
+    directorio = args.directorio_cache or CACHE_DIR_DEFAULT
+    cache = None if args.sin_cache else CacheAnalisis(directorio)
+    nombre_ocr = OCR_DEFAULT if args.ocr is None else args.ocr
+    ocr = crear_backend_ocr(nombre_ocr)
+    if nombre_ocr and ocr is None and args.ocr:
+        print(f"El motor de OCR «{nombre_ocr}» no está instalado.", file=sys.stderr)
+        return 2
+    cache_ocr = CacheOCR(directorio) if ocr is not None and not args.sin_cache else None
+    almacen = None
+    if args.almacen:
+        from contratos.almacen import AlmacenFichas
+
+        almacen = AlmacenFichas(directorio)
+
+    archivos = []
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            archivos.append((ruta, f.read()))
+    claves = {
+        ruta: clave_analisis(pdf, PROMPT_VERSION, nombre_modelo(model, modelo_rapido)) for ruta, pdf in archivos
+    } if almacen else {}
+
+    t0 = time.perf_counter()
+    errores = []
+    ilegibles = []
+    escalamientos = []
+    with ExportadorFichas(args.out, args.formato, ["Archivo"] + HEADERS_CONTRATO) as exp:
+
+        def al_completar(resultado):
+            if resultado["error"]:
+                errores.append(resultado)
+                return
+            exp.escribir({"Archivo": resultado["nombre"], **resultado["campos"]})
+            if resultado["cascada"]:
+                escalamientos.append(resultado["cascada"]["tasa_escalamiento"])
+            if resultado["error_parseo"]:
+                ilegibles.append(resultado)
+            elif almacen is not None:
+                almacen.guardar(resultado["campos"], claves[resultado["nombre"]], resultado["nombre"])
+
+        analizar_lote(
+            OpenAI(), archivos, max_procesos=args.procesos, max_concurrencia=args.jobs,
+            cache=cache, model=model, progreso=None if args.silencioso else _imprimir_progreso,
+            al_completar=al_completar, modelo_rapido=modelo_rapido, ocr=ocr, cache_ocr=cache_ocr
+        )
+        fichas = exp.filas
+
+    for resultado in errores:
+        print(f"ERROR {resultado['nombre']}: {resultado['error']}", file=sys.stderr)
+    for resultado in ilegibles:
+        print(f"AVISO {resultado['nombre']}: la respuesta de GPT no era una ficha válida "
+              f"({resultado['error_parseo']}); solo se exportaron los campos rescatados.", file=sys.stderr)
+    print(
+        f"{fichas} fichas en {args.out}, {len(errores)} errores, {len(ilegibles)} respuestas ilegibles "
+        f"({time.perf_counter() - t0:.1f}s).",
+        file=sys.stderr
+    )
+    if escalamientos:
+        print(
+            f"Cascada {modelo_rapido} -> {model}: {sum(escalamientos) / len(escalamientos):.0%} de los campos "
+            f"escalados en promedio ({len(escalamientos)} contratos analizados).",
+            file=sys.stderr
+        )
+    return 1 if errores else 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="contratos", description="Análisis de contratos de obra pública sin la interfaz Streamlit."
+    )
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    p = subcomandos.add_parser(
+        "analyze", aliases=["analizar"], help="analiza PDFs y escribe una ficha por contrato",
+        description="Analiza uno o más contratos (PDF o carpetas con PDFs) y escribe sus fichas "
+                    "en un solo archivo. Requiere OPENAI_API_KEY."
+    )
+    p.add_argument("pdfs", nargs="+", help="archivos PDF o carpetas que los contengan")
+    p.add_argument("--out", "-o", default="fichas.xlsx", help="archivo de salida (por omisión fichas.xlsx)")
+    p.add_argument("--formato", choices=("xlsx", "csv", "parquet"),
+                   help="formato de salida (por omisión, la extensión de --out)")
+    p.add_argument("--jobs", "-j", type=int, default=JOBS_DEFAULT, help="llamadas simultáneas a OpenAI")
+    p.add_argument("--procesos", type=int, help="procesos para extraer texto (por omisión, uno por CPU)")
+    p.add_argument("--modelo", help="modelo de OpenAI (por omisión el de la app)")
+    p.add_argument("--modelo-rapido",
+                   help="modelo que llena la ficha primero; solo los campos dudosos pasan a --modelo "
+                        "(por omisión CONTRATOS_MODELO_RAPIDO, si está definida)")
+    p.add_argument("--sin-cascada", action="store_true", help="todo con --modelo, aunque haya modelo rápido")
+    p.add_argument("--ocr", choices=("tesseract", ""),
+                   help="motor de OCR para las páginas escaneadas; \"\" para no usar OCR "
+                        "(por omisión CONTRATOS_OCR o tesseract, si está instalado)")
+    p.add_argument("--sin-cache", action="store_true", help="no leer ni escribir las cachés de análisis y OCR")
+    p.add_argument("--directorio-cache", help="directorio de la caché y del almacén de fichas")
+    p.add_argument("--almacen", action="store_true", help="guardar las fichas en el almacén consultable")
+    p.add_argument("--silencioso", "-q", action="store_true", help="no mostrar el avance por archivo")
+    p.set_defaults(funcion=analizar)
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
@@ -0,0 +1,354 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from contextlib import contextmanager
+
+from contratos.cache import CACHE_DIR_DEFAULT
+from contratos.clausulas import CAMPOS_SIN_FRAGMENTO, construir_indice
+from contratos.extractores import MESES
+from contratos.prompts import HEADERS_CONTRATO
+
+# ===============================================================
+# CONTRATOS CASI DUPLICADOS (MINHASH + LSH SOBRE EL TEXTO LIMPIO)
+# ===============================================================
+# Un re-escaneo, la copia firmada o un convenio modificatorio traen bytes
+# distintos (la caché por hash no los reconoce) pero casi el mismo texto.
+# Cada contrato analizado se guarda con su firma MinHash; la firma se parte
+# en BANDAS y cada banda se indexa en SQLite, así que buscar un contrato
+# consulta solo los que comparten alguna banda (LSH), no todo el índice.
+# Con 16 bandas de 8 filas, dos textos con similitud (Jaccard) de 0.8 chocan
+# en alguna banda con probabilidad ~0.94, y de 0.5 con ~0.06.
+
+PALABRAS_POR_TEJA = 5          # shingles de 5 palabras
+NUM_PERMUTACIONES = 128
+BANDAS = 16
+FILAS_POR_BANDA = NUM_PERMUTACIONES // BANDAS
+UMBRAL_SIMILITUD = 0.8         # Jaccard estimada mínima para reutilizar un análisis
+UMBRAL_CAMPO_IGUAL = 0.95      # similitud (por palabras) del texto fuente para no reconsultar un campo
+MAX_LINEAS_DIFF = 200
+CAMPOS_COMPARABLES = [c for c in HEADERS_CONTRATO if c not in CAMPOS_SIN_FRAGMENTO]
+
+_PRIMO = 4294967291            # mayor primo < 2**32: (a*x + b) cabe en uint64
+_TEJAS_POR_BLOQUE = 4096       # matriz intermedia de NUM_PERMUTACIONES x bloque (~4 MB)
+_SEMILLA = 20240601
+
+_permutaciones = None
+
+
+def _coeficientes():
+    """
+    Coeficientes (a, b) de las NUM_PERMUTACIONES funciones hash, fijos para
+    que las firmas guardadas sigan siendo comparables entre procesos.
+    """
+    global _permutaciones
+    if _permutaciones is None:
+        import numpy as np  # diferido: solo lo necesita quien calcula firmas
+
+        rng = np.random.default_rng(_SEMILLA)
+        a = rng.integers(1, _PRIMO, NUM_PERMUTACIONES, dtype=np.uint64)
+        b = rng.integers(0, _PRIMO, NUM_PERMUTACIONES, dtype=np.uint64)
+        _permutaciones = (a[:, None], b[:, None])
+    return _permutaciones
+
+
+def _palabras(texto: str):
+    return re.findall(r"\w+", texto.casefold())
+
+
+def tejas(texto: str):
+    """
+    Conjunto de shingles (PALABRAS_POR_TEJA palabras seguidas) como enteros de 32 bits.
+    """
+    palabras = _palabras(texto)
+    if len(palabras) < PALABRAS_POR_TEJA:
+        return {zlib.crc32(" ".join(palabras).encode())}
+    return {
+        zlib.crc32(" ".join(palabras[i:i + PALABRAS_POR_TEJA]).encode())
+        for i in range(len(palabras) - PALABRAS_POR_TEJA + 1)
+    }
+
+
+def firma_minhash(texto: str):
+    """
+    Firma MinHash del texto: NUM_PERMUTACIONES enteros de 32 bits (bytes).
+    Las tejas se procesan por bloques de _TEJAS_POR_BLOQUE con un mínimo
+    acumulado, así que la memoria no crece con el largo del contrato.
+    """
+    import numpy as np
+
+    a, b = _coeficientes()
+    x = np.fromiter(tejas(texto), dtype=np.uint64)
+    firma = np.full(NUM_PERMUTACIONES, _PRIMO, dtype=np.uint64)
+    for inicio in range(0, len(x), _TEJAS_POR_BLOQUE):
+        bloque = a * x[inicio:inicio + _TEJAS_POR_BLOQUE] + b
+        np.remainder(bloque, _PRIMO, out=bloque)
+        np.minimum(firma, bloque.min(axis=1), out=firma)
+    return firma.astype("<u4").tobytes()
+
+
+def similitud(firma_a: bytes, firma_b: bytes):
+    """
+    Jaccard estimada: fracción de posiciones en que coinciden las dos firmas.
+    """
+    import numpy as np
+
+    return float(np.mean(np.frombuffer(firma_a, "<u4") == np.frombuffer(firma_b, "<u4")))
+
+
+def _hash_bandas(firma: bytes):
+    tam = FILAS_POR_BANDA * 4
+    return [
+        int.from_bytes(hashlib.blake2b(firma[i * tam:(i + 1) * tam], digest_size=8).digest(), "big", signed=True)
+        for i in range(BANDAS)
+    ]
+
+
+def _palabras_con_inicio(texto: str):
+    """
+    Como _palabras, más la posición (carácter) donde empieza cada palabra.
+    """
+    encontradas = list(re.finditer(r"\w+", texto))
+    return [m.group().casefold() for m in encontradas], [m.start() for m in encontradas]
+
+
+def _tejas_unicas(palabras):
+    """
+    {teja (tupla de palabras): posición} de las tejas que aparecen una sola vez.
+    """
+    posiciones = {}
+    for i in range(len(palabras) - PALABRAS_POR_TEJA + 1):
+        teja = tuple(palabras[i:i + PALABRAS_POR_TEJA])
+        posiciones[teja] = -1 if teja in posiciones else i
+    return {teja: i for teja, i in posiciones.items() if i >= 0}
+
+
+def _alinear(origen, destino):
+    """
+    Función que lleva un índice de palabra de `origen` a la posición
+    equivalente en `destino`. Se ancla en las tejas que aparecen una sola vez
+    en cada texto (lineal, a diferencia de difflib sobre el texto completo) y
+    entre anclas avanza palabra por palabra.
+    """
+    en_destino = _tejas_unicas(destino)
+    anclas_origen, anclas_destino = [], []
+    for teja, i in _tejas_unicas(origen).items():  # en orden de aparición en `origen`
+        j = en_destino.get(teja)
+        # Solo anclas en el mismo orden en ambos textos (un bloque movido no alinea)
+        if j is not None and (not anclas_destino or j > anclas_destino[-1]):
+            anclas_origen.append(i)
+            anclas_destino.append(j)
+
+    def ubicar(i):
+        if not anclas_origen:
+            return min(i, len(destino))
+        k = max(bisect_right(anclas_origen, i) - 1, 0)
+        return min(max(anclas_destino[k] + i - anclas_origen[k], 0), len(destino))
+
+    return ubicar
+
+
+def _mismos_datos(anterior, nuevo):
+    """
+    Cifras (montos, días, años) idénticas y en orden, y mismos meses. Un mes
+    ilegible en una versión (ruido de OCR) no cuenta; uno distinto, sí.
+    """
+    if [p for p in anterior if p.isdigit()] != [p for p in nuevo if p.isdigit()]:
+        return False
+    meses_a, meses_b = [p for p in anterior if p in MESES], [p for p in nuevo if p in MESES]
+    if len(meses_a) > len(meses_b):
+        meses_a, meses_b = meses_b, meses_a
+    restantes = iter(meses_b)
+    return all(mes in restantes for mes in meses_a)  # uno es subsecuencia del otro
+
+
+def _mismo_texto(anterior, nuevo):
+    """
+    True si dos listas de palabras son el mismo texto salvo ruido (de OCR):
+    mismos datos (ver _mismos_datos) y similitud >= UMBRAL_CAMPO_IGUAL. La
+    similitud es la de difflib (2 * coincidencias / total) pero sobre el
+    multiconjunto de palabras, lineal aun con el texto completo; el orden ya
+    lo vigilan las cifras.
+    """
+    if anterior == nuevo:
+        return True
+    if not anterior or not nuevo or not _mismos_datos(anterior, nuevo):
+        return False
+    comunes = sum((Counter(anterior) & Counter(nuevo)).values())
+    return 2 * comunes / (len(anterior) + len(nuevo)) >= UMBRAL_CAMPO_IGUAL
+
+
+def _cambios_desde(texto_origen: str, texto_destino: str):
+    """
+    Campos cuyas cláusulas en `texto_origen` (o el texto completo, si el campo
+    no tiene) no tienen el mismo texto en la parte equivalente de `texto_destino`.
+    """
+    palabras, inicios = _palabras_con_inicio(texto_origen)
+    destino = _palabras(texto_destino)
+    ubicar = _alinear(palabras, destino)
+    indice = construir_indice(texto_origen)
+    completo_igual = None
+    cambiados = set()
+    for campo in CAMPOS_COMPARABLES:
+        if campo in indice:
+            rangos = [(bisect_left(inicios, a), bisect_left(inicios, b)) for a, b in indice[campo]]
+            igual = _mismo_texto([p for i, j in rangos for p in palabras[i:j]],
+                                 [p for i, j in rangos for p in destino[ubicar(i):ubicar(j)]])
+        else:
+            if completo_igual is None:
+                completo_igual = _mismo_texto(palabras, destino)
+            igual = completo_igual
+        if not igual:
+            cambiados.add(campo)
+    return cambiados
+
+
+def campos_cambiados(texto_anterior: str, texto_nuevo: str):
+    """
+    Campos cuyo texto fuente cambió entre dos versiones del contrato: una
+    cifra o un mes distinto, o menos de UMBRAL_CAMPO_IGUAL de similitud. Las
+    pocas palabras alteradas de un re-escaneo no cuentan como cambio.
+
+    Las cláusulas de cada versión se buscan en la otra por alineación (un
+    encabezado ilegible no cambia qué texto se compara), en ambos sentidos
+    para notar también las cláusulas que solo existen en la nueva.
+    """
+    cambiados = _cambios_desde(texto_anterior, texto_nuevo) | _cambios_desde(texto_nuevo, texto_anterior)
+    return [c for c in CAMPOS_COMPARABLES if c in cambiados]
+
+
+def diff_textos(anterior: str, nuevo: str, max_lineas=MAX_LINEAS_DIFF):
+    """
+    Diferencias entre dos textos limpios, oración por oración (formato unified diff).
+    """
+    def oraciones(texto):
+        return [o for o in re.split(r"(?<=[.;:])\s+", texto) if o]
+
+    lineas = list(difflib.unified_diff(oraciones(anterior), oraciones(nuevo), "anterior", "nuevo",
+                                       lineterm="", n=0))
+    if len(lineas) > max_lineas:
+        lineas = lineas[:max_lineas] + [f"... ({len(lineas) - max_lineas} líneas más)"]
+    return "\n".join(lineas)
+
+
+class IndiceDuplicados:
+    """
+    Contratos ya analizados (texto limpio comprimido, ficha y firma MinHash)
+    en SQLite, con las bandas LSH indexadas. buscar() devuelve el contrato más
+    parecido con similitud >= `umbral`, o None.
+    """
+
+    def __init__(self, directorio: str = CACHE_DIR_DEFAULT, umbral=UMBRAL_SIMILITUD):
+        os.makedirs(directorio, exist_ok=True)
+        self.ruta = os.path.join(directorio, "duplicados.sqlite3")
+        self.umbral = umbral
+        self._lock = threading.Lock()
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS contratos (
+                    id INTEGER PRIMARY KEY,
+                    clave TEXT UNIQUE,
+                    nombre TEXT,
+                    firma BLOB NOT NULL,
+                    texto BLOB NOT NULL,
+                    campos TEXT NOT NULL,
+                    creado REAL NOT NULL
+                )
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS bandas (
+                    banda INTEGER NOT NULL,
+                    hash INTEGER NOT NULL,
+                    id_contrato INTEGER NOT NULL,
+                    PRIMARY KEY (banda, hash, id_contrato)
+                ) WITHOUT ROWID
+            """)
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def agregar(self, clave, texto: str, campos: dict, nombre=None, firma=None):
+        """
+        Indexa un contrato analizado. Si ya existe uno con la misma `clave`,
+        se reemplaza. Devuelve su id.
+        """
+        return self.agregar_muchos([(clave, texto, campos, nombre, firma)])[0]
+
+    def agregar_muchos(self, contratos):
+        """
+        Indexa [(clave, texto, campos, nombre, firma), ...] en una sola
+        transacción; `firma` puede ser None para calcularla aquí.
+        """
+        filas = [
+            (clave, nombre, firma or firma_minhash(texto), zlib.compress(texto.encode()),
+             json.dumps(campos, ensure_ascii=False))
+            for clave, texto, campos, nombre, firma in contratos
+        ]
+        ids = []
+        with self._lock, self._conectar() as con:
+            for clave, nombre, firma, texto, campos in filas:
+                if clave is not None:
+                    previo = con.execute("SELECT id FROM contratos WHERE clave = ?", (clave,)).fetchone()
+                    if previo is not None:
+                        con.execute("DELETE FROM bandas WHERE id_contrato = ?", previo)
+                        con.execute("DELETE FROM contratos WHERE id = ?", previo)
+                cursor = con.execute(
+                    "INSERT INTO contratos (clave, nombre, firma, texto, campos, creado) VALUES (?, ?, ?, ?, ?, ?)",
+                    (clave, nombre, firma, texto, campos, time.time())
+                )
+                con.executemany(
+                    "INSERT OR IGNORE INTO bandas (banda, hash, id_contrato) VALUES (?, ?, ?)",
+                    [(banda, h, cursor.lastrowid) for banda, h in enumerate(_hash_bandas(firma))]
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def buscar(self, texto: str, firma=None, metricas=None):
+        """
+        Contrato indexado más parecido a `texto` con similitud >= umbral, como
+        dict {id, clave, nombre, similitud, texto, campos}; None si no hay.
+        `metricas` recibe cuántos candidatos compartían alguna banda.
+        """
+        firma = firma or firma_minhash(texto)
+        condicion = " OR ".join("(banda = ? AND hash = ?)" for _ in range(BANDAS))
+        parametros = [v for banda, h in enumerate(_hash_bandas(firma)) for v in (banda, h)]
+        with self._conectar() as con:
+            candidatos = con.execute(
+                f"SELECT id, firma FROM contratos WHERE id IN "
+                f"(SELECT id_contrato FROM bandas WHERE {condicion})",
+                parametros
+            ).fetchall()
+            if metricas is not None:
+                metricas["candidatos"] = len(candidatos)
+            mejor = max(((similitud(firma, f), i) for i, f in candidatos), default=None)
+            if mejor is None or mejor[0] < self.umbral:
+                return None
+            clave, nombre, texto_previo, campos = con.execute(
+                "SELECT clave, nombre, texto, campos FROM contratos WHERE id = ?", (mejor[1],)
+            ).fetchone()
+        return {
+            "id": mejor[1],
+            "clave": clave,
+            "nombre": nombre,
+            "similitud": mejor[0],
+            "texto": zlib.decompress(texto_previo).decode(),
+            "campos": json.loads(campos),
+        }
+
+    def contar(self):
+        with self._conectar() as con:
+            return con.execute("SELECT COUNT(*) FROM contratos").fetchone()[0]
@@ -0,0 +1,142 @@
+import csv
+import io
+
+from contratos.prompts import HEADERS_CONTRATO
+
+# ===============================================================
+# EXPORTACIÓN MASIVA DE FICHAS (XLSX / CSV / PARQUET) EN STREAMING
+# ===============================================================
+
+FORMATOS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Dependencia opcional (fuera de requirements.txt) que necesita cada formato
+DEPENDENCIAS_OPCIONALES = {"parquet": "pyarrow"}
+
+FILAS_POR_GRUPO_PARQUET = 2000
+
+
+def formatos_disponibles():
+    """
+    Formatos de FORMATOS que se pueden escribir con lo instalado (sin importar
+    las dependencias opcionales, solo se buscan).
+    """
+    from importlib.util import find_spec
+
+    return [f for f in FORMATOS if f not in DEPENDENCIAS_OPCIONALES or find_spec(DEPENDENCIAS_OPCIONALES[f])]
+
+
+class ExportadorFichas:
+    """
+    Escribe fichas una por una en un solo archivo, sin acumularlas en memoria:
+    - xlsx: xlsxwriter en modo constant_memory (cada fila se vuelca a disco al escribir la siguiente)
+    - csv: escritura directa (UTF-8 con BOM para que Excel respete los acentos)
+    - parquet: grupos de FILAS_POR_GRUPO_PARQUET filas (requiere pyarrow)
+
+    `destino` puede ser una ruta o un buffer binario (BytesIO). Uso:
+
+        with ExportadorFichas("fichas.xlsx") as exp:
+            for campos_dict in fichas:
+                exp.escribir(campos_dict)
+    """
+
+    def __init__(self, destino, formato=None, columnas=HEADERS_CONTRATO, hoja="Fichas"):
+        if formato is None:
+            formato = str(destino).rsplit(".", 1)[-1].lower() if isinstance(destino, str) else "xlsx"
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato} (usa {', '.join(FORMATOS)})")
+        self.destino = destino
+        self.formato = formato
+        self.columnas = list(columnas)
+        self.hoja = hoja
+        self.filas = 0
+        self._abrir()
+
+    def _abrir(self):
+        if self.formato == "xlsx":
+            import xlsxwriter
+
+            # Todos los valores son texto: sin detección de URLs/números por celda
+            self._libro = xlsxwriter.Workbook(
+                self.destino, {"constant_memory": True, "strings_to_urls": False}
+            )
+            self._hoja = self._libro.add_worksheet(self.hoja)
+            negrita = self._libro.add_format({"bold": True, "border": 1})
+            self._hoja.write_row(0, 0, self.columnas, negrita)
+        elif self.formato == "csv":
+            if isinstance(self.destino, str):
+                self._archivo = open(self.destino, "w", encoding="utf-8-sig", newline="")
+            else:
+                self._archivo = io.TextIOWrapper(self.destino, encoding="utf-8-sig", newline="")
+            self._csv = csv.writer(self._archivo)
+            self._csv.writerow(self.columnas)
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Para exportar a Parquet instala pyarrow (pip install pyarrow).")
+            self._pa = pa
+            self._esquema = pa.schema([(c, pa.string()) for c in self.columnas])
+            self._parquet = pq.ParquetWriter(self.destino, self._esquema)
+            self._grupo = []
+
+    def escribir(self, campos_dict):
+        fila = [str(campos_dict.get(col, "")) for col in self.columnas]
+        if self.formato == "xlsx":
+            escribir_celda = self._hoja.write_string
+            for col, valor in enumerate(fila):
+                escribir_celda(self.filas + 1, col, valor)
+        elif self.formato == "csv":
+            self._csv.writerow(fila)
+        else:
+            self._grupo.append(fila)
+            if len(self._grupo) >= FILAS_POR_GRUPO_PARQUET:
+                self._volcar_grupo()
+        self.filas += 1
+
+    def _volcar_grupo(self):
+        if not self._grupo:
+            return
+        columnas = list(zip(*self._grupo))
+        tabla = self._pa.Table.from_arrays(
+            [self._pa.array(col, type=self._pa.string()) for col in columnas],
+            schema=self._esquema
+        )
+        self._parquet.write_table(tabla)
+        self._grupo = []
+
+    def cerrar(self):
+        if self.formato == "xlsx":
+            self._hoja.set_column(0, len(self.columnas) - 1, 30)
+            self._libro.close()
+        elif self.formato == "csv":
+            self._archivo.flush()
+            if isinstance(self.destino, str):
+                self._archivo.close()
+            else:
+                self._archivo.detach()  # no cerrar el BytesIO del llamador
+        else:
+            self._volcar_grupo()
+            self._parquet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def exportar_fichas(fichas, formato="xlsx", columnas=HEADERS_CONTRATO, hoja="Fichas"):
+    """
+    Exporta un iterable de fichas a un BytesIO listo para st.download_button.
+    """
+    buffer = io.BytesIO()
+    with ExportadorFichas(buffer, formato, columnas, hoja) as exp:
+        for campos_dict in fichas:
+            exp.escribir(campos_dict)
+    buffer.seek(0)
+    return buffer
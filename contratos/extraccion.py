@@ -0,0 +1,120 @@
+import os
+import tempfile
+import time
+
+from contratos.traza import pico_rss_kb as _pico_rss_kb
+
+# ===============================================================
+# EXTRACCIÓN DE TEXTO DEL PDF (STREAMING + PARALELA POR PÁGINAS)
+# ===============================================================
+
+PAGINAS_PARALELO = 150       # a partir de aquí repartimos páginas entre procesos
+PAGINAS_POR_BLOQUE = 50
+
+
+def iterar_paginas(doc, inicio=0, fin=None, tiempos=None):
+    """
+    Genera el texto de cada página de `doc` (abierto con fitz) de forma perezosa.
+    Si se pasa la lista `tiempos`, agrega (segundos, pico_rss_kb) por página.
+    """
+    fin = doc.page_count if fin is None else fin
+    for num in range(inicio, fin):
+        t0 = time.perf_counter()
+        texto = doc.load_page(num).get_text("text")
+        if tiempos is not None:
+            tiempos.append((time.perf_counter() - t0, _pico_rss_kb()))
+        yield texto
+
+
+def iterar_texto_pdf(pdf_bytes: bytes):
+    """
+    Genera el texto de cada página (con su separador "\n\n") abriendo el PDF
+    desde memoria; útil para limpiar mientras se extrae.
+    """
+    import fitz  # diferido: PyMuPDF solo se carga cuando hay un PDF que abrir
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for texto in iterar_paginas(doc):
+            yield texto + "\n\n"
+
+
+def _extraer_bloque(ruta_pdf, inicio, fin):
+    """
+    Trabajo de un proceso: abre el PDF desde disco (el SO comparte las páginas
+    del archivo entre procesos) y extrae el rango [inicio, fin).
+    """
+    import fitz
+
+    tiempos = []
+    with fitz.open(ruta_pdf) as doc:
+        textos = list(iterar_paginas(doc, inicio, fin, tiempos))
+    return textos, tiempos
+
+
+def extraer_texto_pdf(pdf_bytes: bytes, max_procesos=None, metricas=None, ocr=None, cache_ocr=None) -> str:
+    """
+    Extrae el texto de todas las páginas del PDF con PyMuPDF.
+
+    - El documento se abre directo desde memoria (sin archivo temporal).
+    - Documentos largos (>= PAGINAS_PARALELO) se reparten por bloques de páginas
+      entre procesos; el archivo temporal que comparten se borra al terminar.
+      `max_procesos=1` fuerza la extracción secuencial.
+    - Con `ocr` (backend de contratos.ocr), las páginas escaneadas se leen con
+      OCR (solo esas, en paralelo y con caché por página en `cache_ocr`).
+    - Si se pasa el dict `metricas`, se llena con páginas, segundos totales,
+      segundos por página y pico de memoria (RSS, KB) por página.
+    """
+    import fitz
+
+    t0 = time.perf_counter()
+    tiempos = []
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        n_paginas = doc.page_count
+        max_procesos = max_procesos or os.cpu_count() or 1
+        if n_paginas < PAGINAS_PARALELO or max_procesos == 1:
+            textos = list(iterar_paginas(doc, tiempos=tiempos))
+        else:
+            textos = None
+
+    if textos is None:
+        from concurrent.futures import ProcessPoolExecutor
+
+        textos = []
+        bloques = [(i, min(i + PAGINAS_POR_BLOQUE, n_paginas))
+                   for i in range(0, n_paginas, PAGINAS_POR_BLOQUE)]
+        fd, ruta = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(pdf_bytes)
+            with ProcessPoolExecutor(max_workers=min(max_procesos, len(bloques))) as pool:
+                futuros = [pool.submit(_extraer_bloque, ruta, i, f) for i, f in bloques]
+                for fut in futuros:  # en orden de página
+                    textos_bloque, tiempos_bloque = fut.result()
+                    textos.extend(textos_bloque)
+                    tiempos.extend(tiempos_bloque)
+        finally:
+            os.remove(ruta)
+
+    metricas_ocr = {}
+    if ocr is not None:
+        from contratos.ocr import completar_con_ocr
+
+        textos = completar_con_ocr(pdf_bytes, textos, ocr, cache=cache_ocr, max_procesos=max_procesos,
+                                   metricas=metricas_ocr)
+
+    # Mismo formato que antes: cada página seguida de una línea en blanco
+    full_text = "".join(t + "\n\n" for t in textos)
+
+    if metricas is not None:
+        total = time.perf_counter() - t0
+        metricas.update({
+            "paginas": n_paginas,
+            "segundos": total,
+            "segundos_por_pagina": total / n_paginas if n_paginas else 0.0,
+            "tiempos_pagina": [t for t, _ in tiempos],
+            "pico_rss_kb_pagina": [m for _, m in tiempos],
+            "pico_rss_kb": max([m for _, m in tiempos if m is not None], default=_pico_rss_kb()),
+            **metricas_ocr,
+        })
+    return full_text
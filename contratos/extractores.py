@@ -0,0 +1,148 @@
+import re
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+# ===============================================================
+# EXTRACTORES LOCALES (REGLAS) PARA MONTO, FECHAS Y PLAZO
+# ===============================================================
+
+# Solo los campos con confianza >= UMBRAL_CONFIANZA se quitan de la petición a GPT
+UMBRAL_CONFIANZA = 0.9
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+NOMBRES_MES = {n: m for m, n in MESES.items() if m != "setiembre"}
+
+_CANTIDAD = r"\$\s*([\d][\d,.' ]*\d(?:\.\d{1,2})?)"
+_FECHA = (
+    r"(\d{1,2})\s*(?:o\.|°|º)?\s+de\s+(" + "|".join(MESES) + r")\s+(?:de|del)\s+(?:año\s+)?(\d{4})"
+)
+
+RE_MONTO_IVA = re.compile(
+    r"monto\s+(?:total\s+)?del\s+presente\s+contrato\s+es\s+(?:la\s+cantidad\s+)?de\s+" + _CANTIDAD
+    + r"([^$]{0,400}?)m[aá]s\s+(?:el\s+)?(?:impuesto\s+al\s+valor\s+agregado|I\.?\s?V\.?\s?A\.?)",
+    re.IGNORECASE | re.DOTALL
+)
+RE_MONTO_CONTRATO = re.compile(
+    r"monto\s+(?:total\s+)?del\s+(?:presente\s+)?contrato\s+es\s+(?:la\s+cantidad\s+)?de\s+" + _CANTIDAD,
+    re.IGNORECASE
+)
+RE_FECHA_INICIO = re.compile(
+    r"(?:inicio\s+de\s+(?:la\s+ejecuci[oó]n\s+de\s+)?los\s+trabajos\s+ser[aá]\s+el\s+d[ií]a"
+    r"|(?:iniciar[aá]n?|dar[aá]\s+inicio)[^.]{0,80}?el\s+d[ií]a)\s+" + _FECHA,
+    re.IGNORECASE
+)
+RE_FECHA_FIN = re.compile(
+    r"(?:se\s+)?(?:concluir[aá]n?|terminar[aá]n?|finalizar[aá]n?)\s+a\s+m[aá]s\s+tardar\s+el\s+d[ií]a\s+"
+    + _FECHA,
+    re.IGNORECASE
+)
+RE_PLAZO = re.compile(
+    r"plazo\s+de\s+ejecuci[oó]n[^.]{0,120}?(\d{1,4})\s*(?:\([^)]{0,60}\)\s*)?d[ií]as\s+(naturales|h[aá]biles)",
+    re.IGNORECASE
+)
+
+
+def normalizar_monto(cantidad: str):
+    """
+    "3,436,646.48" / "3'436,646.48" / "3.436.646,48" -> Decimal("3436646.48"), o None.
+    Una coma con uno o dos decimales al final es decimal ("950,00"); un solo
+    punto seguido de tres cifras ("1.234") se lee como decimal.
+    """
+    cantidad = cantidad.strip().replace("'", ",").replace(" ", "")
+    if re.fullmatch(r"(\d{1,3}(\.\d{3})+|\d+),\d{1,2}", cantidad):
+        cantidad = cantidad.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(\.\d{3}){2,}", cantidad):
+        cantidad = cantidad.replace(".", "")
+    else:
+        cantidad = cantidad.replace(",", "")
+    try:
+        return Decimal(cantidad).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+
+
+def formatear_monto(valor: Decimal) -> str:
+    """
+    Decimal -> "$X,XXX,XXX.XX" (formato que pide el prompt).
+    """
+    return f"${valor:,.2f}"
+
+
+def parsear_monto(texto: str):
+    """
+    Primer importe "$ ..." de un texto como Decimal, o None.
+    """
+    m = re.search(_CANTIDAD, texto or "")
+    return normalizar_monto(m.group(1)) if m else None
+
+
+def _fecha(dia, mes, anio):
+    try:
+        return date(int(anio), MESES[mes.lower()], int(dia))
+    except (ValueError, KeyError):
+        return None
+
+
+def formatear_fecha(f: date) -> str:
+    """
+    date -> "28 de octubre de 2024".
+    """
+    return f"{f.day} de {NOMBRES_MES[f.month]} de {f.year}"
+
+
+def parsear_fecha(texto: str):
+    """
+    Primera fecha "DD de mes de AAAA" de un texto como date, o None.
+    """
+    m = re.search(_FECHA, texto or "", re.IGNORECASE)
+    return _fecha(*m.groups()) if m else None
+
+
+def extraer_campos_locales(texto: str):
+    """
+    Extrae con reglas (milisegundos) Monto antes de IVA, Fecha de inicio,
+    Fecha de fin y Vigencia/Plazo.
+
+    Devuelve {campo: (valor_normalizado, confianza)} solo para los campos que
+    encontró. La confianza sube cuando las fechas y el plazo cuadran entre sí.
+    """
+    resultado = {}
+
+    m = RE_MONTO_IVA.search(texto)
+    confianza = 0.95
+    if not m:
+        m = RE_MONTO_CONTRATO.search(texto)
+        confianza = 0.7  # no sabemos si la cantidad es antes o después de IVA
+    if m:
+        monto = normalizar_monto(m.group(1))
+        if monto is not None:
+            resultado["Monto antes de IVA"] = (formatear_monto(monto), confianza)
+
+    inicio = fin = None
+    m = RE_FECHA_INICIO.search(texto)
+    if m and (inicio := _fecha(*m.groups())):
+        resultado["Fecha de inicio"] = (formatear_fecha(inicio), 0.9)
+    m = RE_FECHA_FIN.search(texto)
+    if m and (fin := _fecha(*m.groups())):
+        resultado["Fecha de fin"] = (formatear_fecha(fin), 0.9)
+
+    m = RE_PLAZO.search(texto)
+    if m:
+        dias, tipo = int(m.group(1)), m.group(2).lower().replace("á", "a")
+        resultado["Vigencia/Plazo"] = (f"{dias} días {'naturales' if tipo == 'naturales' else 'hábiles'}", 0.9)
+
+        # Coherencia: en días naturales, fin = inicio + plazo - 1 (o + plazo)
+        if inicio and fin and tipo == "naturales" and (fin - inicio) in (
+                timedelta(days=dias - 1), timedelta(days=dias)):
+            for campo in ("Fecha de inicio", "Fecha de fin", "Vigencia/Plazo"):
+                resultado[campo] = (resultado[campo][0], 0.99)
+
+    if inicio and fin and fin < inicio:
+        # Algo se leyó mal: mejor que lo resuelva GPT
+        for campo in ("Fecha de inicio", "Fecha de fin"):
+            resultado[campo] = (resultado[campo][0], 0.3)
+
+    return resultado
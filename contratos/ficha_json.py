@@ -0,0 +1,92 @@
+import json
+import re
+from json.decoder import scanstring
+
+from contratos.prompts import CAMPOS_JSON
+
+# ===============================================================
+# PARSEO DE LA FICHA EN JSON (SALIDA CON ESQUEMA)
+# ===============================================================
+# El modelo responde un objeto plano {"clave": "valor", ...} con las claves de
+# CLAVES_JSON. parse_ficha_json valida la respuesta completa (json.loads en C);
+# ParserFichaIncremental lee los pares conforme llegan en streaming y sirve
+# también para rescatar los campos completos de una respuesta truncada.
+
+# Inicio de un par: separador opcional, "clave", dos puntos y comilla de apertura
+RE_INICIO_PAR = re.compile(r'\s*[{,]?\s*"(\w+)"\s*:\s*"')
+
+
+def parse_ficha_json(texto: str):
+    """
+    Recibe el JSON que genera el modelo y devuelve un dict {Campo: Respuesta}
+    sin los campos vacíos (los que no se pidieron). Lanza ValueError si el
+    texto no es un objeto con claves del esquema y valores de texto.
+    """
+    datos = json.loads(texto)
+    if not isinstance(datos, dict):
+        raise ValueError("La respuesta no es un objeto JSON.")
+    desconocidas = [clave for clave in datos if clave not in CAMPOS_JSON]
+    if desconocidas:
+        raise ValueError(f"Claves fuera del esquema: {', '.join(desconocidas)}")
+    campos = {}
+    for clave, valor in datos.items():
+        if not isinstance(valor, str):
+            raise ValueError(f"El valor de {clave} no es texto.")
+        valor = valor.strip()
+        if valor:
+            campos[CAMPOS_JSON[clave]] = valor
+    return campos
+
+
+def leer_ficha_json(texto: str, metricas=None):
+    """
+    Como parse_ficha_json, pero nunca falla: si la respuesta no es válida
+    (p. ej. se cortó por max_output_tokens) devuelve los pares que sí llegaron
+    completos y anota metricas["parseo_fallido"] y metricas["error_parseo"].
+    """
+    try:
+        return parse_ficha_json(texto)
+    except ValueError as e:
+        if metricas is not None:
+            metricas["parseo_fallido"] = True
+            metricas["error_parseo"] = str(e)
+        parser = ParserFichaIncremental()
+        parser.agregar(texto)
+        return parser.campos
+
+
+class ParserFichaIncremental:
+    """
+    Versión incremental de parse_ficha_json (misma interfaz que
+    ParserTablaIncremental): recibe el texto por pedazos y devuelve cada
+    (campo, respuesta) en cuanto se cierra la comilla de su valor.
+    """
+
+    def __init__(self):
+        self.campos = {}
+        self._buffer = ""
+
+    def agregar(self, texto):
+        self._buffer += texto
+        filas = []
+        pos = 0
+        while True:
+            m = RE_INICIO_PAR.match(self._buffer, pos)
+            if not m:
+                break
+            try:
+                valor, fin = scanstring(self._buffer, m.end())
+            except ValueError:  # la cadena aún no termina
+                break
+            pos = fin
+            campo = CAMPOS_JSON.get(m.group(1))
+            valor = valor.strip()
+            if campo is not None and valor:
+                self.campos[campo] = valor
+                filas.append((campo, valor))
+        self._buffer = self._buffer[pos:]
+        return filas
+
+    def terminar(self):
+        self._buffer = ""
+        return []
@@ -0,0 +1,183 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from contratos.analisis import (
+    HEADERS_CONTRATO,
+    MODELO_ANALISIS,
+    construir_tabla_markdown,
+    leer_respuesta,
+    safe_gpt,
+)
+from contratos.clausulas import RE_CLAUSULA
+from contratos.extractores import parsear_monto
+from contratos.limites import CARACTERES_POR_TOKEN
+from contratos.prompts import FORMATOS_TEXTO, PROMPT_CACHE_KEYS, SALIDA_DEFAULT, construir_mensajes
+
+# ===============================================================
+# MAP-REDUCE PARA CONTRATOS QUE NO CABEN EN UNA SOLA PETICIÓN
+# ===============================================================
+
+TOKENS_POR_FRAGMENTO = 12000
+MAX_FRAGMENTOS_CONCURRENTES = 6
+
+NO_LOCALIZADO = "NO LOCALIZADO"
+
+# Campos que se derivan de los demás o que conviene acumular entre fragmentos
+CAMPOS_DERIVADOS = ("No localizado",)
+CAMPOS_ACUMULABLES = ("Normatividad aplicable", "Anexos", "Áreas de mejora")
+CAMPOS_MONTO = ("Monto antes de IVA", "Monto total")
+
+AVISO_FRAGMENTO = """IMPORTANTE: por su longitud, el contrato se dividió en {n} fragmentos y aquí recibes SOLO
+el fragmento {i} de {n}. Llena la ficha únicamente con lo que aparezca en ESTE fragmento;
+todo lo demás déjalo como NO LOCALIZADO (los fragmentos se combinan después).
+
+"""
+
+
+def dividir_en_clausulas(texto: str, tokens_por_fragmento=TOKENS_POR_FRAGMENTO):
+    """
+    Divide el texto limpio en fragmentos de a lo sumo ~tokens_por_fragmento tokens,
+    cortando en los encabezados de CLÁUSULA. El proemio y las declaraciones van
+    en el primer fragmento. Una cláusula más larga que el límite se corta en el
+    último espacio disponible.
+    """
+    max_chars = tokens_por_fragmento * CARACTERES_POR_TOKEN
+    cortes = [0] + [m.start() for m in RE_CLAUSULA.finditer(texto) if m.start() > 0] + [len(texto)]
+    secciones = [texto[a:b] for a, b in zip(cortes, cortes[1:]) if texto[a:b].strip()]
+
+    fragmentos = []
+    actual = ""
+    for seccion in secciones:
+        while len(seccion) > max_chars:
+            corte = seccion.rfind(" ", 0, max_chars)
+            corte = corte if corte > 0 else max_chars
+            if actual:
+                fragmentos.append(actual)
+                actual = ""
+            fragmentos.append(seccion[:corte])
+            seccion = seccion[corte:]
+        if len(actual) + len(seccion) > max_chars and actual:
+            fragmentos.append(actual)
+            actual = ""
+        actual += seccion
+    if actual.strip():
+        fragmentos.append(actual)
+    return [f.strip() for f in fragmentos]
+
+
+def es_no_localizado(valor):
+    return not (valor or "").strip() or valor.strip().upper() == NO_LOCALIZADO
+
+
+def resumen_no_localizados(campos, campos_pedidos=None):
+    """
+    Valor del campo derivado "No localizado": los campos que quedaron como
+    NO LOCALIZADO (o vacíos), separados por coma, o "Ninguno".
+    """
+    campos_pedidos = HEADERS_CONTRATO if campos_pedidos is None else campos_pedidos
+    faltantes = [c for c in campos_pedidos
+                 if c not in CAMPOS_DERIVADOS and c in campos and es_no_localizado(campos[c])]
+    return ", ".join(faltantes) if faltantes else "Ninguno"
+
+
+def combinar_campos(parciales, campos_pedidos=None):
+    """
+    Reduce las fichas parciales (una por fragmento, en orden) a una sola ficha
+    con los `campos_pedidos` (por omisión, todos los de HEADERS_CONTRATO).
+
+    Reglas:
+    - En general gana el primer valor distinto de NO LOCALIZADO.
+    - Normatividad, Anexos y Áreas de mejora acumulan los valores distintos.
+    - Los montos se cotejan entre fragmentos: gana el valor más repetido y las
+      discrepancias se anotan en Áreas de mejora; también se verifica que el
+      monto total sea el monto antes de IVA más 16%.
+    - "No localizado" se recalcula localmente.
+
+    Devuelve (campos_dict, conflictos).
+    """
+    campos_pedidos = HEADERS_CONTRATO if campos_pedidos is None else [
+        c for c in HEADERS_CONTRATO if c in campos_pedidos
+    ]
+    campos = {}
+    conflictos = []
+
+    for campo in campos_pedidos:
+        if campo in CAMPOS_DERIVADOS:
+            continue
+        valores = [p.get(campo, "").strip() for p in parciales]
+        valores = [v for v in valores if v and v.upper() != NO_LOCALIZADO]
+
+        if not valores:
+            campos[campo] = NO_LOCALIZADO
+        elif campo in CAMPOS_ACUMULABLES:
+            separador = " " if campo == "Áreas de mejora" else "; "
+            campos[campo] = separador.join(dict.fromkeys(valores))
+        elif campo in CAMPOS_MONTO:
+            montos = [(v, parsear_monto(v)) for v in valores]
+            conteo = Counter(d for _, d in montos if d is not None)
+            if len(conteo) > 1:
+                conflictos.append(
+                    f"{campo}: el contrato menciona montos distintos ({', '.join(dict.fromkeys(valores))})."
+                )
+            if conteo:
+                ganador = conteo.most_common(1)[0][0]
+                campos[campo] = next(v for v, d in montos if d == ganador)
+            else:
+                campos[campo] = valores[0]
+        else:
+            campos[campo] = valores[0]
+
+    base = parsear_monto(campos.get("Monto antes de IVA"))
+    total = parsear_monto(campos.get("Monto total"))
+    if base and total and abs(base * Decimal("1.16") - total) > Decimal("1.00"):
+        conflictos.append(
+            "Monto total: no coincide con el monto antes de IVA más 16% de IVA."
+        )
+
+    if conflictos:
+        previas = campos.get("Áreas de mejora", NO_LOCALIZADO)
+        previas = "" if previas == NO_LOCALIZADO else previas + " "
+        campos["Áreas de mejora"] = previas + " ".join(conflictos)
+
+    campos["No localizado"] = resumen_no_localizados(campos, campos_pedidos)
+
+    return {c: campos[c] for c in campos_pedidos if c in campos}, conflictos
+
+
+def _analizar_fragmento(client, fragmento, i, n, model, campos_pedidos, metricas=None, salida=SALIDA_DEFAULT):
+    respuesta = safe_gpt(
+        client,
+        model=model,
+        input_data=construir_mensajes(fragmento, campos_pedidos, aviso=AVISO_FRAGMENTO.format(i=i, n=n),
+                                      salida=salida),
+        max_output_tokens=3500,
+        metricas=metricas,
+        prompt_cache_key=PROMPT_CACHE_KEYS[salida],
+        formato=FORMATOS_TEXTO[salida]
+    )
+    return leer_respuesta(respuesta.output_text, salida, metricas)
+
+
+def analizar_por_fragmentos(client, texto_limpio: str, model=MODELO_ANALISIS, campos_pedidos=None,
+                            tokens_por_fragmento=TOKENS_POR_FRAGMENTO,
+                            max_concurrencia=MAX_FRAGMENTOS_CONCURRENTES, metricas=None, salida=SALIDA_DEFAULT):
+    """
+    Map: cada fragmento se analiza en paralelo (el limitador global regula el ritmo).
+    Reduce: combinar_campos() junta las fichas parciales.
+    Devuelve (tabla_markdown, campos_dict) igual que analizar_texto().
+    `metricas["uso"]` acumula los tokens de todos los fragmentos y
+    `metricas["fragmentos"]` guarda cuántos fueron.
+    """
+    fragmentos = dividir_en_clausulas(texto_limpio, tokens_por_fragmento)
+    n = len(fragmentos)
+    if metricas is not None:
+        metricas["fragmentos"] = n
+    with ThreadPoolExecutor(max_workers=min(max_concurrencia, n)) as pool:
+        parciales = list(pool.map(
+            lambda args: _analizar_fragmento(client, args[1], args[0] + 1, n, model, campos_pedidos, metricas,
+                                             salida),
+            enumerate(fragmentos)
+        ))
+    campos, _ = combinar_campos(parciales, campos_pedidos)
+    return construir_tabla_markdown(campos), campos
@@ -0,0 +1,153 @@
+import math
+import os
+import random
+import threading
+import time
+
+# ===============================================================
+# LIMITADOR GLOBAL DE PETICIONES/TOKENS (TOKEN BUCKET) PARA OPENAI
+# ===============================================================
+
+RPM_DEFAULT = int(os.environ.get("CONTRATOS_OPENAI_RPM", "500"))
+TPM_DEFAULT = int(os.environ.get("CONTRATOS_OPENAI_TPM", "500000"))
+
+CARACTERES_POR_TOKEN = 4  # aproximación conservadora para texto en español
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Estimación rápida (sin tokenizador) de los tokens de un texto.
+    """
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def espera_backoff(intento: int, base=1.0, maximo=60.0, retry_after=None) -> float:
+    """
+    Backoff exponencial con jitter completo. Si el servidor indicó retry-after,
+    nunca esperamos menos que eso.
+    """
+    espera = random.uniform(0, min(maximo, base * (2 ** intento)))
+    if retry_after:
+        espera = max(espera, float(retry_after))
+    return espera
+
+
+class LimitadorTokens:
+    """
+    Doble token bucket (peticiones/min y tokens/min) compartido por todo el proceso.
+
+    Los llamadores se atienden en orden de llegada (FIFO): nadie se "cuela" aunque
+    pida menos tokens, así que las sesiones concurrentes no se roban el cupo.
+    Cuando OpenAI responde 429, `pausar()` detiene a todos los llamadores a la vez
+    en lugar de que cada uno reintente por su cuenta.
+    """
+
+    def __init__(self, rpm=RPM_DEFAULT, tpm=TPM_DEFAULT):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._peticiones = float(rpm)
+        self._tokens = float(tpm)
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._cond = threading.Condition()
+        self._siguiente_turno = 0
+        self._turno_actual = 0
+        # Estadísticas
+        self._en_cola = 0
+        self._servidas = 0
+        self._reintentos = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def _rellenar(self, ahora):
+        transcurrido = ahora - self._ultimo
+        self._ultimo = ahora
+        self._peticiones = min(self.rpm, self._peticiones + transcurrido * self.rpm / 60.0)
+        self._tokens = min(self.tpm, self._tokens + transcurrido * self.tpm / 60.0)
+
+    def _espera_necesaria(self, ahora, tokens):
+        espera = self._pausa_hasta - ahora
+        if self._peticiones < 1:
+            espera = max(espera, (1 - self._peticiones) * 60.0 / self.rpm)
+        if self._tokens < tokens:
+            espera = max(espera, (tokens - self._tokens) * 60.0 / self.tpm)
+        return espera
+
+    def adquirir(self, tokens=1):
+        """
+        Bloquea hasta que haya cupo para una petición de `tokens` tokens.
+        Devuelve los segundos que se esperó.
+        """
+        tokens = min(tokens, self.tpm)  # una petición enorme no debe bloquear para siempre
+        inicio = time.monotonic()
+        with self._cond:
+            turno = self._siguiente_turno
+            self._siguiente_turno += 1
+            self._en_cola += 1
+            while True:
+                if turno != self._turno_actual:
+                    self._cond.wait()
+                    continue
+                ahora = time.monotonic()
+                self._rellenar(ahora)
+                espera = self._espera_necesaria(ahora, tokens)
+                if espera <= 0:
+                    break
+                self._cond.wait(espera)
+
+            self._peticiones -= 1
+            self._tokens -= tokens
+            self._turno_actual += 1
+            self._en_cola -= 1
+            esperado = time.monotonic() - inicio
+            self._servidas += 1
+            self._espera_total += esperado
+            self._espera_max = max(self._espera_max, esperado)
+            self._cond.notify_all()
+        return esperado
+
+    def ajustar(self, estimado, real):
+        """
+        Corrige el cupo con los tokens reales reportados por la API (usage).
+        """
+        with self._cond:
+            self._tokens = min(self.tpm, self._tokens + estimado - real)
+
+    def pausar(self, segundos):
+        """
+        Detiene a todos los llamadores durante `segundos` (p. ej. tras un 429).
+        """
+        with self._cond:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+            self._reintentos += 1
+            self._cond.notify_all()
+
+    def registrar_reintento(self):
+        with self._cond:
+            self._reintentos += 1
+
+    def estadisticas(self):
+        with self._cond:
+            return {
+                "en_cola": self._en_cola,
+                "servidas": self._servidas,
+                "reintentos": self._reintentos,
+                "espera_media_s": self._espera_total / self._servidas if self._servidas else 0.0,
+                "espera_max_s": self._espera_max,
+            }
+
+
+_limitador_global = None
+_lock_global = threading.Lock()
+
+
+def limitador_global():
+    """
+    Limitador único por proceso, compartido por todas las sesiones de Streamlit
+    y por los hilos del modo lote.
+    """
+    global _limitador_global
+    with _lock_global:
+        if _limitador_global is None:
+            _limitador_global = LimitadorTokens()
+        return _limitador_global
@@ -0,0 +1,114 @@
+import re
+
+# ===============================================================
+# NORMALIZADOR DE TEXTO (PATRONES PRECOMPILADOS, POCAS PASADAS)
+# ===============================================================
+#
+# Equivale byte a byte a la limpieza original:
+#   1) re.sub(r"(\w+)-\s*\n\s*(\w+)", r"\1\2", t)   une palabras cortadas con guion
+#   2) re.sub(r"\n(?!\n)", " ", t)                  saltos de línea simples -> espacio
+#   3) re.sub(r"\s{2,}", " ", t)                    colapsa espacios
+#   4) quita "�", "●", "•" y hace strip()
+#
+# - (1) era la pasada más cara: el regex original reintenta \w+ desde cada letra.
+#   Aquí el patrón empieza con el guion literal (búsqueda rápida) y se verifica la
+#   letra previa con lookbehind. Para respetar que el original consume la palabra
+#   final de cada unión (en "a-\nb-\nc" solo une "ab"), se salta el guion que
+#   queda justo al final de la palabra recién consumida.
+# - (2) cambia un espacio por otro sin alterar la longitud de las rachas, así que
+#   (2)+(3) equivalen a cambiar todo "\n" por " " (str.replace, muy rápido) y
+#   colapsar rachas de 2+ espacios.
+# - (4) va al final: quitar viñetas puede dejar dos espacios juntos y así era antes.
+#   Tres str.replace encadenados son más rápidos que str.translate para estos
+#   caracteres no latinos (ver benchmarks/bench_limpieza.py).
+
+RE_GUION_SALTO = re.compile(r"-(?<=\w-)\s*\n\s*(?=\w)")
+RE_PALABRA = re.compile(r"\w*")
+RE_ESPACIOS = re.compile(r"\s\s+")
+
+# Último punto donde se puede cortar el texto sin partir ningún match: después de
+# un signo que no es letra, espacio, guion ni basura, o entre una letra y un espacio.
+RE_HASTA_CORTE_SEGURO = re.compile(r".*(?:[^\w\s\-�●•]|\w(?=\s))", re.DOTALL)
+
+
+def _unir_guiones(t: str) -> str:
+    partes = []
+    ultimo = 0
+    fin_palabra_consumida = -1
+    for m in RE_GUION_SALTO.finditer(t):
+        if m.start() == fin_palabra_consumida:
+            continue
+        partes.append(t[ultimo:m.start()])
+        ultimo = m.end()
+        fin_palabra_consumida = RE_PALABRA.match(t, ultimo).end()
+    if not partes:
+        return t
+    partes.append(t[ultimo:])
+    return "".join(partes)
+
+
+def _normalizar(t: str) -> str:
+    t = _unir_guiones(t)
+    t = RE_ESPACIOS.sub(" ", t.replace("\n", " "))
+    return t.replace("�", "").replace("●", "").replace("•", "")
+
+
+def limpiar_texto(t: str) -> str:
+    return _normalizar(t).strip()
+
+
+class LimpiadorIncremental:
+    """
+    Limpia el texto por páginas conforme se va extrayendo.
+    "".join(salidas de agregar() + terminar()) == limpiar_texto(texto completo).
+
+    Solo se procesa hasta el último punto de corte seguro; el resto se guarda
+    para la siguiente página (un guion al final de página se une con la siguiente).
+    """
+
+    def __init__(self):
+        self._pendiente = ""     # texto crudo aún sin procesar
+        self._espacio = ""       # espacios finales retenidos (por el strip final)
+        self._inicio = True      # aún no se emite nada (por el strip inicial)
+
+    def _emitir(self, limpio: str) -> str:
+        if self._inicio:
+            limpio = limpio.lstrip()
+            if not limpio:
+                return ""
+            self._inicio = False
+        cuerpo = limpio.rstrip()
+        if not cuerpo:
+            self._espacio += limpio
+            return ""
+        salida = self._espacio + cuerpo
+        self._espacio = limpio[len(cuerpo):]
+        return salida
+
+    def agregar(self, texto: str) -> str:
+        self._pendiente += texto
+        m = RE_HASTA_CORTE_SEGURO.match(self._pendiente)
+        if not m:
+            return ""
+        listo, self._pendiente = self._pendiente[:m.end()], self._pendiente[m.end():]
+        return self._emitir(_normalizar(listo))
+
+    def terminar(self) -> str:
+        salida = self._emitir(_normalizar(self._pendiente)) if self._pendiente else ""
+        self._pendiente = ""
+        self._espacio = ""
+        return salida
+
+
+def limpiar_paginas(paginas):
+    """
+    Generador: recibe textos de página (ya con su separador) y produce texto limpio.
+    """
+    limpiador = LimpiadorIncremental()
+    for pagina in paginas:
+        salida = limpiador.agregar(pagina)
+        if salida:
+            yield salida
+    salida = limpiador.terminar()
+    if salida:
+        yield salida
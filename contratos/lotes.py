@@ -0,0 +1,134 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from contratos.analisis import MODELO_ANALISIS, PROMPT_VERSION, analizar_texto, extraer_y_limpiar
+from contratos.cache import clave_analisis
+from contratos.cascada import analizar_en_cascada, nombre_modelo
+from contratos.ocr import AVISO_SIN_TEXTO, texto_insuficiente
+
+# ===============================================================
+# MODO LOTE: MUCHOS CONTRATOS CON PARALELISMO ACOTADO
+# ===============================================================
+
+MAX_CONCURRENCIA_GPT = 8  # llamadas simultáneas a OpenAI
+
+
+def _analizar_con_uso(client, texto_limpio, model, modelo_rapido=None):
+    if texto_insuficiente(texto_limpio):
+        raise ValueError(AVISO_SIN_TEXTO)
+    metricas = {}
+    if modelo_rapido:
+        tabla, campos = analizar_en_cascada(client, texto_limpio, modelo_rapido, model, metricas=metricas)
+    else:
+        tabla, campos = analizar_texto(client, texto_limpio, model, metricas=metricas)
+    return tabla, campos, metricas.get("uso"), metricas.get("cascada"), metricas.get("error_parseo")
+
+
+def analizar_lote(client, archivos, max_procesos=None, max_concurrencia=MAX_CONCURRENCIA_GPT,
+                  cache=None, model=MODELO_ANALISIS, progreso=None, al_completar=None, modelo_rapido=None,
+                  ocr=None, cache_ocr=None):
+    """
+    Analiza una lista de contratos [(nombre, pdf_bytes), ...].
+
+    - La extracción + limpieza corre en un pool de procesos (CPU).
+    - Las llamadas a GPT corren en un pool de hilos con a lo sumo `max_concurrencia`
+      peticiones abiertas a la vez (I/O); cada archivo pasa a GPT en cuanto termina
+      su extracción, sin esperar al resto del lote.
+    - Si se pasa `cache` (CacheAnalisis), los contratos ya analizados no se reprocesan.
+    - Con `modelo_rapido`, cada contrato pasa por la cascada de contratos.cascada:
+      `modelo_rapido` llena la ficha y `model` solo revisa los campos dudosos.
+    - Con `ocr` (backend de contratos.ocr), las páginas escaneadas se leen con OCR
+      dentro del proceso de cada archivo, con caché por página en `cache_ocr`.
+      Un PDF sin texto legible termina en error sin llamar a GPT.
+
+    `progreso(nombre, etapa, completados, total)` se invoca siempre desde el hilo que
+    llamó a esta función (seguro para Streamlit). Etapas: "cache", "extraido",
+    "analizado", "error".
+    `al_completar(resultado)` se invoca (en el mismo hilo) en cuanto termina cada
+    archivo, p. ej. para ir escribiendo el registro con ExportadorFichas.
+
+    Devuelve una lista (mismo orden que `archivos`) de dicts:
+    {"nombre", "tabla", "campos", "desde_cache", "error", "uso", "cascada", "error_parseo"};
+    "uso" son los tokens (entrada, en caché, salida) de ese archivo, o None si no llamó
+    a GPT, "cascada" las métricas de la cascada (ver analizar_en_cascada), o None, y
+    "error_parseo" el motivo si la respuesta de GPT no era una ficha válida (sus campos
+    son solo los rescatados y no se guardan en `cache`), o None.
+    """
+    total = len(archivos)
+    resultados = [None] * total
+    completados = 0
+
+    def avisar(nombre, etapa):
+        if progreso:
+            progreso(nombre, etapa, completados, total)
+
+    def terminar(i, tabla=None, campos=None, desde_cache=False, error=None, uso=None, cascada=None,
+                 error_parseo=None):
+        nonlocal completados
+        completados += 1
+        resultados[i] = {
+            "nombre": archivos[i][0],
+            "tabla": tabla,
+            "campos": campos or {},
+            "desde_cache": desde_cache,
+            "error": error,
+            "uso": uso,
+            "cascada": cascada,
+            "error_parseo": error_parseo,
+        }
+        if al_completar:
+            al_completar(resultados[i])
+
+    # 0) Resolver lo que ya está en caché
+    claves = {}
+    pendientes = []
+    for i, (nombre, pdf_bytes) in enumerate(archivos):
+        if cache is not None:
+            claves[i] = clave_analisis(pdf_bytes, PROMPT_VERSION, nombre_modelo(model, modelo_rapido))
+            en_cache = cache.obtener(claves[i])
+            if en_cache is not None:
+                terminar(i, en_cache["tabla"], en_cache["campos"], desde_cache=True)
+                avisar(nombre, "cache")
+                continue
+        pendientes.append(i)
+
+    if not pendientes:
+        return resultados
+
+    from concurrent.futures import ProcessPoolExecutor  # diferido: cuesta ~15 ms al importar
+
+    max_procesos = max_procesos or min(len(pendientes), os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=max_procesos) as procesos, \
+            ThreadPoolExecutor(max_workers=max_concurrencia) as hilos:
+        # 1) Extraer + limpiar en paralelo (un proceso por archivo; dentro de cada
+        #    archivo la extracción es secuencial para no sobresuscribir la CPU)
+        en_vuelo = {}
+        for i in pendientes:
+            en_vuelo[procesos.submit(extraer_y_limpiar, archivos[i][1], 1, ocr, cache_ocr)] = ("extraccion", i)
+
+        # 2) Conforme termina cada extracción, lanzar su llamada a GPT
+        while en_vuelo:
+            hechos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for fut in hechos:
+                etapa, i = en_vuelo.pop(fut)
+                nombre = archivos[i][0]
+                try:
+                    valor = fut.result()
+                except Exception as e:
+                    terminar(i, error=str(e))
+                    avisar(nombre, "error")
+                    continue
+
+                if etapa == "extraccion":
+                    avisar(nombre, "extraido")
+                    en_vuelo[hilos.submit(_analizar_con_uso, client, valor, model, modelo_rapido)] = ("gpt", i)
+                else:
+                    tabla, campos, uso, cascada, error_parseo = valor
+                    # Una respuesta que no se pudo leer no se cachea: la próxima vez se vuelve a consultar
+                    if cache is not None and error_parseo is None:
+                        cache.guardar(claves[i], tabla, campos)
+                    terminar(i, tabla, campos, uso=uso, cascada=cascada, error_parseo=error_parseo)
+                    avisar(nombre, "analizado")
+
+    return resultados
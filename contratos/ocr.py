@@ -0,0 +1,339 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+from contratos.cache import CACHE_DIR_DEFAULT
+
+logger = logging.getLogger("contratos.ocr")
+
+# ===============================================================
+# OCR POR PÁGINA PARA CONTRATOS ESCANEADOS
+# ===============================================================
+# get_text("text") no devuelve nada (o basura) en las páginas escaneadas. Solo
+# esas páginas (poco texto legible y al menos una imagen) se renderizan con
+# fitz a un DPI adaptado a la resolución del escaneo y pasan por el motor de
+# OCR; las digitales conservan su capa de texto. El resultado se guarda por
+# huella de la página, así que volver a subir el mismo escaneo no repite el OCR.
+# Si el motor falla en una página, esa página se queda con su capa de texto.
+
+# Backend por omisión ("" = sin OCR); si el motor no está instalado, se omite
+OCR_DEFAULT = os.environ.get("CONTRATOS_OCR", "tesseract")
+
+MIN_CARACTERES_PAGINA = 80       # letras y dígitos por debajo de los cuales la página "no tiene texto"
+MIN_PROPORCION_LEGIBLE = 0.6     # fracción de caracteres de texto en español (el resto es basura)
+RE_LEGIBLE = re.compile(r"[0-9A-Za-zÁÉÍÓÚÜÑáéíóúüñ.,;:$%()/\"'“”°º-]")
+
+DPI_DEFAULT = 300                # si no se puede deducir la resolución del escaneo
+DPI_MIN = 150
+DPI_MAX = 400
+MAX_PIXELES = 16_000_000         # tope por página (~ carta a 400 DPI)
+
+PAGINAS_OCR_PARALELO = 2         # con menos páginas no vale la pena levantar procesos
+SEGUNDOS_MAX_OCR = 120           # por página
+
+AVISO_SIN_TEXTO = (
+    "El PDF no tiene texto legible: parece escaneado y no hay motor de OCR disponible "
+    "(o no pudo leerlo). No se consultó a GPT."
+)
+
+
+# -----------------------------------------------------------
+# Backends (deben poder enviarse a otro proceso: clases de nivel módulo)
+# -----------------------------------------------------------
+
+class OCRTesseract:
+    """
+    Tesseract local por línea de comandos (imagen por stdin, texto por stdout),
+    sin dependencias de Python. Requiere el ejecutable y el idioma instalados.
+    """
+
+    nombre = "tesseract"
+
+    def __init__(self, idioma="spa", ejecutable="tesseract"):
+        self.idioma = idioma
+        self.ejecutable = ejecutable
+        self._disponible = None
+
+    def disponible(self):
+        """
+        El ejecutable existe y tiene los datos de `idioma` (tesseract --list-langs).
+        Se consulta una sola vez por instancia.
+        """
+        if self._disponible is None:
+            self._disponible = shutil.which(self.ejecutable) is not None and self.idioma in self.idiomas()
+        return self._disponible
+
+    def idiomas(self):
+        import subprocess
+
+        try:
+            resultado = subprocess.run([self.ejecutable, "--list-langs"], capture_output=True, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return set()
+        # La primera línea es el encabezado; versiones viejas escriben la lista en stderr
+        salida = (resultado.stdout + resultado.stderr).decode("utf-8", "replace").splitlines()
+        return {linea.strip() for linea in salida[1:] if linea.strip()}
+
+    def __call__(self, imagen_png: bytes) -> str:
+        import subprocess  # diferido: ~6 ms al importar y solo hace falta con páginas escaneadas
+
+        resultado = subprocess.run(
+            [self.ejecutable, "stdin", "stdout", "-l", self.idioma],
+            input=imagen_png, capture_output=True, timeout=SEGUNDOS_MAX_OCR
+        )
+        if resultado.returncode != 0:
+            raise RuntimeError(f"Tesseract falló: {resultado.stderr.decode('utf-8', 'replace').strip()}")
+        return resultado.stdout.decode("utf-8", "replace")
+
+
+class OCRFalso:
+    """
+    Backend de prueba: no lee la imagen; devuelve `texto` después de ocupar la
+    CPU `segundos` (como lo haría un motor real).
+    """
+
+    nombre = "falso"
+
+    def __init__(self, texto="", segundos=0.0):
+        self.texto = texto
+        self.segundos = segundos
+
+    def disponible(self):
+        return True
+
+    def __call__(self, imagen_png: bytes) -> str:
+        fin = time.process_time() + self.segundos
+        while time.process_time() < fin:
+            pass
+        return self.texto
+
+
+BACKENDS_OCR = {"tesseract": OCRTesseract, "falso": OCRFalso}
+
+
+def crear_backend_ocr(nombre=OCR_DEFAULT):
+    """
+    Backend de BACKENDS_OCR listo para usarse, o None si `nombre` está vacío
+    o el motor (o su idioma) no está instalado.
+    """
+    if not nombre:
+        return None
+    backend = BACKENDS_OCR[nombre]()
+    if not backend.disponible():
+        logger.warning("El motor de OCR %r no está instalado (o le falta el idioma); se omite el OCR.", nombre)
+        return None
+    return backend
+
+
+# -----------------------------------------------------------
+# Caché de OCR por página
+# -----------------------------------------------------------
+
+class CacheOCR:
+    """
+    Texto OCR por página en SQLite, direccionado por la huella de la página,
+    el backend y el DPI. Solo guarda la ruta (cada operación abre su conexión),
+    así que puede enviarse a los procesos del modo lote.
+    """
+
+    def __init__(self, directorio: str = CACHE_DIR_DEFAULT):
+        os.makedirs(directorio, exist_ok=True)
+        self.ruta = os.path.join(directorio, "ocr.sqlite3")
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS paginas (
+                    clave TEXT PRIMARY KEY,
+                    texto TEXT NOT NULL,
+                    creado REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def obtener_muchas(self, claves):
+        """
+        {clave: texto} de las claves que están en caché.
+        """
+        if not claves:
+            return {}
+        with self._conectar() as con:
+            return dict(con.execute(
+                f"SELECT clave, texto FROM paginas WHERE clave IN ({','.join('?' * len(claves))})", list(claves)
+            ).fetchall())
+
+    def guardar_muchas(self, textos):
+        """
+        Guarda {clave: texto}.
+        """
+        ahora = time.time()
+        with self._conectar() as con:
+            con.executemany("INSERT OR REPLACE INTO paginas VALUES (?, ?, ?)",
+                            [(clave, texto, ahora) for clave, texto in textos.items()])
+
+
+# -----------------------------------------------------------
+# Detección, DPI y huella de cada página
+# -----------------------------------------------------------
+
+def texto_insuficiente(texto: str):
+    """
+    True si la capa de texto tiene menos de MIN_CARACTERES_PAGINA letras o
+    dígitos, o si la mayoría de sus caracteres no son texto legible (fuentes
+    sin mapa de caracteres, basura de un OCR previo).
+    """
+    if len(re.findall(r"\w", texto)) < MIN_CARACTERES_PAGINA:
+        return True
+    visibles = re.sub(r"\s", "", texto)
+    return len(RE_LEGIBLE.findall(visibles)) / len(visibles) < MIN_PROPORCION_LEGIBLE
+
+
+def necesita_ocr(pagina, texto: str):
+    """
+    Página escaneada: texto insuficiente y al menos una imagen (una página en
+    blanco o solo con líneas no se manda a OCR).
+    """
+    return texto_insuficiente(texto) and bool(pagina.get_images())
+
+
+def dpi_pagina(pagina):
+    """
+    DPI para renderizar la página: la resolución de su imagen más fina (no se
+    gana nada renderizando por encima del escaneo), entre DPI_MIN y DPI_MAX y
+    sin pasar de MAX_PIXELES.
+    """
+    nativos = [
+        info["width"] / ((info["bbox"][2] - info["bbox"][0]) / 72)
+        for info in pagina.get_image_info() if info["bbox"][2] - info["bbox"][0] > 1
+    ]
+    dpi = min(max(max(nativos, default=DPI_DEFAULT), DPI_MIN), DPI_MAX)
+    pixeles = (pagina.rect.width / 72 * dpi) * (pagina.rect.height / 72 * dpi)
+    if pixeles > MAX_PIXELES:
+        dpi *= math.sqrt(MAX_PIXELES / pixeles)
+    return int(dpi)
+
+
+def huella_pagina(doc, pagina):
+    """
+    Hash del contenido de la página (tamaño, rotación, instrucciones de
+    dibujo y bytes crudos de sus imágenes), sin renderizarla.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((tuple(pagina.rect), pagina.rotation)).encode())
+    h.update(pagina.read_contents())
+    for xref in sorted({imagen[0] for imagen in pagina.get_images(full=True)}):
+        h.update(doc.xref_stream_raw(xref) or b"")
+    return h.hexdigest()
+
+
+# -----------------------------------------------------------
+# OCR de las páginas marcadas
+# -----------------------------------------------------------
+
+def _ocr_pagina(doc, numero, dpi, backend):
+    import fitz
+
+    pixmap = doc.load_page(numero).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return backend(pixmap.tobytes("png"))
+
+
+def _ocr_paginas_archivo(ruta_pdf, paginas, backend):
+    """
+    Trabajo de un proceso: abre el PDF desde disco y aplica OCR a [(número, dpi), ...].
+    """
+    import fitz
+
+    with fitz.open(ruta_pdf) as doc:
+        return [_ocr_pagina(doc, numero, dpi, backend) for numero, dpi in paginas]
+
+
+def _fallo_pagina(numero, error):
+    logger.warning("OCR falló en la página %d; se conserva su capa de texto: %s", numero + 1, error)
+    return None
+
+
+def completar_con_ocr(pdf_bytes: bytes, textos, backend, cache=None, max_procesos=None, metricas=None):
+    """
+    Recibe el texto extraído de cada página y devuelve la lista con las páginas
+    escaneadas reemplazadas por su OCR. Las que ya están en `cache` (CacheOCR)
+    no se procesan; las demás se reparten entre `max_procesos` procesos
+    (`max_procesos=1`: en este proceso). Una página en la que el backend falla
+    se registra en el logger "contratos.ocr" y conserva su texto original.
+    `metricas` recibe paginas_ocr, paginas_ocr_cache, paginas_ocr_fallidas y
+    segundos_ocr.
+    """
+    import fitz
+
+    t0 = time.perf_counter()
+    textos = list(textos)
+    marcadas = {}
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for numero, texto in enumerate(textos):
+            pagina = doc.load_page(numero)
+            if necesita_ocr(pagina, texto):
+                dpi = dpi_pagina(pagina)
+                marcadas[numero] = (f"{huella_pagina(doc, pagina)}:{backend.nombre}:{dpi}", dpi)
+
+        en_cache = cache.obtener_muchas([clave for clave, _ in marcadas.values()]) if cache is not None else {}
+        pendientes = [(n, dpi) for n, (clave, dpi) in marcadas.items() if clave not in en_cache]
+        max_procesos = min(max_procesos or os.cpu_count() or 1, len(pendientes))
+        if len(pendientes) < PAGINAS_OCR_PARALELO or max_procesos <= 1:
+            leidos = []
+            for n, dpi in pendientes:
+                try:
+                    leidos.append(_ocr_pagina(doc, n, dpi, backend))
+                except Exception as e:
+                    leidos.append(_fallo_pagina(n, e))
+        else:
+            leidos = None
+
+    if leidos is None:
+        from concurrent.futures import ProcessPoolExecutor
+
+        fd, ruta = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(pdf_bytes)
+            # Una página por tarea: el OCR tarda segundos y el costo varía mucho entre páginas
+            with ProcessPoolExecutor(max_workers=max_procesos) as pool:
+                futuros = [pool.submit(_ocr_paginas_archivo, ruta, [pagina], backend) for pagina in pendientes]
+                leidos = []
+                for (n, _), fut in zip(pendientes, futuros):
+                    try:
+                        leidos.append(fut.result()[0])
+                    except Exception as e:
+                        leidos.append(_fallo_pagina(n, e))
+        finally:
+            os.remove(ruta)
+
+    fallidas = {n for (n, _), texto in zip(pendientes, leidos) if texto is None}
+    nuevos = {marcadas[n][0]: texto for (n, _), texto in zip(pendientes, leidos) if texto is not None}
+    if cache is not None and nuevos:
+        cache.guardar_muchas(nuevos)
+    en_cache.update(nuevos)
+    for numero, (clave, _) in marcadas.items():
+        if numero not in fallidas:
+            textos[numero] = en_cache[clave]
+
+    if metricas is not None:
+        metricas.update(
+            paginas_ocr=len(marcadas),
+            paginas_ocr_cache=len(marcadas) - len(pendientes),
+            paginas_ocr_fallidas=len(fallidas),
+            segundos_ocr=time.perf_counter() - t0,
+        )
+    return textos
@@ -0,0 +1,243 @@
+# ===============================================================
+# PLANTILLA DEL PROMPT (VERSIONADA)
+# ===============================================================
+# Las instrucciones son idénticas en todas las peticiones y van primero, en un
+# mensaje "developer"; lo variable (campos pendientes, avisos y el texto del
+# contrato) va al final, en el mensaje "user". Así el prefijo común es elegible
+# para la caché de prompts de OpenAI y se cobra como tokens en caché.
+#
+# La ficha se pide en uno de dos formatos de salida:
+# - "json": objeto JSON con claves cortas, restringido por ESQUEMA_FICHA
+#   (structured outputs). Un "|" dentro de un valor, una fila de separación
+#   faltante o texto suelto ya no pueden corromper ni perder campos.
+# - "tabla": la tabla Markdown | Campo | Respuesta | original.
+
+# Forma parte de la clave de la caché de análisis y de PROMPT_CACHE_KEYS:
+# incrementa PROMPT_VERSION cada vez que cambies cualquier texto de este módulo.
+PROMPT_VERSION = "5"
+
+SALIDA_JSON = "json"
+SALIDA_TABLA = "tabla"
+SALIDA_DEFAULT = SALIDA_JSON
+
+# Cada formato tiene su propio prefijo fijo, así que agrupa su propia caché
+PROMPT_CACHE_KEYS = {
+    salida: f"contratos-ficha-v{PROMPT_VERSION}-{salida}" for salida in (SALIDA_JSON, SALIDA_TABLA)
+}
+PROMPT_CACHE_KEY = PROMPT_CACHE_KEYS[SALIDA_DEFAULT]
+
+# Campos de la ficha, en el orden en que se piden y se exportan
+HEADERS_CONTRATO = [
+    "Partes",
+    "Objeto",
+    "Monto antes de IVA",
+    "IVA",
+    "Monto total",
+    "Fecha de inicio",
+    "Fecha de fin",
+    "Vigencia/Plazo",
+    "Garantía(s)",
+    "Obligaciones proveedor",
+    "Supervisión",
+    "Penalizaciones",
+    "Penalización máxima",
+    "Modificaciones",
+    "Normatividad aplicable",
+    "Resolución de controversias",
+    "Firmas",
+    "Anexos",
+    "No localizado",
+    "Áreas de mejora"
+]
+
+# Claves de la salida JSON: cortas para que el modelo gaste menos tokens de
+# salida en la estructura que repitiendo el nombre de cada campo
+CLAVES_JSON = {
+    "Partes": "partes",
+    "Objeto": "objeto",
+    "Monto antes de IVA": "monto",
+    "IVA": "iva",
+    "Monto total": "total",
+    "Fecha de inicio": "inicio",
+    "Fecha de fin": "fin",
+    "Vigencia/Plazo": "plazo",
+    "Garantía(s)": "garantias",
+    "Obligaciones proveedor": "obligaciones",
+    "Supervisión": "supervision",
+    "Penalizaciones": "penas",
+    "Penalización máxima": "pena_max",
+    "Modificaciones": "modificaciones",
+    "Normatividad aplicable": "normas",
+    "Resolución de controversias": "controversias",
+    "Firmas": "firmas",
+    "Anexos": "anexos",
+    "No localizado": "no_localizado",
+    "Áreas de mejora": "mejoras",
+}
+CAMPOS_JSON = {clave: campo for campo, clave in CLAVES_JSON.items()}
+
+# Esquema fijo (todas las claves, siempre en el orden de HEADERS_CONTRATO): un
+# esquema que variara con los campos pedidos se procesaría de nuevo en cada
+# combinación. Los campos que no se piden se devuelven como cadena vacía.
+ESQUEMA_FICHA = {
+    "type": "object",
+    "properties": {CLAVES_JSON[c]: {"type": "string"} for c in HEADERS_CONTRATO},
+    "required": [CLAVES_JSON[c] for c in HEADERS_CONTRATO],
+    "additionalProperties": False,
+}
+
+# Parámetro `text` de client.responses.create para cada formato de salida
+FORMATOS_TEXTO = {
+    SALIDA_JSON: {"format": {"type": "json_schema", "name": "ficha_contrato", "schema": ESQUEMA_FICHA,
+                             "strict": True}},
+    SALIDA_TABLA: None,
+}
+
+PERITO_PROMPT = """
+Eres un perito jurídico experto en contratos de obra pública y adquisiciones del gobierno.
+
+"""
+
+ENCABEZADO_PROMPT = {
+    SALIDA_TABLA: """Tienes el texto COMPLETO de un contrato de obra pública. Debes llenar UNA TABLA en formato Markdown
+con dos columnas: "Campo" y "Respuesta", siguiendo EXACTAMENTE esta estructura:
+
+""",
+    SALIDA_JSON: """Tienes el texto COMPLETO de un contrato de obra pública. Debes llenar la ficha del contrato como UN
+OBJETO JSON con una clave por campo. Las claves y su orden los fija el esquema de la respuesta;
+cada clave corresponde a este campo:
+
+""",
+}
+
+REGLAS_GENERALES = """REGLAS GENERALES:
+- Usa SOLO información que esté en el texto del contrato.
+- NO inventes nada.
+- Si un dato NO aparece claramente en el texto, escribe exactamente: NO LOCALIZADO.
+"""
+
+REGLAS_FORMATO = {
+    SALIDA_TABLA: """- NO agregues texto antes ni después de la tabla.
+- Usa SIEMPRE la sintaxis de tabla Markdown (con | y la fila de separación ---).
+""",
+    SALIDA_JSON: """- Cada valor es texto plano en una sola línea, sin Markdown.
+""",
+}
+
+TITULO_REGLAS_CAMPO = """
+REGLAS ESPECÍFICAS POR CAMPO:
+
+"""
+
+REGLAS_CAMPO = {
+    "Partes": """   - Identifica a la dependencia o entidad pública y a la empresa contratista.
+   - Devuelve una sola oración, por ejemplo:
+     Secretaría de Comunicaciones y Obras Públicas del Estado de Durango (“LA DEPENDENCIA”) y ARAM ALTA INGENIERÍA S.A. DE C.V. (“EL CONTRATISTA”).""",
+    "Objeto": """   - Localiza la cláusula “OBJETO DEL CONTRATO” o similar.
+   - Devuelve una frase que describa la obra, limpia, en una sola oración.
+   - Ejemplo de estilo:
+     Construcción de acceso a la localidad de Fray Francisco Montes de Oca a base de carpeta asfáltica en el municipio de Durango, con trabajos de preliminares, terracerías, pavimentos, estructuras, señalamientos y dispositivos de seguridad.""",
+    "Monto antes de IVA": """   - Busca el párrafo donde se indique algo como: “El monto total del presente contrato es la cantidad de $ X ... Más el impuesto al valor agregado”.
+   - Devuelve SOLO la cantidad numérica con signo de pesos.
+   - Limpia y normaliza el número: usa SIEMPRE el formato $X,XXX,XXX.XX (comas de miles y dos decimales).
+   - Por ejemplo: $3,436,646.48
+   - NO incluyas el texto en letras, solo el número.""",
+    "IVA": """   - Si dice literalmente “Más el impuesto al valor agregado”, devuelve exactamente esa frase.
+   - Si se especifica un porcentaje de IVA, escríbelo.
+   - Si no se menciona el IVA, escribe: NO LOCALIZADO.""",
+    "Monto total": """   - SOLO llena este campo si el contrato indica explícitamente el monto total con IVA desglosado.
+   - Si NO aparece expresado el monto total ya con IVA, escribe: NO LOCALIZADO.""",
+    "Fecha de inicio": """   - Busca en la cláusula de plazo algo como: “El inicio de la ejecución de los trabajos será el día XX de mes de AAAA”.
+   - Devuelve SOLO la fecha en formato texto, por ejemplo: 28 de octubre de 2024.
+   - NO incluyas frases como “El inicio de la ejecución será el día...”, solo la fecha.""",
+    "Fecha de fin": """   - Igual que la anterior, pero con la frase “se concluirá a más tardar el día...”.
+   - Devuelve SOLO la fecha, por ejemplo: 10 de enero de 2025.""",
+    "Vigencia/Plazo": """   - Devuelve SOLO el plazo en forma compacta, por ejemplo: 75 días naturales.""",
+    "Garantía(s)": """   - Busca las cláusulas de “Garantía de Cumplimiento”, “Garantía de Anticipo” y “Vicios Ocultos”.
+   - Resume en UNA ORACIÓN clara los tipos de garantía y sus porcentajes.
+   - Ejemplo de estilo (sólo como referencia de forma, no lo copies si no aplica):
+     Garantía de cumplimiento del 10% del monto total del contrato más IVA y garantía de anticipo mediante fianza del 50% del monto total del contrato incluyendo IVA.""",
+    "Obligaciones proveedor": """   - Identifica las obligaciones principales de “EL CONTRATISTA”: ejecutar la obra conforme a proyectos y especificaciones, calidad, plazos, cumplimiento de leyes laborales y fiscales, no emplear menores, responder por vicios ocultos, etc.
+   - Devuelve una sola oración que las resuma.""",
+    "Supervisión": """   - Localiza la referencia al Residente de Obra o figura encargada de revisar y autorizar estimaciones y trabajos.
+   - Devuelve una frase del tipo:
+     La supervisión y autorización de los trabajos y estimaciones está a cargo del Residente de Obra designado por la dependencia.""",
+    "Penalizaciones": """   - Busca la cláusula de “RETENCIONES Y PENAS CONVENCIONALES” o similar.
+   - Extrae las penalizaciones principales, por ejemplo el 3% de trabajos no ejecutados en tiempo.
+   - Devuelve una oración breve mencionando porcentaje y condición.""",
+    "Penalización máxima": """   - Si el contrato indica que las penas no pueden exceder cierto límite (por ejemplo, el monto de la garantía de cumplimiento), escríbelo.
+   - Si no se menciona límite máximo, escribe: NO LOCALIZADO.""",
+    "Modificaciones": """   - Busca la cláusula de modificaciones al contrato (referencias al artículo 72 de la LOPSRMEM, 25% del monto o plazo, etc.).
+   - Devuelve una oración clara del tipo:
+     Modificaciones permitidas hasta el 25% del monto o plazo, conforme al artículo 72 de la LOPSRMEM, sin cambiar la naturaleza del objeto.""",
+    "Normatividad aplicable": """   - Enumera las principales normas citadas: Constitución, LOPSRMEM, Reglamento Interior, etc.
+   - Escríbelas separadas por punto y coma en una sola línea.""",
+    "Resolución de controversias": """   - Si el contrato menciona mecanismos específicos (tribunales, sede, ley aplicable), descríbelos brevemente.
+   - Si no se menciona nada, escribe: NO LOCALIZADO.""",
+    "Firmas": """   - Identifica quién firma por la dependencia y quién firma por el contratista.
+   - Devuelve una sola frase mencionando ambos nombres y cargos.
+   - Si no está claramente en el texto proporcionado, escribe: NO LOCALIZADO.""",
+    "Anexos": """   - Enumera los anexos que el contrato menciona expresamente (proyecto, catálogo de conceptos, programa de ejecución, etc.).
+   - Escríbelos en una sola línea.""",
+    "No localizado": """   - En este campo, enumera TODOS los campos de la tabla que hayan quedado como “NO LOCALIZADO”.
+   - Si todos los campos fueron localizados, escribe: Ninguno.""",
+    "Áreas de mejora": """   - Señala en una o dos frases aspectos del contrato que podrían estar poco claros, ser riesgosos o susceptibles de controversia (por ejemplo: falta de monto total con IVA, falta de detalle en penalizaciones, etc.).
+   - Si no detectas nada relevante, escribe: NO LOCALIZADO.""",
+}
+
+RECORDATORIO_PROMPT = {
+    SALIDA_TABLA: """RECUERDA:
+- Devuelve ÚNICAMENTE la tabla Markdown.
+- No incluyas explicaciones, notas ni texto adicional.
+- Si el mensaje del usuario indica qué campos llenar, la tabla lleva SOLO esas filas.
+""",
+    SALIDA_JSON: """RECUERDA:
+- Devuelve ÚNICAMENTE el objeto JSON, con todas las claves del esquema.
+- Si el mensaje del usuario indica qué campos llenar, deja "" (cadena vacía) en todas las demás claves.
+""",
+}
+
+# Lo que el mensaje "user" agrega cuando solo se piden algunos campos
+AVISO_CAMPOS = {
+    SALIDA_TABLA: "Llena SOLO estos campos (los demás ya se resolvieron; no los incluyas en la tabla), "
+                  "en este orden:\n",
+    SALIDA_JSON: "Llena SOLO estos campos (los demás ya se resolvieron; déjalos como cadena vacía):\n",
+}
+
+
+def _armar_instrucciones(salida):
+    if salida == SALIDA_TABLA:
+        estructura = "| Campo | Respuesta |\n|-------|-----------|\n"
+        estructura += "".join(f"| {c} | ... |\n" for c in HEADERS_CONTRATO)
+        titulos = {c: c for c in HEADERS_CONTRATO}
+    else:
+        estructura = "".join(f"- {CLAVES_JSON[c]}: {c}\n" for c in HEADERS_CONTRATO)
+        titulos = {c: f"{c} ({CLAVES_JSON[c]})" for c in HEADERS_CONTRATO}
+    reglas = "".join(f"{n}) {titulos[c]}:\n{REGLAS_CAMPO[c]}\n\n" for n, c in enumerate(HEADERS_CONTRATO, 1))
+    return (
+        PERITO_PROMPT + ENCABEZADO_PROMPT[salida] + estructura + "\n" + REGLAS_GENERALES
+        + REGLAS_FORMATO[salida] + TITULO_REGLAS_CAMPO + reglas + RECORDATORIO_PROMPT[salida]
+    )
+
+
+# Prefijos estables: no dependen del contrato ni de los campos pedidos
+INSTRUCCIONES_FIJAS = {salida: _armar_instrucciones(salida) for salida in (SALIDA_JSON, SALIDA_TABLA)}
+
+
+def construir_mensajes(texto: str, campos=None, aviso: str = "", salida=SALIDA_DEFAULT):
+    """
+    Devuelve el input para client.responses.create: las instrucciones fijas
+    del formato de `salida` seguidas de un mensaje con el `aviso` (si lo hay),
+    la lista de `campos` pendientes (si no son todos) y el texto del contrato.
+    En formato JSON acompaña la petición con `text=FORMATOS_TEXTO[salida]`.
+    """
+    variable = aviso
+    if campos is not None:
+        campos = [c for c in HEADERS_CONTRATO if c in campos]
+        if len(campos) < len(HEADERS_CONTRATO):
+            variable += AVISO_CAMPOS[salida] + "".join(f"- {c}\n" for c in campos) + "\n"
+    variable += f"TEXTO COMPLETO DEL CONTRATO:\n{texto}\n"
+    return [
+        {"role": "developer", "content": INSTRUCCIONES_FIJAS[salida]},
+        {"role": "user", "content": variable},
+    ]
@@ -0,0 +1,157 @@
+import re
+from decimal import Decimal
+
+from contratos.analisis import MODELO_ANALISIS, construir_tabla_markdown, leer_respuesta, safe_gpt
+from contratos.clausulas import CAMPOS_SIN_FRAGMENTO, pasajes_relevantes
+from contratos.extractores import parsear_fecha, parsear_monto
+from contratos.fragmentos import es_no_localizado, resumen_no_localizados
+from contratos.prompts import FORMATOS_TEXTO, HEADERS_CONTRATO, PROMPT_CACHE_KEYS, SALIDA_DEFAULT, construir_mensajes
+
+# ===============================================================
+# RECONSULTA PUNTUAL DE CAMPOS NO LOCALIZADOS O DUDOSOS
+# ===============================================================
+# En lugar de volver a analizar el contrato completo, se piden a GPT solo los
+# campos que faltan, con solo los pasajes donde podrían estar (ver
+# contratos.clausulas.pasajes_relevantes), y la respuesta se mezcla con la
+# ficha existente. "No localizado" se recalcula localmente.
+
+AVISO_REANALISIS = """IMPORTANTE: esta es una segunda revisión del contrato. En la primera no se localizaron (o no
+quedaron claros) los campos de abajo. Aquí recibes SOLO los pasajes donde podrían aparecer; léelos con
+cuidado y, si de verdad no están, escribe NO LOCALIZADO.
+
+"""
+
+# max_output_tokens = base (margen para el razonamiento del modelo) + por campo pedido
+TOKENS_SALIDA_BASE = 1000
+TOKENS_SALIDA_POR_CAMPO = 150
+
+CAMPOS_FECHA = ("Fecha de inicio", "Fecha de fin")
+CAMPOS_MONTO = ("Monto antes de IVA", "Monto total")
+CAMPO_PLAZO = "Vigencia/Plazo"
+
+# Formatos que pide el prompt: "$3,436,646.48" y "75 días naturales"
+RE_MONTO_FICHA = re.compile(r"\$\d{1,3}(?:,\d{3})*\.\d{2}")
+RE_PLAZO_FICHA = re.compile(r"(\d{1,4}) días (naturales|hábiles)")
+TASAS_IVA = (Decimal("0.16"), Decimal("0.08"))  # general y región fronteriza
+TOLERANCIA_TOTAL = Decimal("1.00")              # redondeo del IVA, en pesos
+
+
+def campos_no_localizados(campos_dict):
+    """
+    Campos de la ficha que quedaron como NO LOCALIZADO o vacíos (sin contar
+    los que el modelo deduce de los demás).
+    """
+    return [c for c in HEADERS_CONTRATO
+            if c not in CAMPOS_SIN_FRAGMENTO and es_no_localizado(campos_dict.get(c))]
+
+
+def validar_ficha(campos_dict):
+    """
+    Revisa los campos con formato definido y la coherencia entre ellos:
+    formato de los montos, fechas legibles, plazo "N días naturales/hábiles",
+    monto total = monto antes de IVA + IVA, fin posterior al inicio y fechas
+    que cuadran con el plazo. Los campos NO LOCALIZADO no se revisan.
+    Devuelve {campo: motivo} con los que no pasan.
+    """
+    motivos = {}
+
+    def fallar(motivo, *campos):
+        for campo in campos:
+            motivos.setdefault(campo, motivo)
+
+    valores = {c: campos_dict[c].strip() for c in CAMPOS_MONTO + CAMPOS_FECHA + (CAMPO_PLAZO,)
+               if not es_no_localizado(campos_dict.get(c))}
+
+    montos = {}
+    for campo in CAMPOS_MONTO:
+        if campo in valores:
+            montos[campo] = parsear_monto(valores[campo])
+            if montos[campo] is None:
+                fallar("monto ilegible", campo)
+    if "Monto antes de IVA" in valores and not RE_MONTO_FICHA.fullmatch(valores["Monto antes de IVA"]):
+        fallar("monto sin el formato $X,XXX.XX", "Monto antes de IVA")
+    base, total = montos.get("Monto antes de IVA"), montos.get("Monto total")
+    if base and total and all(abs(total - base * (1 + tasa)) > TOLERANCIA_TOTAL for tasa in TASAS_IVA):
+        fallar("el monto total no es el monto antes de IVA más IVA", *CAMPOS_MONTO)
+
+    fechas = {}
+    for campo in CAMPOS_FECHA:
+        if campo in valores:
+            fechas[campo] = parsear_fecha(valores[campo])
+            if fechas[campo] is None:
+                fallar("fecha ilegible", campo)
+    inicio, fin = fechas.get("Fecha de inicio"), fechas.get("Fecha de fin")
+    if inicio and fin and fin < inicio:
+        fallar("la fecha de fin es anterior a la de inicio", *CAMPOS_FECHA)
+
+    if CAMPO_PLAZO in valores:
+        m = RE_PLAZO_FICHA.fullmatch(valores[CAMPO_PLAZO])
+        if m is None:
+            fallar("plazo sin el formato 'N días naturales'", CAMPO_PLAZO)
+        elif inicio and fin:
+            # Igual que en contratos.extractores: fin = inicio + plazo - 1 (o + plazo)
+            dias, duracion = int(m.group(1)), (fin - inicio).days
+            cuadra = duracion in (dias - 1, dias) if m.group(2) == "naturales" else duracion >= dias - 1
+            if not cuadra:
+                fallar("las fechas no cuadran con el plazo", *CAMPOS_FECHA, CAMPO_PLAZO)
+    return motivos
+
+
+def campos_dudosos(campos_dict):
+    """
+    Campos con valor pero que no pasan validar_ficha: un monto o una fecha
+    que no se puede leer, un plazo sin formato o valores incoherentes entre sí.
+    """
+    motivos = validar_ficha(campos_dict)
+    return [c for c in HEADERS_CONTRATO if c in motivos]
+
+
+def reanalizar_campos(client, campos_dict, texto_limpio: str, campos=None, model=MODELO_ANALISIS,
+                      metricas=None, salida=SALIDA_DEFAULT, reemplazar=False):
+    """
+    Vuelve a pedir a GPT solo `campos` (por omisión, los no localizados y los
+    dudosos de `campos_dict`) a partir de sus pasajes en `texto_limpio`.
+
+    Un valor nuevo reemplaza al anterior solo si no es NO LOCALIZADO. Con
+    `reemplazar` (campos_dict viene de otra versión del contrato, ver
+    contratos.duplicados) la respuesta nueva se toma siempre, aunque sea NO
+    LOCALIZADO, y los campos sin pasaje quedan como NO LOCALIZADO. Devuelve
+    (tabla_markdown, campos_dict) con la ficha completa y "No localizado"
+    recalculado. `metricas` recibe campos_pedidos, campos_recuperados,
+    campos_sin_pasaje, los tokens enviados y el uso de la petición.
+    """
+    metricas = {} if metricas is None else metricas
+    if campos is None:
+        campos = campos_no_localizados(campos_dict) + campos_dudosos(campos_dict)
+    campos = [c for c in HEADERS_CONTRATO if c in campos and c not in CAMPOS_SIN_FRAGMENTO]
+
+    nuevos = dict(campos_dict)
+    recuperados = []
+    pasajes, con_pasaje = pasajes_relevantes(texto_limpio, campos, metricas=metricas) if campos else ("", [])
+    if con_pasaje:
+        respuesta = safe_gpt(
+            client,
+            model=model,
+            input_data=construir_mensajes(pasajes, con_pasaje, aviso=AVISO_REANALISIS, salida=salida),
+            max_output_tokens=TOKENS_SALIDA_BASE + TOKENS_SALIDA_POR_CAMPO * len(con_pasaje),
+            metricas=metricas,
+            prompt_cache_key=PROMPT_CACHE_KEYS[salida],
+            formato=FORMATOS_TEXTO[salida]
+        )
+        respuestas = leer_respuesta(respuesta.output_text, salida, metricas)
+        for campo in con_pasaje:
+            valor = respuestas.get(campo, "")
+            if not es_no_localizado(valor) and valor != campos_dict.get(campo):
+                nuevos[campo] = valor
+                recuperados.append(campo)
+            elif reemplazar:
+                nuevos[campo] = valor or "NO LOCALIZADO"
+    if reemplazar:
+        for campo in campos:
+            if campo not in con_pasaje:
+                nuevos[campo] = "NO LOCALIZADO"
+
+    nuevos = {c: nuevos.get(c, "") for c in HEADERS_CONTRATO}
+    nuevos["No localizado"] = resumen_no_localizados(nuevos)
+    metricas.update(campos_pedidos=campos, campos_recuperados=recuperados)
+    return construir_tabla_markdown(nuevos), nuevos
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from contratos.limites import espera_backoff
+
+# ===============================================================
+# GOOGLE SHEETS: SESIÓN HTTP COMPARTIDA, TOKENS Y COLA DE EXPORTACIÓN
+# ===============================================================
+
+# Configurables para apuntar a un servidor falso en pruebas
+TOKEN_URL = os.environ.get("CONTRATOS_GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+SHEETS_API = os.environ.get("CONTRATOS_SHEETS_API", "https://sheets.googleapis.com/v4")
+
+MARGEN_EXPIRACION = 120     # se refresca el token si le quedan menos de N segundos
+MAX_FILAS_POR_PETICION = 1000
+STATUS_REINTENTABLES = {429, 500, 502, 503, 504}
+STATUS_NO_PROCESADOS = {429}   # Sheets los rechaza antes de escribir: reintentables aunque no sea idempotente
+
+_sesion = None
+_lock_sesion = threading.Lock()
+
+
+def sesion_http():
+    """
+    requests.Session única por proceso: reutiliza conexiones TLS a Google
+    en lugar de abrir una nueva por cada petición.
+    """
+    global _sesion
+    with _lock_sesion:
+        if _sesion is None:
+            _sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            _sesion.mount("https://", adaptador)
+            _sesion.mount("http://", adaptador)
+        return _sesion
+
+
+def _sin_enviar(error):
+    """
+    True si la petición seguro no llegó al servidor: no se pudo abrir la
+    conexión (DNS, rechazada, timeout al conectar).
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    razon = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(razon, NewConnectionError)
+
+
+def post_con_reintentos(url, retries=5, idempotente=True, **kwargs):
+    """
+    POST con la sesión compartida; reintenta 429/5xx y errores de red con
+    backoff exponencial + jitter (respetando Retry-After). Devuelve la respuesta
+    final sin llamar raise_for_status().
+
+    Con `idempotente=False` (p. ej. values:append, que duplicaría filas) solo
+    se reintenta lo que seguro no se procesó: errores al conectar y 429. Un
+    timeout de lectura, una conexión cortada o un 5xx se devuelven/propagan.
+    """
+    kwargs.setdefault("timeout", 60)
+    reintentables = STATUS_REINTENTABLES if idempotente else STATUS_NO_PROCESADOS
+    for intento in range(retries):
+        try:
+            resp = sesion_http().post(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if intento == retries - 1 or not (idempotente or _sin_enviar(e)):
+                raise
+            time.sleep(espera_backoff(intento))
+            continue
+        if resp.status_code not in reintentables or intento == retries - 1:
+            return resp
+        time.sleep(espera_backoff(intento, retry_after=resp.headers.get("Retry-After")))
+    return resp
+
+
+def solicitar_token(data):
+    """
+    Intercambio/refresco de token OAuth. Agrega "expires_at" (epoch) a la
+    respuesta para poder refrescar antes de que expire.
+    """
+    resp = post_con_reintentos(TOKEN_URL, data=data)
+    resp.raise_for_status()
+    tokens = resp.json()  # incluye access_token, refresh_token, expires_in, etc.
+    if tokens.get("expires_in"):
+        tokens["expires_at"] = time.time() + int(tokens["expires_in"])
+    return tokens
+
+
+def token_por_expirar(token_data, margen=MARGEN_EXPIRACION):
+    expires_at = token_data.get("expires_at")
+    return expires_at is not None and expires_at - time.time() < margen
+
+
+def append_rows_to_sheet(access_token: str, filas, spreadsheet_id: str, rango: str):
+    """
+    Agrega muchas filas con una sola llamada values:append.
+    """
+    url = f"{SHEETS_API}/spreadsheets/{spreadsheet_id}/values/{rango}:append"
+    params = {
+        "valueInputOption": "USER_ENTERED"
+    }
+    body = {
+        "majorDimension": "ROWS",
+        "values": filas
+    }
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json"
+    }
+    # values:append no es idempotente: reintentar algo que quizá ya se escribió duplica filas
+    resp = post_con_reintentos(url, idempotente=False, params=params, json=body, headers=headers)
+    if resp.status_code == 401:
+        raise PermissionError("No autorizado o token expirado")
+    resp.raise_for_status()
+    return resp.json()
+
+
+class ColaExportacion:
+    """
+    Junta fichas y las envía a Sheets en bloque (una petición por cada
+    MAX_FILAS_POR_PETICION filas) en lugar de una petición por contrato.
+
+    `obtener_token(forzar_refresco=False)` debe devolver un access_token vigente;
+    si Sheets responde 401 se pide uno nuevo con forzar_refresco=True y se
+    reintenta una vez.
+    """
+
+    def __init__(self, spreadsheet_id, rango, columnas, obtener_token):
+        self.spreadsheet_id = spreadsheet_id
+        self.rango = rango
+        self.columnas = columnas
+        self.obtener_token = obtener_token
+        self._filas = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._filas)
+
+    def agregar(self, campos_dict):
+        # Ordenar los valores según las columnas de la hoja
+        with self._lock:
+            self._filas.append([campos_dict.get(col, "") for col in self.columnas])
+
+    def vaciar(self):
+        """
+        Envía todo lo pendiente. Devuelve el número de filas exportadas.
+        Si falla, las filas no enviadas siguen en la cola.
+        """
+        with self._lock:
+            enviadas = 0
+            while self._filas:
+                bloque = self._filas[:MAX_FILAS_POR_PETICION]
+                try:
+                    append_rows_to_sheet(self.obtener_token(), bloque, self.spreadsheet_id, self.rango)
+                except PermissionError:
+                    token = self.obtener_token(forzar_refresco=True)
+                    append_rows_to_sheet(token, bloque, self.spreadsheet_id, self.rango)
+                del self._filas[:len(bloque)]
+                enviadas += len(bloque)
+            return enviadas
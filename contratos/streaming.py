@@ -0,0 +1,176 @@
+import time
+
+from contratos.analisis import (
+    argumentos_cache,
+    argumentos_formato,
+    errores_reintentables,
+    esperar_reintento,
+    registrar_espera,
+    tokens_peticion,
+)
+from contratos.ficha_json import ParserFichaIncremental, leer_ficha_json
+from contratos.limites import limitador_global
+from contratos.prompts import FORMATOS_TEXTO, PROMPT_CACHE_KEY, PROMPT_CACHE_KEYS, SALIDA_DEFAULT, SALIDA_JSON
+from contratos.uso import contador_uso_global
+
+# ===============================================================
+# RESPUESTAS EN STREAMING: LA FICHA SE LLENA CAMPO POR CAMPO
+# ===============================================================
+
+# Eventos con los que termina un stream y el estado de la respuesta que traen
+EVENTOS_FINALES = {
+    "response.completed": "completed",
+    "response.incomplete": "incomplete",
+    "response.failed": "failed",
+}
+
+
+class ParserTablaIncremental:
+    """
+    Versión incremental de parse_markdown_table: recibe el texto por pedazos
+    y devuelve cada (campo, respuesta) en cuanto su fila está completa.
+    """
+
+    def __init__(self):
+        self.campos = {}
+        self._buffer = ""
+        self._filas_tabla = 0
+
+    def _procesar_linea(self, linea):
+        linea = linea.strip()
+        if not linea.startswith("|"):
+            return None
+        self._filas_tabla += 1
+        if self._filas_tabla <= 2:
+            return None  # encabezado y separador
+        partes = [c.strip() for c in linea.strip("|").split("|")]
+        if len(partes) < 2:
+            return None
+        campo, respuesta = partes[0], partes[1]
+        self.campos[campo] = respuesta
+        return campo, respuesta
+
+    def agregar(self, texto):
+        self._buffer += texto
+        *lineas, self._buffer = self._buffer.split("\n")
+        return [fila for fila in map(self._procesar_linea, lineas) if fila]
+
+    def terminar(self):
+        linea, self._buffer = self._buffer, ""
+        fila = self._procesar_linea(linea)
+        return [fila] if fila else []
+
+
+def safe_gpt_stream(client, model, input_data, max_output_tokens=4000, retries=5,
+                    limitador=None, metricas=None, prompt_cache_key=PROMPT_CACHE_KEY, formato=None):
+    """
+    Como safe_gpt, pero con la API de streaming: genera los pedazos de texto
+    conforme llegan. Solo se reintenta si el error ocurre antes del primer token;
+    después, reintentar duplicaría texto, así que el error (incluido un evento
+    `error` del servidor, que el SDK lanza como openai.APIError) se propaga y el
+    llamador conserva lo recibido.
+
+    `metricas` recibe ttft_s (tiempo al primer token), stream_s (tiempo total),
+    estado_respuesta ("completed", "incomplete" o "failed"; falta si el stream
+    se cortó sin evento final), motivo_incompleto y usage; los tokens, la
+    espera y los reintentos se suman además como en safe_gpt.
+    """
+    from openai import APIError
+
+    limitador = limitador or limitador_global()
+    metricas = {} if metricas is None else metricas
+    estimado = tokens_peticion(input_data, max_output_tokens)
+
+    for intento in range(retries):
+        t_espera = time.perf_counter()
+        limitador.adquirir(estimado)
+        registrar_espera(metricas, time.perf_counter() - t_espera)
+        t0 = time.perf_counter()
+        recibido = False
+        try:
+            eventos = client.responses.create(
+                model=model,
+                input=input_data,
+                max_output_tokens=max_output_tokens,
+                stream=True,
+                **argumentos_cache(prompt_cache_key),
+                **argumentos_formato(formato)
+            )
+            for evento in eventos:
+                if evento.type == "response.output_text.delta":
+                    if not recibido:
+                        metricas["ttft_s"] = time.perf_counter() - t0
+                        recibido = True
+                    yield evento.delta
+                elif evento.type in EVENTOS_FINALES:
+                    respuesta = evento.response
+                    metricas["estado_respuesta"] = EVENTOS_FINALES[evento.type]
+                    if evento.type != "response.completed":
+                        # p. ej. max_output_tokens: el texto recibido está truncado
+                        detalles = getattr(respuesta, "incomplete_details", None)
+                        error = getattr(respuesta, "error", None)
+                        metricas["motivo_incompleto"] = (getattr(detalles, "reason", None)
+                                                         or getattr(error, "message", None))
+                    usage = getattr(respuesta, "usage", None)
+                    if usage is not None and getattr(usage, "total_tokens", None):
+                        metricas["usage"] = usage
+                        limitador.ajustar(estimado, usage.total_tokens)
+                    contador_uso_global().registrar(usage, model, metricas)
+        except errores_reintentables() as e:
+            if recibido:
+                metricas["stream_s"] = time.perf_counter() - t0
+                raise
+            t_espera = time.perf_counter()
+            esperar_reintento(limitador, intento, e)
+            registrar_espera(metricas, time.perf_counter() - t_espera, reintento=True)
+            continue
+        except APIError:
+            if recibido:
+                metricas["stream_s"] = time.perf_counter() - t0
+            raise
+        metricas["stream_s"] = time.perf_counter() - t0
+        return
+    raise Exception("Rate limit persistente. Intenta de nuevo más tarde.")
+
+
+def analizar_stream(client, model, input_data, al_recibir_campo, max_output_tokens=3500, metricas=None,
+                    salida=SALIDA_DEFAULT):
+    """
+    Ejecuta la petición en streaming y llama `al_recibir_campo(campo, respuesta)`
+    por cada campo en cuanto llega (fila de la tabla o par del objeto JSON,
+    según `salida`).
+
+    Devuelve (texto_respuesta, campos_dict). Si el stream se corta a la mitad
+    (cualquier openai.APIError después del primer token, con el mensaje en
+    metricas["error_stream"]) o termina incompleto (response.incomplete /
+    response.failed), devuelve lo recibido hasta ese momento y deja
+    metricas["stream_completo"] = False.
+    En JSON, el texto final se valida con leer_ficha_json (metricas["parseo_fallido"]).
+    """
+    from openai import APIError
+
+    metricas = {} if metricas is None else metricas
+    parser = ParserFichaIncremental() if salida == SALIDA_JSON else ParserTablaIncremental()
+    pedazos = []
+    metricas["stream_completo"] = False
+    try:
+        for pedazo in safe_gpt_stream(client, model, input_data, max_output_tokens, metricas=metricas,
+                                      prompt_cache_key=PROMPT_CACHE_KEYS[salida],
+                                      formato=FORMATOS_TEXTO[salida]):
+            pedazos.append(pedazo)
+            for campo, respuesta in parser.agregar(pedazo):
+                al_recibir_campo(campo, respuesta)
+    except APIError as e:
+        if not pedazos:
+            raise
+        # Se conservan las filas completas; la última fila a medias se descarta
+        metricas["error_stream"] = str(e)
+    else:
+        if metricas.get("estado_respuesta") == "completed":
+            for campo, respuesta in parser.terminar():
+                al_recibir_campo(campo, respuesta)
+            metricas["stream_completo"] = True
+    texto = "".join(pedazos)
+    if salida == SALIDA_JSON:
+        return texto, leer_ficha_json(texto, metricas)
+    return texto, parser.campos
@@ -0,0 +1,439 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from contratos.analisis import MODELO_ANALISIS, PROMPT_VERSION, analizar_texto, construir_tabla_markdown
+from contratos.cache import CACHE_DIR_DEFAULT, clave_analisis
+from contratos.cascada import analizar_en_cascada, nombre_modelo
+from contratos.duplicados import campos_cambiados, diff_textos
+from contratos.extraccion import extraer_texto_pdf
+from contratos.limpieza import limpiar_texto
+from contratos.lotes import MAX_CONCURRENCIA_GPT
+from contratos.ocr import AVISO_SIN_TEXTO, texto_insuficiente
+from contratos.prompts import HEADERS_CONTRATO
+from contratos.reanalisis import reanalizar_campos
+from contratos.traza import TRAZA_ACTIVA, Traza
+
+# ===============================================================
+# COLA DE TRABAJOS EN SEGUNDO PLANO (SOBREVIVE A RERUNS Y DESCONEXIONES)
+# ===============================================================
+# La app solo envía el PDF y consulta el estado; la extracción y la llamada a
+# GPT corren en un pool de hilos del servidor. El estado, los campos parciales
+# y el resultado viven en SQLite, así que un rerun, un refresh del navegador o
+# un segundo envío del mismo PDF no repiten ni cortan el trabajo.
+
+PENDIENTE = "pendiente"
+EXTRAYENDO = "extrayendo"
+ANALIZANDO = "analizando"
+TERMINADO = "terminado"
+ERROR = "error"
+ESTADOS_ACTIVOS = (PENDIENTE, EXTRAYENDO, ANALIZANDO)
+
+DIAS_RETENCION = 7  # los trabajos terminados más antiguos se purgan al iniciar
+MAX_CLIENTES = 32   # clientes de OpenAI reutilizados (uno por clave de usuario, los más recientes)
+
+COLUMNAS_ESTADO = (
+    "id", "nombre", "usuario", "clave", "estado", "progreso", "campos", "tabla",
+    "error", "metricas", "creado", "actualizado",
+)
+
+
+class ColaTrabajos:
+    """
+    Trabajos de análisis persistidos en SQLite y ejecutados por `max_hilos` hilos.
+
+    - enviar() devuelve un id de trabajo; si el mismo PDF (misma clave de caché)
+      ya está en curso, devuelve el id existente en lugar de duplicarlo.
+    - estado(id) / estados(ids) devuelven estado, progreso (0-1), campos
+      parciales conforme llegan en streaming y, al final, tabla y métricas.
+    - Con `cache` (CacheAnalisis), los PDFs ya analizados terminan al instante.
+    - Con `almacen` (AlmacenFichas), cada ficha terminada queda indexada para búsquedas.
+    - reanalizar(id) reconsulta solo los campos no localizados de una ficha
+      terminada, con el texto limpio que quedó guardado.
+    - Con `duplicados` (IndiceDuplicados), un PDF casi igual a uno ya analizado
+      (re-escaneo, convenio modificatorio) parte de la ficha anterior y solo
+      reconsulta los campos cuyas cláusulas cambiaron.
+    - Con `modelo_rapido`, la ficha la llena primero ese modelo y `model` solo
+      revisa los campos dudosos (ver contratos.cascada).
+    - Con `ocr` (backend de contratos.ocr), las páginas escaneadas se leen con
+      OCR, con caché por página en `cache_ocr`. Un PDF sin texto legible
+      termina en error sin llamar a GPT.
+    - enviar(..., trazar=True) mide las etapas del trabajo en su hilo y las deja
+      en metricas["etapas"]; con perfilar=True, además el resumen de cProfile en
+      metricas["perfil"].
+
+    La clave de OpenAI solo se guarda en memoria (los clientes se indexan por
+    su hash, a lo sumo MAX_CLIENTES). Si el servidor se reinicia,
+    los trabajos pendientes se reanudan con OPENAI_API_KEY si está definida;
+    si no, quedan en error para que el usuario los vuelva a enviar.
+    """
+
+    def __init__(self, directorio=CACHE_DIR_DEFAULT, cache=None, max_hilos=MAX_CONCURRENCIA_GPT,
+                 model=MODELO_ANALISIS, crear_cliente=None, almacen=None, duplicados=None, modelo_rapido=None,
+                 ocr=None, cache_ocr=None):
+        os.makedirs(directorio, exist_ok=True)
+        self.ruta = os.path.join(directorio, "trabajos.sqlite3")
+        self.cache = cache
+        self.almacen = almacen
+        self.duplicados = duplicados
+        self.model = model
+        self.modelo_rapido = modelo_rapido
+        self.ocr = ocr
+        self.cache_ocr = cache_ocr
+        self._crear_cliente = crear_cliente or _cliente_openai
+        self._clientes = OrderedDict()  # sha256(api_key) -> cliente, del menos al más reciente
+        self._lock = threading.Lock()
+        self._hilos = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="trabajo")
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS trabajos (
+                    id TEXT PRIMARY KEY,
+                    nombre TEXT NOT NULL,
+                    usuario TEXT,
+                    clave TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    progreso REAL NOT NULL DEFAULT 0,
+                    campos TEXT,
+                    tabla TEXT,
+                    error TEXT,
+                    metricas TEXT,
+                    texto TEXT,
+                    pdf BLOB,
+                    creado REAL NOT NULL,
+                    actualizado REAL NOT NULL
+                )
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_clave ON trabajos(clave, estado)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_usuario ON trabajos(usuario, creado)")
+        self._purgar()
+        self._reanudar()
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # -----------------------------------------------------------
+    # API para la app
+    # -----------------------------------------------------------
+
+    def enviar(self, nombre, pdf_bytes, api_key, usuario=None, trazar=TRAZA_ACTIVA, perfilar=False):
+        """
+        Registra un trabajo para `pdf_bytes` y lo pone en cola. Devuelve su id.
+        `trazar` y `perfilar` se pasan a la Traza del trabajo (ver contratos.traza).
+        """
+        clave = clave_analisis(pdf_bytes, PROMPT_VERSION, nombre_modelo(self.model, self.modelo_rapido))
+        ahora = time.time()
+        with self._lock, self._conectar() as con:
+            fila = con.execute(
+                f"SELECT id FROM trabajos WHERE clave = ? AND estado IN ({','.join('?' * len(ESTADOS_ACTIVOS))})",
+                (clave, *ESTADOS_ACTIVOS)
+            ).fetchone()
+            if fila is not None:
+                return fila[0]
+
+            id_trabajo = uuid.uuid4().hex
+            en_cache = self.cache.obtener(clave) if self.cache is not None else None
+            if en_cache is not None:
+                con.execute(
+                    "INSERT INTO trabajos (id, nombre, usuario, clave, estado, progreso, campos, tabla, "
+                    "metricas, creado, actualizado) VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?)",
+                    (id_trabajo, nombre, usuario, clave, TERMINADO,
+                     json.dumps(en_cache["campos"], ensure_ascii=False), en_cache["tabla"],
+                     json.dumps({"desde_cache": True}), ahora, ahora)
+                )
+                if self.almacen is not None:
+                    self.almacen.guardar(en_cache["campos"], clave, nombre)
+                return id_trabajo
+            con.execute(
+                "INSERT INTO trabajos (id, nombre, usuario, clave, estado, pdf, creado, actualizado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (id_trabajo, nombre, usuario, clave, PENDIENTE, sqlite3.Binary(pdf_bytes), ahora, ahora)
+            )
+        self._hilos.submit(self._ejecutar, id_trabajo, api_key, trazar, perfilar)
+        return id_trabajo
+
+    def estado(self, id_trabajo):
+        """
+        Dict con las columnas de COLUMNAS_ESTADO (campos y metricas ya
+        decodificados), o None si el id no existe.
+        """
+        estados = self.estados([id_trabajo])
+        return estados[0] if estados else None
+
+    def estados(self, ids):
+        """
+        Estados de varios trabajos en una sola consulta, en el orden de `ids`.
+        """
+        if not ids:
+            return []
+        with self._conectar() as con:
+            filas = con.execute(
+                f"SELECT {', '.join(COLUMNAS_ESTADO)} FROM trabajos WHERE id IN ({','.join('?' * len(ids))})",
+                list(ids)
+            ).fetchall()
+        por_id = {fila[0]: _decodificar(fila) for fila in filas}
+        return [por_id[i] for i in ids if i in por_id]
+
+    def texto(self, id_trabajo):
+        """
+        Texto limpio del contrato (disponible desde que termina la extracción).
+        Si el trabajo salió de la caché, se toma de otro trabajo con el mismo PDF.
+        """
+        with self._conectar() as con:
+            fila = con.execute("SELECT texto, clave FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+            if fila is not None and fila[0] is None:
+                fila = con.execute(
+                    "SELECT texto FROM trabajos WHERE clave = ? AND texto IS NOT NULL "
+                    "ORDER BY actualizado DESC LIMIT 1",
+                    (fila[1],)
+                ).fetchone()
+        return fila[0] if fila else None
+
+    def reanalizar(self, id_trabajo, api_key, campos=None):
+        """
+        Pone en cola la reconsulta de los campos no localizados o dudosos (o de
+        `campos`) de un trabajo terminado; ver contratos.reanalisis. Mientras
+        corre, el trabajo vuelve a estado "analizando". Devuelve False si ya no
+        hay texto guardado para hacerlo.
+        """
+        if self.texto(id_trabajo) is None:
+            return False
+        self._actualizar(id_trabajo, estado=ANALIZANDO, progreso=0.5, error=None)
+        self._hilos.submit(self._reanalizar, id_trabajo, api_key, campos)
+        return True
+
+    def listar(self, usuario=None, limite=50):
+        """
+        Trabajos más recientes (de `usuario`, si se indica).
+        """
+        consulta = f"SELECT {', '.join(COLUMNAS_ESTADO)} FROM trabajos"
+        parametros = []
+        if usuario is not None:
+            consulta += " WHERE usuario = ?"
+            parametros.append(usuario)
+        consulta += " ORDER BY creado DESC LIMIT ?"
+        parametros.append(limite)
+        with self._conectar() as con:
+            return [_decodificar(f) for f in con.execute(consulta, parametros).fetchall()]
+
+    def en_curso(self):
+        """
+        Número de trabajos pendientes o en ejecución (para el panel lateral).
+        """
+        with self._conectar() as con:
+            return con.execute(
+                f"SELECT COUNT(*) FROM trabajos WHERE estado IN ({','.join('?' * len(ESTADOS_ACTIVOS))})",
+                ESTADOS_ACTIVOS
+            ).fetchone()[0]
+
+    def cerrar(self, esperar=True):
+        self._hilos.shutdown(wait=esperar)
+
+    # -----------------------------------------------------------
+    # Ejecución (hilos del pool)
+    # -----------------------------------------------------------
+
+    def _actualizar(self, id_trabajo, **columnas):
+        columnas["actualizado"] = time.time()
+        for nombre in ("campos", "metricas"):
+            if nombre in columnas and columnas[nombre] is not None:
+                columnas[nombre] = json.dumps(columnas[nombre], ensure_ascii=False, default=str)
+        asignaciones = ", ".join(f"{c} = ?" for c in columnas)
+        with self._conectar() as con:
+            con.execute(f"UPDATE trabajos SET {asignaciones} WHERE id = ?", (*columnas.values(), id_trabajo))
+
+    def _cliente(self, api_key):
+        huella = hashlib.sha256(api_key.encode()).hexdigest()
+        with self._lock:
+            cliente = self._clientes.pop(huella, None) or self._crear_cliente(api_key)
+            self._clientes[huella] = cliente
+            while len(self._clientes) > MAX_CLIENTES:
+                self._clientes.popitem(last=False)
+            return cliente
+
+    def _ejecutar(self, id_trabajo, api_key, trazar=TRAZA_ACTIVA, perfilar=False):
+        try:
+            with self._conectar() as con:
+                pdf_bytes, clave, nombre = con.execute(
+                    "SELECT pdf, clave, nombre FROM trabajos WHERE id = ?", (id_trabajo,)
+                ).fetchone()
+            traza = Traza(activa=trazar, perfilar=perfilar, id_ejecucion=id_trabajo[:12])
+
+            self._actualizar(id_trabajo, estado=EXTRAYENDO, progreso=0.05)
+            metricas_extraccion = {}
+            with traza.etapa("extraccion", bytes=len(pdf_bytes)) as datos:
+                texto = extraer_texto_pdf(pdf_bytes, metricas=metricas_extraccion, ocr=self.ocr,
+                                          cache_ocr=self.cache_ocr)
+                datos["paginas"] = metricas_extraccion["paginas"]
+                datos["paginas_ocr"] = metricas_extraccion.get("paginas_ocr", 0)
+            with traza.etapa("limpieza", caracteres=len(texto)):
+                texto_limpio = limpiar_texto(texto)
+            del texto
+            if texto_insuficiente(texto_limpio):
+                raise ValueError(AVISO_SIN_TEXTO)
+
+            previo = None
+            if self.duplicados is not None:
+                with traza.etapa("duplicados") as datos:
+                    previo = self.duplicados.buscar(texto_limpio, metricas=datos)
+                    datos["encontrado"] = previo is not None
+
+            self._actualizar(id_trabajo, estado=ANALIZANDO, progreso=0.2, texto=texto_limpio)
+            metricas = {}
+            if previo is not None:
+                # Casi el mismo contrato: la ficha anterior se muestra de inmediato
+                # y solo se reconsultan los campos cuyo texto fuente cambió
+                self._actualizar(id_trabajo, campos=previo["campos"], progreso=0.5)
+                cambiados = campos_cambiados(previo["texto"], texto_limpio)
+                with traza.etapa("gpt", campos=len(cambiados)) as datos:
+                    tabla, campos = reanalizar_campos(
+                        self._cliente(api_key), previo["campos"], texto_limpio, cambiados, self.model,
+                        metricas=metricas, reemplazar=True
+                    )
+                    datos.update(tokens=metricas.get("uso"))
+                metricas["duplicado"] = {
+                    "nombre": previo["nombre"],
+                    "clave": previo["clave"],
+                    "similitud": round(previo["similitud"], 3),
+                    "campos_cambiados": cambiados,
+                    "diff": diff_textos(previo["texto"], texto_limpio),
+                }
+            else:
+                parciales = {}
+
+                def al_recibir_campo(campo, respuesta):
+                    parciales[campo] = respuesta
+                    avance = 0.2 + 0.8 * len(parciales) / len(HEADERS_CONTRATO)
+                    self._actualizar(id_trabajo, campos=parciales, progreso=min(avance, 0.99))
+
+                with traza.etapa("gpt") as datos:
+                    if self.modelo_rapido:
+                        tabla, campos = analizar_en_cascada(
+                            self._cliente(api_key), texto_limpio, self.modelo_rapido, self.model,
+                            metricas=metricas, al_recibir_campo=al_recibir_campo
+                        )
+                    else:
+                        tabla, campos = analizar_texto(
+                            self._cliente(api_key), texto_limpio, self.model,
+                            metricas=metricas, al_recibir_campo=al_recibir_campo
+                        )
+                    datos.update(reintentos=metricas.get("reintentos", 0), tokens=metricas.get("uso"))
+
+            # Ni un stream cortado ni una ficha ilegible se guardan: son resultados parciales
+            completo = metricas.get("stream_completo", True) and not metricas.get("parseo_fallido")
+            if completo and self.cache is not None:
+                self.cache.guardar(clave, tabla, campos)
+            elif not completo:
+                tabla = construir_tabla_markdown(campos)
+            if completo and self.almacen is not None:
+                self.almacen.guardar(campos, clave, nombre)
+            if completo and self.duplicados is not None:
+                self.duplicados.agregar(clave, texto_limpio, campos, nombre)
+            metricas.pop("usage", None)
+            metricas.update(
+                paginas=metricas_extraccion["paginas"],
+                segundos_extraccion=metricas_extraccion["segundos"],
+                **{c: metricas_extraccion[c]
+                   for c in ("paginas_ocr", "paginas_ocr_cache", "paginas_ocr_fallidas", "segundos_ocr")
+                   if c in metricas_extraccion},
+            )
+            if traza.etapas:
+                metricas["etapas"] = traza.resumen()
+            if perfilar:
+                metricas["perfil"] = traza.reporte_perfil()
+            self._actualizar(
+                id_trabajo, estado=TERMINADO, progreso=1.0, campos=campos, tabla=tabla,
+                metricas=metricas, pdf=None
+            )
+        except Exception as e:
+            self._actualizar(id_trabajo, estado=ERROR, error=str(e), pdf=None)
+
+    def _reanalizar(self, id_trabajo, api_key, campos):
+        try:
+            trabajo = self.estado(id_trabajo)
+            metricas = {}
+            texto = self.texto(id_trabajo)
+            tabla, nuevos = reanalizar_campos(
+                self._cliente(api_key), trabajo["campos"], texto, campos, self.model,
+                metricas=metricas
+            )
+            if self.cache is not None:
+                self.cache.guardar(trabajo["clave"], tabla, nuevos)
+            if self.almacen is not None:
+                self.almacen.guardar(nuevos, trabajo["clave"], trabajo["nombre"])
+            if self.duplicados is not None:
+                self.duplicados.agregar(trabajo["clave"], texto, nuevos, trabajo["nombre"])
+            trabajo["metricas"]["reanalisis"] = {
+                c: metricas.get(c) for c in
+                ("campos_pedidos", "campos_recuperados", "campos_sin_pasaje", "tokens_enviados", "uso")
+            }
+            self._actualizar(
+                id_trabajo, estado=TERMINADO, progreso=1.0, campos=nuevos, tabla=tabla,
+                metricas=trabajo["metricas"]
+            )
+        except Exception as e:
+            # La ficha anterior sigue siendo válida: solo se anota el error
+            self._actualizar(id_trabajo, estado=TERMINADO, progreso=1.0, error=f"No se pudo reconsultar: {e}")
+
+    # -----------------------------------------------------------
+    # Mantenimiento
+    # -----------------------------------------------------------
+
+    def _purgar(self, dias=DIAS_RETENCION):
+        limite = time.time() - dias * 86400
+        with self._conectar() as con:
+            con.execute(
+                "DELETE FROM trabajos WHERE estado IN (?, ?) AND actualizado < ?", (TERMINADO, ERROR, limite)
+            )
+
+    def _reanudar(self):
+        """
+        Trabajos que quedaron a medias en un proceso anterior.
+        """
+        api_key = os.environ.get("OPENAI_API_KEY")
+        with self._conectar() as con:
+            ids = [f[0] for f in con.execute(
+                f"SELECT id FROM trabajos WHERE estado IN ({','.join('?' * len(ESTADOS_ACTIVOS))}) "
+                "AND pdf IS NOT NULL ORDER BY creado",
+                ESTADOS_ACTIVOS
+            ).fetchall()]
+            # Reconsultas interrumpidas: la ficha anterior sigue completa
+            con.execute(
+                f"UPDATE trabajos SET estado = ?, progreso = 1 WHERE estado IN "
+                f"({','.join('?' * len(ESTADOS_ACTIVOS))}) AND pdf IS NULL AND tabla IS NOT NULL",
+                (TERMINADO, *ESTADOS_ACTIVOS)
+            )
+        for id_trabajo in ids:
+            if api_key:
+                self._actualizar(id_trabajo, estado=PENDIENTE, progreso=0.0, campos=None)
+                self._hilos.submit(self._ejecutar, id_trabajo, api_key)
+            else:
+                self._actualizar(
+                    id_trabajo, estado=ERROR, pdf=None,
+                    error="El servidor se reinició antes de terminar; vuelve a enviar el contrato."
+                )
+
+
+def _cliente_openai(api_key):
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+
+def _decodificar(fila):
+    trabajo = dict(zip(COLUMNAS_ESTADO, fila))
+    trabajo["campos"] = json.loads(trabajo["campos"]) if trabajo["campos"] else {}
+    trabajo["metricas"] = json.loads(trabajo["metricas"]) if trabajo["metricas"] else {}
+    return trabajo
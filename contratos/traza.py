@@ -0,0 +1,149 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+try:
+    import resource  # solo Unix; en Windows no reportamos memoria
+except ImportError:
+    resource = None
+
+# ===============================================================
+# TRAZA POR ETAPAS: TIEMPO, MEMORIA Y DATOS DE CADA PASO DEL PIPELINE
+# ===============================================================
+# Cada etapa produce una línea JSON en el logger "contratos.traza" (fácil de
+# agregar después) y queda en Traza.etapas para mostrarla en la app.
+# Desactivada, etapa() devuelve un contexto vacío y no mide nada.
+
+TRAZA_ACTIVA = os.environ.get("CONTRATOS_TRAZA", "") not in ("", "0")
+
+logger = logging.getLogger("contratos.traza")
+
+
+def pico_rss_kb():
+    if resource is None:
+        return None
+    # En Linux ru_maxrss viene en KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class _EtapaInactiva:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_ETAPA_INACTIVA = _EtapaInactiva()
+
+
+class _Etapa:
+    def __init__(self, traza, nombre, datos):
+        self.traza = traza
+        self.nombre = nombre
+        self.datos = datos
+
+    def __enter__(self):
+        self._rss0 = pico_rss_kb()
+        self._t0 = time.perf_counter()
+        self.traza._activar_perfil()
+        return self.datos
+
+    def __exit__(self, tipo, error, tb):
+        segundos = time.perf_counter() - self._t0
+        self.traza._pausar_perfil()
+        rss = pico_rss_kb()
+        registro = {
+            "ejecucion": self.traza.id,
+            "etapa": self.nombre,
+            "segundos": round(segundos, 4),
+            "pico_rss_kb": rss,
+            "aumento_pico_rss_kb": rss - self._rss0 if rss is not None else None,
+            **self.datos,
+        }
+        if tipo is not None:
+            registro["error"] = tipo.__name__
+        self.traza._registrar(registro)
+        return False
+
+
+class Traza:
+    """
+    Agrupa las etapas de una ejecución (un contrato, un lote, una exportación).
+
+        traza = Traza()
+        with traza.etapa("extraccion", bytes=len(pdf_bytes)) as datos:
+            texto = extraer_texto_pdf(pdf_bytes)
+            datos["caracteres"] = len(texto)
+
+    El dict que devuelve `with` se puede completar dentro del bloque y sus
+    claves se agregan al registro. Con `perfilar=True`, cProfile corre solo
+    mientras hay una etapa abierta; reporte_perfil() devuelve el resumen.
+    """
+
+    def __init__(self, activa=TRAZA_ACTIVA, perfilar=False, id_ejecucion=None):
+        self.activa = activa or perfilar
+        self.id = id_ejecucion or uuid.uuid4().hex[:12]
+        self.etapas = []
+        self._perfil = None
+        if perfilar:
+            import cProfile  # diferido: solo se carga si se pide el perfil
+
+            self._perfil = cProfile.Profile()
+        self._abiertas = 0
+        self._lock = threading.Lock()
+
+    def etapa(self, nombre, **datos):
+        if not self.activa:
+            return _ETAPA_INACTIVA
+        return _Etapa(self, nombre, datos)
+
+    def _registrar(self, registro):
+        with self._lock:
+            self.etapas.append(registro)
+        logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+    def _activar_perfil(self):
+        if self._perfil is not None:
+            self._abiertas += 1
+            if self._abiertas == 1:
+                self._perfil.enable()
+
+    def _pausar_perfil(self):
+        if self._perfil is not None:
+            self._abiertas -= 1
+            if self._abiertas == 0:
+                self._perfil.disable()
+
+    def resumen(self):
+        """
+        Segundos por etapa (sumando repeticiones) en orden de aparición, más el total.
+        """
+        tiempos = {}
+        for registro in self.etapas:
+            tiempos[registro["etapa"]] = tiempos.get(registro["etapa"], 0.0) + registro["segundos"]
+        tiempos["total"] = sum(tiempos.values())
+        return tiempos
+
+    def reporte_perfil(self, limite=25, orden="cumulative"):
+        if self._perfil is None:
+            return ""
+        import pstats
+
+        salida = io.StringIO()
+        try:
+            pstats.Stats(self._perfil, stream=salida).sort_stats(orden).print_stats(limite)
+        except TypeError:  # ninguna etapa llegó a ejecutarse
+            return ""
+        return salida.getvalue()
+
+    def guardar_perfil(self, ruta):
+        """
+        Vuelca el perfil en formato .prof (para snakeviz, pstats, etc.).
+        """
+        if self._perfil is not None:
+            self._perfil.dump_stats(ruta)
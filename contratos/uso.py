@@ -0,0 +1,83 @@
+import json
+import logging
+import threading
+
+# ===============================================================
+# CONTABILIDAD DE TOKENS (ENTRADA, EN CACHÉ Y SALIDA)
+# ===============================================================
+
+logger = logging.getLogger("contratos.uso")
+
+
+def extraer_uso(usage):
+    """
+    Convierte el objeto usage de la Responses API en
+    {"entrada", "en_cache", "salida"} (tokens). Tolera campos ausentes.
+    """
+    if usage is None:
+        return {"entrada": 0, "en_cache": 0, "salida": 0}
+    detalles = getattr(usage, "input_tokens_details", None)
+    return {
+        "entrada": getattr(usage, "input_tokens", 0) or 0,
+        "en_cache": getattr(detalles, "cached_tokens", 0) or 0,
+        "salida": getattr(usage, "output_tokens", 0) or 0,
+    }
+
+
+def proporcion_cache(uso):
+    """
+    Fracción de los tokens de entrada que se cobraron como caché.
+    """
+    return uso["en_cache"] / uso["entrada"] if uso.get("entrada") else 0.0
+
+
+def sumar_uso(destino, uso):
+    """
+    Acumula `uso` en el dict `destino` (mismas claves que extraer_uso + peticiones).
+    """
+    for clave in ("entrada", "en_cache", "salida"):
+        destino[clave] = destino.get(clave, 0) + uso[clave]
+    destino["peticiones"] = destino.get("peticiones", 0) + 1
+    return destino
+
+
+class ContadorUso:
+    """
+    Totales de tokens del proceso, seguros entre hilos. Cada petición se
+    registra además en el logger "contratos.uso" como una línea JSON.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totales = {}
+
+    def registrar(self, usage, model=None, metricas=None):
+        uso = extraer_uso(usage)
+        with self._lock:
+            sumar_uso(self._totales, uso)
+            if metricas is not None:  # puede compartirse entre hilos (fragmentos)
+                sumar_uso(metricas.setdefault("uso", {}), uso)
+        logger.info(json.dumps({"modelo": model, **uso, "proporcion_cache": round(proporcion_cache(uso), 3)}))
+        return uso
+
+    def estadisticas(self):
+        with self._lock:
+            totales = {"entrada": 0, "en_cache": 0, "salida": 0, "peticiones": 0, **self._totales}
+        totales["proporcion_cache"] = proporcion_cache(totales)
+        return totales
+
+
+_contador_global = None
+_lock_global = threading.Lock()
+
+
+def contador_uso_global():
+    """
+    Contador único por proceso, compartido por las sesiones de Streamlit,
+    el modo lote y los fragmentos.
+    """
+    global _contador_global
+    with _lock_global:
+        if _contador_global is None:
+            _contador_global = ContadorUso()
+        return _contador_global
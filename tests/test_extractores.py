@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+import pytest
+
+from contratos.extractores import UMBRAL_CONFIANZA, extraer_campos_locales, normalizar_monto, parsear_monto
+
+# ===============================================================
+# PRUEBAS DE LOS EXTRACTORES LOCALES
+# ===============================================================
+# Un campo que pasa UMBRAL_CONFIANZA ya no se pregunta a GPT, así que un monto
+# mal leído o una confianza inflada llega tal cual a la ficha.
+
+MONTOS = [
+    # Formato mexicano
+    ("3,436,646.48", "3436646.48"),
+    ("3'436,646.48", "3436646.48"),
+    ("3 436 646.48", "3436646.48"),
+    ("436,646", "436646.00"),
+    ("950.5", "950.50"),
+    # Formato europeo
+    ("3.436.646,48", "3436646.48"),
+    ("1.500,5", "1500.50"),
+    ("950,00", "950.00"),
+    ("3.436.646", "3436646.00"),
+]
+
+CLAUSULA_MONTO = "El monto del presente contrato es de $3,436,646.48 {sufijo} más el impuesto al valor agregado."
+
+FECHAS = (
+    "La fecha de inicio de los trabajos será el día 1o. de marzo del año 2024 y se concluirán "
+    "a más tardar el día 28 de {mes} de 2024, con un plazo de ejecución de {dias} (texto) días naturales."
+)
+
+
+@pytest.mark.parametrize("cantidad, esperado", MONTOS)
+def test_normalizar_monto(cantidad, esperado):
+    assert normalizar_monto(cantidad) == Decimal(esperado)
+
+
+@pytest.mark.parametrize("texto", ["", "1,2,3.4.5", "abc"])
+def test_normalizar_monto_invalido(texto):
+    assert normalizar_monto(texto) is None
+
+
+@pytest.mark.parametrize("sufijo", ["M.N.", "(TRES MILLONES ... PESOS 48/100 M.N.)", "pesos", "pesos 48/100 M. N."])
+def test_sufijos_del_monto(sufijo):
+    texto = CLAUSULA_MONTO.format(sufijo=sufijo)
+    assert parsear_monto(texto) == Decimal("3436646.48")
+    assert extraer_campos_locales(texto)["Monto antes de IVA"] == ("$3,436,646.48", 0.95)
+
+
+def test_monto_europeo_en_clausula():
+    texto = "El monto del presente contrato es de $ 3.436.646,48 M.N. más I.V.A."
+    assert extraer_campos_locales(texto)["Monto antes de IVA"] == ("$3,436,646.48", 0.95)
+
+
+def test_monto_sin_iva_no_pasa_el_umbral():
+    texto = "El monto total del contrato es de $3,986,509.92 M.N."
+    valor, confianza = extraer_campos_locales(texto)["Monto antes de IVA"]
+    assert valor == "$3,986,509.92"
+    assert confianza < UMBRAL_CONFIANZA
+
+
+def test_monto_con_iva_junto_a_uno_sin_iva():
+    # El "más IVA" es de otra cantidad: no hay forma de saber si el monto lo incluye
+    texto = ("El monto total del presente contrato es de $1,160.00 IVA incluido. "
+             "El anticipo será de $100.00 más IVA.")
+    valor, confianza = extraer_campos_locales(texto)["Monto antes de IVA"]
+    assert valor == "$1,160.00"
+    assert confianza < UMBRAL_CONFIANZA
+
+    texto = ("El monto total del contrato es de $1,160.00. El monto del presente contrato es de "
+             "$1,000.00 más el I.V.A.")
+    assert extraer_campos_locales(texto)["Monto antes de IVA"] == ("$1,000.00", 0.95)
+
+
+def test_fechas_con_el_mes_en_letra():
+    campos = extraer_campos_locales(FECHAS.format(mes="septiembre", dias=300))
+    assert campos["Fecha de inicio"] == ("1 de marzo de 2024", 0.9)
+    assert campos["Fecha de fin"] == ("28 de septiembre de 2024", 0.9)
+    assert campos["Vigencia/Plazo"] == ("300 días naturales", 0.9)
+
+
+@pytest.mark.parametrize("mes", ["diciembre", "DICIEMBRE", "Diciembre"])
+def test_fechas_y_plazo_coherentes(mes):
+    # Del 1 de marzo al 28 de diciembre de 2024 van 303 días contando ambos extremos
+    campos = extraer_campos_locales(FECHAS.format(mes=mes, dias=303))
+    assert campos["Fecha de fin"][0] == "28 de diciembre de 2024"
+    assert all(confianza == 0.99 for _, confianza in campos.values())
+    assert all(confianza >= UMBRAL_CONFIANZA for _, confianza in campos.values())
+
+
+def test_fin_antes_del_inicio_no_pasa_el_umbral():
+    campos = extraer_campos_locales(FECHAS.format(mes="enero", dias=30))
+    assert campos["Fecha de inicio"][1] < UMBRAL_CONFIANZA
+    assert campos["Fecha de fin"][1] < UMBRAL_CONFIANZA
+
+
+def test_fecha_inexistente_se_descarta():
+    campos = extraer_campos_locales(FECHAS.format(mes="febrero", dias=30).replace("28 de", "31 de"))
+    assert "Fecha de fin" not in campos
+    assert "Fecha de inicio" in campos
@@ -0,0 +1,122 @@
+import json
+import random
+
+import pytest
+
+from contratos.ficha_json import ParserFichaIncremental, leer_ficha_json, parse_ficha_json
+from contratos.prompts import CLAVES_JSON, HEADERS_CONTRATO
+
+# ===============================================================
+# PRUEBAS DEL PARSEO DE LA FICHA EN JSON
+# ===============================================================
+# parse_ficha_json valida la respuesta completa; ParserFichaIncremental debe
+# dar los mismos campos sin importar por dónde corte el streaming el texto, y
+# leer_ficha_json rescata los pares completos de una respuesta truncada.
+
+CORTES_FUZZ = 500
+
+FICHA = {
+    "Partes": "Comisión Federal de Electricidad | Aram Alta Ingeniería, S.A. de C.V.",
+    "Objeto": 'Servicio "integral" de mantenimiento\npreventivo | fase 1',
+    "Monto antes de IVA": "$3,436,646.48",
+    "IVA": "$549,863.44",
+    "Monto total": "$3,986,509.92",
+    "Fecha de inicio": "01/02/2024",
+    "Fecha de fin": "31/12/2024",
+    "Vigencia/Plazo": "334 días naturales",
+}
+
+
+def _json(ficha, **opciones):
+    """
+    La respuesta del modelo: todas las claves del esquema, vacías si no se piden.
+    """
+    datos = {CLAVES_JSON[campo]: ficha.get(campo, "") for campo in HEADERS_CONTRATO}
+    return json.dumps(datos, **opciones)
+
+
+def _trozos(texto, rng):
+    """
+    Corta `texto` en pedazos de largo aleatorio (incluye pedazos vacíos).
+    """
+    cortes = sorted(rng.randint(0, len(texto)) for _ in range(rng.randint(0, 12)))
+    return [texto[i:j] for i, j in zip([0] + cortes, cortes + [len(texto)])]
+
+
+def _incremental(trozos):
+    parser = ParserFichaIncremental()
+    filas = []
+    for trozo in trozos:
+        filas.extend(parser.agregar(trozo))
+    parser.terminar()
+    return parser.campos, filas
+
+
+@pytest.mark.parametrize("opciones", [{}, {"ensure_ascii": False}, {"indent": 2}])
+def test_comillas_escapadas_y_barras(opciones):
+    texto = _json(FICHA, **opciones)
+    assert parse_ficha_json(texto) == FICHA
+    assert _incremental([texto])[0] == FICHA
+
+
+def test_claves_faltantes_y_vacias():
+    texto = json.dumps({CLAVES_JSON["Objeto"]: FICHA["Objeto"], CLAVES_JSON["IVA"]: "  "})
+    assert parse_ficha_json(texto) == {"Objeto": FICHA["Objeto"]}
+    assert _incremental([texto])[0] == {"Objeto": FICHA["Objeto"]}
+
+
+def test_clave_fuera_del_esquema():
+    datos = json.loads(_json(FICHA))
+    datos["observaciones"] = "no pedida"
+    texto = json.dumps(datos)
+    with pytest.raises(ValueError, match="observaciones"):
+        parse_ficha_json(texto)
+    # El parser incremental ignora la clave desconocida y conserva las demás
+    metricas = {}
+    assert leer_ficha_json(texto, metricas) == FICHA
+    assert metricas["parseo_fallido"]
+
+
+@pytest.mark.parametrize("texto", ["[]", '{"objeto": 5}', "texto libre"])
+def test_no_es_ficha(texto):
+    with pytest.raises(ValueError):
+        parse_ficha_json(texto)
+
+
+def test_truncada_a_media_cadena():
+    texto = _json(FICHA)
+    corte = texto.index("mantenimiento")
+    metricas = {}
+    campos = leer_ficha_json(texto[:corte], metricas)
+    assert campos == {"Partes": FICHA["Partes"]}
+    assert metricas["parseo_fallido"] and metricas["error_parseo"]
+
+
+def test_truncada_en_escape():
+    texto = _json(FICHA)
+    corte = texto.index('\\"integral') + 1  # termina en la barra del escape
+    assert leer_ficha_json(texto[:corte], {}) == {"Partes": FICHA["Partes"]}
+
+
+def test_respuesta_completa_no_marca_fallo():
+    metricas = {}
+    assert leer_ficha_json(_json(FICHA), metricas) == FICHA
+    assert "parseo_fallido" not in metricas
+
+
+@pytest.mark.parametrize("opciones", [{}, {"ensure_ascii": False}, {"indent": 2}])
+def test_incremental_igual_a_completo(opciones):
+    texto = _json(FICHA, **opciones)
+    esperado = parse_ficha_json(texto)
+    rng = random.Random(20240917)
+    for _ in range(CORTES_FUZZ):
+        trozos = _trozos(texto, rng)
+        campos, filas = _incremental(trozos)
+        assert campos == esperado, trozos
+        # Cada campo sale una sola vez y en el orden de la respuesta
+        assert filas == list(esperado.items()), trozos
+
+
+def test_incremental_caracter_por_caracter():
+    texto = _json(FICHA, ensure_ascii=False)
+    assert _incremental(list(texto))[0] == parse_ficha_json(texto)
@@ -0,0 +1,138 @@
+import pytest
+from openai import OpenAI
+
+from benchmarks.corpus import texto_contrato
+from benchmarks.servidores import OpenAIFalso
+from contratos.clausulas import RE_CLAUSULA
+from contratos.fragmentos import (
+    NO_LOCALIZADO,
+    analizar_por_fragmentos,
+    combinar_campos,
+    dividir_en_clausulas,
+)
+from contratos.limites import CARACTERES_POR_TOKEN
+from contratos.prompts import HEADERS_CONTRATO
+
+# ===============================================================
+# MAP-REDUCE: DIVISIÓN EN FRAGMENTOS Y COMBINACIÓN DE FICHAS
+# ===============================================================
+
+PEDIDOS = ["Partes", "Objeto", "Monto antes de IVA", "Monto total", "Normatividad aplicable", "Anexos",
+           "Áreas de mejora", "No localizado"]
+
+
+def _palabras(texto):
+    return texto.split()
+
+
+@pytest.fixture(scope="module")
+def contrato():
+    texto, _ = texto_contrato(clausulas=30, filas_anexo=20, semilla=7)
+    return texto
+
+
+@pytest.mark.parametrize("tokens", [300, 1000, 4000])
+def test_ningun_fragmento_excede_el_limite(contrato, tokens):
+    fragmentos = dividir_en_clausulas(contrato, tokens)
+    assert len(fragmentos) > 1
+    assert all(len(f) <= tokens * CARACTERES_POR_TOKEN for f in fragmentos)
+    # No se pierde ni se repite texto
+    assert [p for f in fragmentos for p in _palabras(f)] == _palabras(contrato)
+
+
+@pytest.mark.parametrize("tokens", [1000, 4000])
+def test_respeta_las_clausulas(contrato, tokens):
+    clausulas = [m.group() for m in RE_CLAUSULA.finditer(contrato)]
+    fragmentos = dividir_en_clausulas(contrato, tokens)
+    # Si ninguna cláusula excede el límite, cada fragmento después del primero
+    # empieza en un encabezado y ninguna cláusula queda partida en dos
+    assert all(RE_CLAUSULA.match(f) for f in fragmentos[1:])
+    assert [m.group() for f in fragmentos for m in RE_CLAUSULA.finditer(f)] == clausulas
+
+
+def test_clausula_mas_larga_que_el_limite_se_corta_en_un_espacio():
+    texto = "CLÁUSULA PRIMERA.- " + "palabra " * 200 + "CLÁUSULA SEGUNDA.- fin"
+    fragmentos = dividir_en_clausulas(texto, 50)
+    assert all(len(f) <= 50 * CARACTERES_POR_TOKEN for f in fragmentos)
+    assert [p for f in fragmentos for p in _palabras(f)] == _palabras(texto)
+    # El resto de la cláusula larga puede compartir fragmento con la siguiente,
+    # pero el encabezado de esta no se parte
+    assert fragmentos[-1].endswith(" CLÁUSULA SEGUNDA.- fin")
+
+
+def test_texto_sin_clausulas_es_un_solo_fragmento():
+    assert dividir_en_clausulas("  proemio corto  ", 100) == ["proemio corto"]
+
+
+def test_fragmentos_que_coinciden():
+    parciales = [
+        {"Partes": "CFE y Aram Alta", "Objeto": NO_LOCALIZADO, "Monto antes de IVA": "$1,000.00"},
+        {"Partes": "CFE y Aram Alta", "Objeto": "Mantenimiento", "Monto antes de IVA": "$1,000.00",
+         "Monto total": "$1,160.00"},
+    ]
+    campos, conflictos = combinar_campos(parciales, PEDIDOS)
+    assert conflictos == []
+    assert campos["Partes"] == "CFE y Aram Alta"
+    assert campos["Objeto"] == "Mantenimiento"
+    assert campos["Monto antes de IVA"] == "$1,000.00"
+    assert campos["Monto total"] == "$1,160.00"
+    assert list(campos) == [c for c in HEADERS_CONTRATO if c in PEDIDOS]
+
+
+def test_no_localizado_cede_ante_un_valor_real():
+    parciales = [
+        {"Partes": NO_LOCALIZADO, "Objeto": "no localizado", "Anexos": ""},
+        {"Partes": "CFE y Aram Alta", "Objeto": "  Mantenimiento  ", "Anexos": NO_LOCALIZADO},
+    ]
+    campos, _ = combinar_campos(parciales, PEDIDOS)
+    assert campos["Partes"] == "CFE y Aram Alta"
+    assert campos["Objeto"] == "Mantenimiento"
+    assert campos["Anexos"] == NO_LOCALIZADO
+    assert campos["Monto antes de IVA"] == NO_LOCALIZADO
+    # "No localizado" se recalcula con lo que quedó sin valor
+    assert campos["No localizado"] == "Monto antes de IVA, Monto total, Normatividad aplicable, Anexos, Áreas de mejora"
+
+
+def test_valores_en_conflicto():
+    parciales = [
+        {"Objeto": "Mantenimiento", "Monto antes de IVA": "$1,000.00"},
+        {"Objeto": "Construcción", "Monto antes de IVA": "$2,000.00"},
+        {"Monto antes de IVA": "$ 2,000.00 M.N.", "Monto total": "$2,320.00",
+         "Áreas de mejora": "Falta el anexo técnico."},
+    ]
+    campos, conflictos = combinar_campos(parciales, PEDIDOS)
+    # En campos de texto gana el primero; en montos, el más repetido
+    assert campos["Objeto"] == "Mantenimiento"
+    assert campos["Monto antes de IVA"] == "$2,000.00"
+    assert len(conflictos) == 1 and conflictos[0].startswith("Monto antes de IVA:")
+    assert campos["Áreas de mejora"] == "Falta el anexo técnico. " + conflictos[0]
+
+
+def test_monto_total_incoherente_con_el_iva():
+    parciales = [{"Monto antes de IVA": "$1,000.00", "Monto total": "$1,500.00"}]
+    campos, conflictos = combinar_campos(parciales, PEDIDOS)
+    assert conflictos == ["Monto total: no coincide con el monto antes de IVA más 16% de IVA."]
+    assert campos["Áreas de mejora"] == conflictos[0]
+
+
+def test_campos_de_lista_se_juntan():
+    parciales = [
+        {"Normatividad aplicable": "Ley de Obras Públicas", "Anexos": "Anexo A", "Áreas de mejora": "Sin firmas."},
+        {"Normatividad aplicable": "Código Civil Federal", "Anexos": "Anexo A", "Áreas de mejora": "Sin fecha."},
+        {"Normatividad aplicable": "Ley de Obras Públicas", "Anexos": "Anexo B"},
+    ]
+    campos, _ = combinar_campos(parciales, PEDIDOS)
+    assert campos["Normatividad aplicable"] == "Ley de Obras Públicas; Código Civil Federal"
+    assert campos["Anexos"] == "Anexo A; Anexo B"
+    assert campos["Áreas de mejora"] == "Sin firmas. Sin fecha."
+
+
+def test_metricas_cuentan_los_fragmentos(contrato):
+    metricas = {}
+    with OpenAIFalso() as servidor:
+        client = OpenAI(api_key="falsa", base_url=servidor.url + "/v1", max_retries=0)
+        _, campos = analizar_por_fragmentos(client, contrato, campos_pedidos=PEDIDOS, tokens_por_fragmento=1000,
+                                            metricas=metricas)
+    assert metricas["fragmentos"] == len(dividir_en_clausulas(contrato, 1000))
+    assert metricas["fragmentos"] > 1
+    assert set(campos) == set(PEDIDOS)
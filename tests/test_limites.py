@@ -0,0 +1,94 @@
+import threading
+import time
+
+from openai import OpenAI
+
+from benchmarks.servidores import OpenAIFalso
+from contratos.analisis import MODELO_ANALISIS, safe_gpt
+from contratos.limites import LimitadorTokens
+from contratos.prompts import construir_mensajes
+
+# ===============================================================
+# LIMITADOR DE TOKENS: ORDEN DE LLEGADA Y PAUSA GLOBAL TRAS UN 429
+# ===============================================================
+
+TPM = 60_000                # 1000 tokens por segundo: las esperas de la prueba duran décimas
+RETRY_AFTER = 0.3
+
+
+class OpenAIRafaga429(OpenAIFalso):
+    """
+    OpenAIFalso que responde 429 (con Retry-After) a las primeras `rechazos`
+    peticiones y anota cuándo llega cada una.
+    """
+
+    def __init__(self, rechazos, **kwargs):
+        super().__init__(**kwargs)
+        self.rechazos = rechazos
+        self.llegadas = []
+
+    def responder(self, manejador, ruta, cuerpo):
+        with self._lock:
+            self.llegadas.append(time.monotonic())
+            rechazar = len(self.llegadas) <= self.rechazos
+        if rechazar:
+            self._responder_json(
+                manejador, 429,
+                {"error": {"message": "Rate limit (simulado)", "type": "rate_limit_error", "code": None}},
+                {"Retry-After": str(RETRY_AFTER)}
+            )
+            return
+        super().responder(manejador, ruta, cuerpo)
+
+
+def _esperar(condicion, limite=5.0):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "la condición no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+def test_fifo_sin_colarse():
+    limitador = LimitadorTokens(rpm=100_000, tpm=TPM)
+    limitador.adquirir(TPM)  # cubeta vacía: todos deben esperar
+    # Las peticiones chicas llegan detrás de grandes y no deben adelantarse
+    pedidos = [200, 1, 150, 1, 1]
+    atendidos = []
+    hilos = []
+    for i, tokens in enumerate(pedidos):
+        hilo = threading.Thread(target=lambda i=i, t=tokens: (limitador.adquirir(t), atendidos.append(i)))
+        hilo.start()
+        hilos.append(hilo)
+        _esperar(lambda: limitador.estadisticas()["en_cola"] == i + 1)
+    for hilo in hilos:
+        hilo.join(10)
+
+    assert atendidos == list(range(len(pedidos)))
+    assert limitador.estadisticas()["servidas"] == len(pedidos) + 1
+
+
+def test_429_pausa_a_todos_los_llamadores():
+    limitador = LimitadorTokens(rpm=100_000, tpm=10_000_000)
+    with OpenAIRafaga429(rechazos=1) as servidor:
+        client = OpenAI(api_key="falsa", base_url=servidor.url + "/v1", max_retries=0)
+        mensajes = construir_mensajes("Contrato de obra pública.")
+        respuestas = []
+
+        def llamar():
+            respuestas.append(safe_gpt(client, MODELO_ANALISIS, mensajes, limitador=limitador))
+
+        primero = threading.Thread(target=llamar)
+        primero.start()
+        # En cuanto el primero recibe el 429, llegan otros tres llamadores
+        _esperar(lambda: limitador.estadisticas()["reintentos"] == 1)
+        otros = [threading.Thread(target=llamar) for _ in range(3)]
+        for hilo in otros:
+            hilo.start()
+        for hilo in [primero] + otros:
+            hilo.join(10)
+
+        assert len(respuestas) == 4
+        assert len(servidor.llegadas) == 5  # el 429 y una petición por llamador
+        # Nadie, ni el que recibió el 429 ni los que llegaron después, pidió antes del Retry-After
+        assert min(servidor.llegadas[1:]) - servidor.llegadas[0] >= RETRY_AFTER
+        assert limitador.estadisticas()["reintentos"] == 1
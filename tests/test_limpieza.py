@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from benchmarks.bench_limpieza import limpiar_texto_original, pagina_sintetica
+from contratos.limpieza import limpiar_paginas, limpiar_texto
+
+# ===============================================================
+# PRUEBAS DORADAS: EL NORMALIZADOR CONTRA LA CADENA DE REGEX ORIGINAL
+# ===============================================================
+# limpiar_texto y limpiar_paginas deben dar exactamente la salida de
+# limpiar_texto_original (la función que vivía en app.py) con cualquier texto,
+# y limpiar_paginas sin importar por dónde se corten las páginas.
+
+# Letras, guiones, saltos, espacios y basura: lo que hace distintos los casos
+ALFABETO = list("ab9ñÁ_ -\n\n\t\r.,:") + ["�", "●", "•", " ", "ejecu-\n", "-\n\n", " \n "]
+CASOS_FUZZ = 3000
+
+CASOS_BORDE = [
+    "",
+    "   ",
+    "\n\n\n",
+    "a-\nb-\nc",
+    "a-\n\nb",
+    "ejecu-  \n  ción del contrato",
+    "• cláusula\n● segunda �\n\ntercera",
+    "palabra -\nsuelta",
+    "-\nb",
+    "a-\n",
+    "monto: $1,234.56-\n\n  IVA",
+    "  inicio\n\nfin  ",
+]
+
+
+def _trozos(texto, rng):
+    """
+    Corta `texto` en pedazos de largo aleatorio (incluye pedazos vacíos).
+    """
+    cortes = sorted(rng.randint(0, len(texto)) for _ in range(rng.randint(0, 6)))
+    return [texto[i:j] for i, j in zip([0] + cortes, cortes + [len(texto)])]
+
+
+@pytest.mark.parametrize("texto", CASOS_BORDE)
+def test_casos_borde(texto):
+    esperado = limpiar_texto_original(texto)
+    assert limpiar_texto(texto) == esperado
+    assert "".join(limpiar_paginas([texto])) == esperado
+
+
+def test_fuzz_contra_original():
+    rng = random.Random(20240601)
+    for _ in range(CASOS_FUZZ):
+        texto = "".join(rng.choice(ALFABETO) for _ in range(rng.randint(0, 60)))
+        esperado = limpiar_texto_original(texto)
+        assert limpiar_texto(texto) == esperado, repr(texto)
+        trozos = _trozos(texto, rng)
+        assert "".join(limpiar_paginas(trozos)) == esperado, repr(trozos)
+
+
+def test_contrato_sintetico_por_paginas():
+    rng = random.Random(1234)
+    paginas = [pagina_sintetica(rng) + "\n\n" for _ in range(40)]
+    esperado = limpiar_texto_original("".join(paginas))
+    assert limpiar_texto("".join(paginas)) == esperado
+    assert "".join(limpiar_paginas(paginas)) == esperado
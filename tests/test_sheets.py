@@ -0,0 +1,118 @@
+import pytest
+import requests
+
+from benchmarks.servidores import SheetsFalso
+from contratos import sheets
+from contratos.prompts import HEADERS_CONTRATO
+
+# ===============================================================
+# COLA DE EXPORTACIÓN A SHEETS CONTRA EL SERVIDOR FALSO
+# ===============================================================
+
+
+class SheetsFallaPrimero(SheetsFalso):
+    """
+    SheetsFalso que responde `status` al primer values:append.
+    """
+
+    def __init__(self, status, **kwargs):
+        super().__init__(**kwargs)
+        self.status = status
+        self.appends = 0
+
+    def responder(self, manejador, ruta, cuerpo):
+        if not ruta.startswith("/token"):
+            with self._lock:
+                self.appends += 1
+                fallar = self.appends == 1
+            if fallar:
+                self._responder_json(manejador, self.status, {"error": {"code": self.status}})
+                return
+        super().responder(manejador, ruta, cuerpo)
+
+
+@pytest.fixture
+def servidor(request, monkeypatch):
+    clase, opciones = getattr(request, "param", (SheetsFalso, {}))
+    with clase(**opciones) as servidor:
+        monkeypatch.setattr(sheets, "TOKEN_URL", servidor.url + "/token")
+        monkeypatch.setattr(sheets, "SHEETS_API", servidor.url + "/v4")
+        monkeypatch.setattr(sheets, "espera_backoff", lambda *args, **kwargs: 0)
+        yield servidor
+
+
+def _fichas(n):
+    """
+    Fichas con las claves en orden inverso al de la hoja y sin "Anexos": la
+    cola debe acomodarlas según las columnas y dejar vacía la que falta.
+    """
+    return [{campo: f"{campo} {i}" for campo in reversed(HEADERS_CONTRATO) if campo != "Anexos"}
+            for i in range(n)]
+
+
+def _filas(n):
+    """
+    Lo que debe recibir Sheets por cada ficha de _fichas(n), en el orden de HEADERS_CONTRATO.
+    """
+    return [["" if campo == "Anexos" else f"{campo} {i}" for campo in HEADERS_CONTRATO] for i in range(n)]
+
+
+def _cola(obtener_token):
+    return sheets.ColaExportacion("ID", "Hoja1!A1", HEADERS_CONTRATO, obtener_token)
+
+
+def test_vaciar_en_bloques(servidor):
+    cola = _cola(lambda forzar_refresco=False: "falso")
+    for ficha in _fichas(2 * sheets.MAX_FILAS_POR_PETICION + 500):
+        cola.agregar(ficha)
+
+    assert cola.vaciar() == 2 * sheets.MAX_FILAS_POR_PETICION + 500
+    assert servidor.bloques == [sheets.MAX_FILAS_POR_PETICION, sheets.MAX_FILAS_POR_PETICION, 500]
+    assert servidor.valores == _filas(2 * sheets.MAX_FILAS_POR_PETICION + 500)
+    assert len(cola) == 0
+
+
+@pytest.mark.parametrize("servidor", [(SheetsFalso, {"token_valido": "nuevo"})], indirect=True)
+def test_401_refresca_el_token_y_reintenta(servidor):
+    pedidos = []
+
+    def obtener_token(forzar_refresco=False):
+        pedidos.append(forzar_refresco)
+        if not forzar_refresco:
+            return "expirado"
+        return sheets.solicitar_token({"grant_type": "refresh_token"})["access_token"]
+
+    cola = _cola(obtener_token)
+    for ficha in _fichas(3):
+        cola.agregar(ficha)
+
+    assert cola.vaciar() == 3
+    assert pedidos == [False, True]
+    assert servidor.rechazadas_401 == 1
+    assert servidor.valores == _filas(3)
+
+
+@pytest.mark.parametrize("servidor", [(SheetsFallaPrimero, {"status": 429})], indirect=True)
+def test_append_reintenta_429(servidor):
+    cola = _cola(lambda forzar_refresco=False: "falso")
+    for ficha in _fichas(3):
+        cola.agregar(ficha)
+
+    assert cola.vaciar() == 3
+    assert servidor.appends == 2
+    assert servidor.bloques == [3]
+    assert servidor.valores == _filas(3)
+
+
+@pytest.mark.parametrize("servidor", [(SheetsFallaPrimero, {"status": 503})], indirect=True)
+def test_append_no_reintenta_5xx(servidor):
+    # Un 5xx pudo haber escrito las filas: reintentar las duplicaría
+    cola = _cola(lambda forzar_refresco=False: "falso")
+    for ficha in _fichas(3):
+        cola.agregar(ficha)
+
+    with pytest.raises(requests.HTTPError):
+        cola.vaciar()
+    assert servidor.appends == 1
+    assert servidor.valores == []
+    assert len(cola) == 3
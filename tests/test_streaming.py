@@ -0,0 +1,47 @@
+import openai
+import pytest
+from openai import OpenAI
+
+from benchmarks.servidores import OpenAIFalso
+from contratos.prompts import HEADERS_CONTRATO, SALIDA_JSON, SALIDA_TABLA, construir_mensajes
+from contratos.streaming import analizar_stream
+
+# ===============================================================
+# STREAMING CONTRA EL SERVIDOR FALSO: CORTES A MITAD DE LA RESPUESTA
+# ===============================================================
+
+PEDIDOS = HEADERS_CONTRATO[:6]
+
+
+def _analizar(salida, **opciones):
+    recibidos = []
+    metricas = {}
+    with OpenAIFalso(**opciones) as servidor:
+        client = OpenAI(api_key="falsa", base_url=servidor.url + "/v1", max_retries=0)
+        texto, campos = analizar_stream(client, "gpt-5-mini", construir_mensajes("Contrato.", PEDIDOS, salida=salida),
+                                        lambda campo, respuesta: recibidos.append(campo), metricas=metricas,
+                                        salida=salida)
+    return campos, recibidos, metricas
+
+
+@pytest.mark.parametrize("salida", [SALIDA_TABLA, SALIDA_JSON])
+def test_stream_completo(salida):
+    campos, recibidos, metricas = _analizar(salida)
+    assert list(campos) == recibidos == PEDIDOS
+    assert metricas["stream_completo"]
+
+
+@pytest.mark.parametrize("salida", [SALIDA_TABLA, SALIDA_JSON])
+def test_evento_error_a_mitad_del_stream(salida):
+    # La tabla trae encabezado y separador antes de las filas; el JSON, la llave
+    filas = 2 + 3 if salida == SALIDA_TABLA else 1 + 3
+    campos, recibidos, metricas = _analizar(salida, error_tras_filas=filas)
+    assert list(campos) == recibidos == PEDIDOS[:3]
+    assert metricas["stream_completo"] is False
+    assert "Falla a mitad del stream" in metricas["error_stream"]
+    assert "stream_s" in metricas
+
+
+def test_evento_error_antes_del_primer_token():
+    with pytest.raises(openai.APIError):
+        _analizar(SALIDA_TABLA, error_tras_filas=0)